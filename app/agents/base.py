@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Literal, Optional, TypedDict
 
 
-NextAgent = Literal["intent", "retrieval", "tool", "final", "safety", "stop"]
+NextAgent = Literal["intent", "planner", "retrieval", "tool", "final", "safety", "stop"]
 
 
 class AgentResult(TypedDict, total=False):
@@ -14,6 +15,7 @@ class AgentResult(TypedDict, total=False):
     confidence: float
     next: List[NextAgent]
     error: str
+    llm_calls: int  # LLM round trips made by this step (for comparing routes in the run log)
 
 
 class BaseAgent(ABC):
@@ -22,3 +24,7 @@ class BaseAgent(ABC):
     @abstractmethod
     def run(self, state: Dict[str, Any]) -> AgentResult:
         raise NotImplementedError
+
+    async def arun(self, state: Dict[str, Any]) -> AgentResult:
+        """Async entry point used by OrchestratorService.arun; agents doing I/O override it."""
+        return await asyncio.to_thread(self.run, state)
@@ -1,20 +1,76 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, List
+import re
+from typing import Any, Dict, Generator, List
 
 from app.agents.base import BaseAgent, AgentResult
 from app.core.config import settings
+from app.core.llm_cache import llm_cache_for
 from app.core.ollama_client import OllamaClient
 
 
+_REPLY_KEY = re.compile(r'"reply"\s*:\s*"')
+
+
+class _ReplyStream:
+    """Incrementally pulls the "reply" string value out of streamed JSON output."""
+
+    def __init__(self) -> None:
+        self.raw = ""
+        self.found = False
+        self.done = False
+        self._pos = 0
+
+    def feed(self, chunk: str) -> str:
+        self.raw += chunk
+        if self.done:
+            return ""
+        if not self.found:
+            m = _REPLY_KEY.search(self.raw)
+            if not m:
+                return ""
+            self.found = True
+            self._pos = m.end()
+
+        out: List[str] = []
+        i = self._pos
+        buf = self.raw
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch == "\\":
+                # wait for the full escape sequence before decoding it
+                width = 6 if buf[i + 1 : i + 2] == "u" else 2
+                if i + width > len(buf):
+                    break
+                try:
+                    out.append(json.loads(f'"{buf[i : i + width]}"'))
+                except ValueError:
+                    out.append(buf[i + 1 : i + width])
+                i += width
+                continue
+            out.append(ch)
+            i += 1
+        self._pos = i
+        return "".join(out)
+
+
 class FinalBuilderAgent(BaseAgent):
     name = "final"
 
     def __init__(self) -> None:
-        self.client = OllamaClient(settings.ollama_base_url, settings.ollama_model, timeout=settings.ollama_timeout_sec)
+        self.client = OllamaClient(
+            settings.ollama_base_urls,
+            settings.ollama_model,
+            timeout=settings.ollama_timeout_sec,
+            cache=llm_cache_for(self.name),
+        )
 
-    def run(self, state: Dict[str, Any]) -> AgentResult:
+    def _messages(self, state: Dict[str, Any]) -> List[Dict[str, str]]:
         user_input = state.get("input", "") or ""
         hits: List[Dict[str, Any]] = state.get("retrieval_hits") or []
         tool_payload = state.get("tool_result")
@@ -46,13 +102,9 @@ class FinalBuilderAgent(BaseAgent):
             f"Tool result (if any): {tool_context or 'NONE'}\n\n"
             f"Evidence snippets (if any):\n{evidence_block or 'NONE'}\n"
         )
+        return [{"role": "system", "content": system}, {"role": "user", "content": user}]
 
-        raw = self.client.chat(
-            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-            response_format="json",
-            temperature=0.3,
-        )
-
+    def _finish(self, state: Dict[str, Any], raw: str) -> AgentResult:
         try:
             data = json.loads(raw)
         except Exception:
@@ -61,4 +113,44 @@ class FinalBuilderAgent(BaseAgent):
         state["draft_reply"] = str(data.get("reply", "")).strip()
         state["confidence"] = float(data.get("confidence", 0.7))
 
-        return AgentResult(agent=self.name, status="ok", data=data, confidence=state["confidence"], next=["safety"])
+        return AgentResult(agent=self.name, status="ok", data=data, confidence=state["confidence"], next=["safety"], llm_calls=1)
+
+    def run(self, state: Dict[str, Any]) -> AgentResult:
+        raw = self.client.chat(
+            messages=self._messages(state),
+            response_format="json",
+            temperature=0.3,
+            user_id=state.get("user_id"),
+            deadline=state.get("deadline"),
+        )
+        return self._finish(state, raw)
+
+    async def arun(self, state: Dict[str, Any]) -> AgentResult:
+        raw = await self.client.achat(
+            messages=self._messages(state),
+            response_format="json",
+            temperature=0.3,
+            user_id=state.get("user_id"),
+            deadline=state.get("deadline"),
+        )
+        return self._finish(state, raw)
+
+    def run_stream(self, state: Dict[str, Any]) -> Generator[str, None, AgentResult]:
+        """Yield reply text deltas as the model produces them; returns the same AgentResult as run()."""
+        stream = _ReplyStream()
+        for chunk in self.client.chat_stream(
+            messages=self._messages(state),
+            response_format="json",
+            temperature=0.3,
+            user_id=state.get("user_id"),
+            deadline=state.get("deadline"),
+        ):
+            delta = stream.feed(chunk)
+            if delta:
+                yield delta
+
+        result = self._finish(state, stream.raw)
+        if not stream.found and state["draft_reply"]:
+            # model ignored the JSON schema: hand out the whole reply at once
+            yield state["draft_reply"]
+        return result
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from app.agents.base import BaseAgent, AgentResult
 from app.core.config import settings
+from app.core.llm_cache import llm_cache_for
 from app.core.ollama_client import OllamaClient
 
 
@@ -12,9 +13,14 @@ class IntentAgent(BaseAgent):
     name = "intent"
 
     def __init__(self) -> None:
-        self.client = OllamaClient(settings.ollama_base_url, settings.ollama_model, timeout=settings.ollama_timeout_sec)
+        self.client = OllamaClient(
+            settings.ollama_base_urls,
+            settings.ollama_model,
+            timeout=settings.ollama_timeout_sec,
+            cache=llm_cache_for(self.name),
+        )
 
-    def run(self, state: Dict[str, Any]) -> AgentResult:
+    def _messages(self, state: Dict[str, Any]) -> List[Dict[str, str]]:
         user_message = (state.get("input") or "").strip()
 
         system_prompt = (
@@ -34,11 +40,9 @@ class IntentAgent(BaseAgent):
             "}\n"
         )
 
-        raw = self.client.chat(
-            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_message}],
-            response_format="json",
-        )
+        return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_message}]
 
+    def _finish(self, state: Dict[str, Any], raw: str) -> AgentResult:
         try:
             data = json.loads(raw)
         except Exception:
@@ -55,4 +59,24 @@ class IntentAgent(BaseAgent):
         if not nxt:
             nxt = ["final"]
 
-        return AgentResult(agent=self.name, status="ok", data=data, confidence=float(data.get("confidence", 0.7)), next=nxt)
+        return AgentResult(agent=self.name, status="ok", data=data, confidence=float(data.get("confidence", 0.7)), next=nxt, llm_calls=1)
+
+    def run(self, state: Dict[str, Any]) -> AgentResult:
+        raw = self.client.chat(
+            messages=self._messages(state),
+            response_format="json",
+            user_id=state.get("user_id"),
+            deadline=state.get("deadline"),
+            hedge=settings.ollama_hedge_intent,
+        )
+        return self._finish(state, raw)
+
+    async def arun(self, state: Dict[str, Any]) -> AgentResult:
+        raw = await self.client.achat(
+            messages=self._messages(state),
+            response_format="json",
+            user_id=state.get("user_id"),
+            deadline=state.get("deadline"),
+            hedge=settings.ollama_hedge_intent,
+        )
+        return self._finish(state, raw)
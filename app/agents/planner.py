@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List
+
+from app.agents.base import BaseAgent, AgentResult
+from app.core.config import settings
+from app.core.llm_cache import llm_cache_for
+from app.core.ollama_client import OllamaClient
+from app.tools.registry import TOOLS
+
+
+class PlannerAgent(BaseAgent):
+    """
+    Combined intent classification + tool selection in one LLM call (ORCHESTRATOR_MODE=planner).
+    The chosen tool is left in state["planned_tool"], which ToolAgent executes without a second call.
+    """
+
+    name = "planner"
+
+    def __init__(self) -> None:
+        self.client = OllamaClient(
+            settings.ollama_base_urls,
+            settings.ollama_model,
+            timeout=settings.ollama_timeout_sec,
+            cache=llm_cache_for(self.name),
+        )
+
+    def _messages(self, state: Dict[str, Any]) -> List[Dict[str, str]]:
+        user_message = (state.get("input") or "").strip()
+
+        system_prompt = (
+            "You are a Planning Agent. Return ONLY valid JSON.\n"
+            "Decide in one step what the request needs: retrieval, a tool call, or neither.\n\n"
+            "Rules:\n"
+            "- Pick a tool for calculations, arithmetic, or getting the current time; otherwise tool_name=none.\n"
+            f"- Available tools: {', '.join(sorted(TOOLS))}.\n"
+            "- calculator takes {\"expression\": \"...\"} using digits, + - * / ( ) and dots only; now takes {}.\n"
+            "- needs_retrieval=true when the question likely needs information from uploaded files or past chat history.\n\n"
+            "Schema (strict):\n"
+            "{\n"
+            "  \"intent\": \"question|action|lookup|chat\",\n"
+            "  \"needs_retrieval\": true|false,\n"
+            "  \"tool_name\": \"calculator|now|none\",\n"
+            "  \"tool_args\": {...},\n"
+            "  \"notes\": \"short reason\",\n"
+            "  \"confidence\": 0.0-1.0\n"
+            "}\n"
+            "Examples:\n"
+            "- '25500 + 47500' => tool_name=calculator, tool_args={expression:'25500+47500'}, needs_retrieval=false\n"
+            "- 'what does my contract say about notice?' => tool_name=none, needs_retrieval=true\n"
+        )
+
+        return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_message}]
+
+    def _finish(self, state: Dict[str, Any], raw: str) -> AgentResult:
+        try:
+            data = json.loads(raw)
+        except Exception:
+            data = {"intent": "question", "needs_retrieval": False, "tool_name": "none", "notes": "parse_failed", "confidence": 0.4}
+
+        tool_name = str(data.get("tool_name") or "none").strip()
+        tool_args = data.get("tool_args") if isinstance(data.get("tool_args"), dict) else {}
+        confidence = float(data.get("confidence", 0.7))
+
+        # same shape as IntentAgent's output, so FinalBuilder and the run log read it unchanged
+        state["intent"] = {
+            "intent": data.get("intent", "question"),
+            "needs_retrieval": data.get("needs_retrieval") is True,
+            "needs_tools": tool_name in TOOLS,
+            "notes": data.get("notes", ""),
+            "confidence": confidence,
+        }
+
+        nxt = []
+        if tool_name in TOOLS:
+            state["planned_tool"] = {"tool_name": tool_name, "tool_args": tool_args, "confidence": confidence}
+            nxt.append("tool")
+        if data.get("needs_retrieval") is True:
+            nxt.append("retrieval")
+        if not nxt:
+            nxt = ["final"]
+
+        return AgentResult(agent=self.name, status="ok", data=data, confidence=confidence, next=nxt, llm_calls=1)
+
+    def run(self, state: Dict[str, Any]) -> AgentResult:
+        raw = self.client.chat(
+            messages=self._messages(state),
+            response_format="json",
+            user_id=state.get("user_id"),
+            deadline=state.get("deadline"),
+            hedge=settings.ollama_hedge_intent,
+        )
+        return self._finish(state, raw)
+
+    async def arun(self, state: Dict[str, Any]) -> AgentResult:
+        raw = await self.client.achat(
+            messages=self._messages(state),
+            response_format="json",
+            user_id=state.get("user_id"),
+            deadline=state.get("deadline"),
+            hedge=settings.ollama_hedge_intent,
+        )
+        return self._finish(state, raw)
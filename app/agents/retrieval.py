@@ -1,21 +1,66 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from app.agents.base import BaseAgent, AgentResult
 from app.core.config import settings
-from app.services.search_service import search
+from app.core.ollama_client import OllamaClient
+from app.services.search_service import aretrieve, retrieve
 
 
 class RetrievalAgent(BaseAgent):
     name = "retrieval"
 
+    def __init__(self) -> None:
+        self.embedder = OllamaClient(settings.ollama_base_urls, settings.embed_model, timeout=settings.ollama_timeout_sec)
+
+    def query_embedding(self, state: Dict[str, Any]) -> Optional[List[float]]:
+        """Embedding of the question for semantic search; None falls back to lexical search."""
+        if not settings.enable_embeddings:
+            return None
+        if state.get("question_embedding") is not None:
+            return state["question_embedding"]  # already embedded for the answer cache
+        try:
+            return self.embedder.embeddings(state.get("input", "") or "", user_id=state.get("user_id"), deadline=state.get("deadline"))
+        except Exception:  # noqa: BLE001
+            return None
+
+    async def aquery_embedding(self, state: Dict[str, Any]) -> Optional[List[float]]:
+        if not settings.enable_embeddings:
+            return None
+        if state.get("question_embedding") is not None:
+            return state["question_embedding"]
+        try:
+            return await self.embedder.aembeddings(state.get("input", "") or "", user_id=state.get("user_id"), deadline=state.get("deadline"))
+        except Exception:  # noqa: BLE001
+            return None
+
     def run(self, state: Dict[str, Any]) -> AgentResult:
         query = state.get("input", "") or ""
         user_id = state.get("user_id", "default")
 
-        hits = search(user_id=user_id, query=query, top_k=settings.top_k)
+        found = retrieve(user_id=user_id, query=query, top_k=settings.top_k, query_embedding=self.query_embedding(state))
+        return self.finish(state, found)
+
+    async def arun(self, state: Dict[str, Any]) -> AgentResult:
+        query = state.get("input", "") or ""
+        user_id = state.get("user_id", "default")
+
+        found = await aretrieve(user_id=user_id, query=query, top_k=settings.top_k, query_embedding=await self.aquery_embedding(state))
+        return self.finish(state, found)
+
+    def finish(self, state: Dict[str, Any], found: Dict[str, Any], speculative: bool = False) -> AgentResult:
+        """
+        Build the step from a retrieve() result (also used to adopt a speculative search started by
+        the orchestrator). The step keeps the retrieval mode and per-stage timings.
+        """
+        hits: List[Dict[str, Any]] = found["hits"]
         state["retrieval_hits"] = hits
 
         confidence = 0.85 if hits else 0.45
-        return AgentResult(agent=self.name, status="ok", data={"hits": hits}, confidence=confidence, next=["final"])
+        data: Dict[str, Any] = {"hits": hits, "mode": found.get("mode"), "timings": found.get("timings", {})}
+        if speculative:
+            data["speculative"] = True
+        if found.get("cached"):
+            data["cached"] = True
+        return AgentResult(agent=self.name, status="ok", data=data, confidence=confidence, next=["final"])
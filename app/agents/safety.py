@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import re
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from app.agents.base import BaseAgent, AgentResult
 
@@ -18,9 +18,13 @@ BLOCK_PATTERNS = [
 class SafetyAgent(BaseAgent):
     name = "safety"
 
+    def check(self, text: str) -> List[str]:
+        """Return the block patterns matched by text (also used on partial streamed replies)."""
+        return [p for p in BLOCK_PATTERNS if re.search(p, text, re.IGNORECASE)]
+
     def run(self, state: Dict[str, Any]) -> AgentResult:
         draft = (state.get("draft_reply") or "").strip()
-        flags = [p for p in BLOCK_PATTERNS if re.search(p, draft, re.IGNORECASE)]
+        flags = self.check(draft)
 
         if flags:
             state["draft_reply"] = "I can’t help with that request. If you tell me the safe goal, I’ll help."
@@ -28,3 +32,7 @@ class SafetyAgent(BaseAgent):
             return AgentResult(agent=self.name, status="ok", data={"blocked": True, "flags": flags}, confidence=1.0, next=["stop"])
 
         return AgentResult(agent=self.name, status="ok", data={"blocked": False}, confidence=1.0, next=["stop"])
+
+    async def arun(self, state: Dict[str, Any]) -> AgentResult:
+        # pure CPU, no point in a thread hop
+        return self.run(state)
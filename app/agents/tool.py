@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from app.agents.base import BaseAgent, AgentResult
 from app.core.config import settings
+from app.core.llm_cache import llm_cache_for
 from app.core.ollama_client import OllamaClient
 from app.tools.registry import TOOLS
 
@@ -13,9 +14,14 @@ class ToolAgent(BaseAgent):
     name = "tool"
 
     def __init__(self) -> None:
-        self.client = OllamaClient(settings.ollama_base_url, settings.ollama_model, timeout=settings.ollama_timeout_sec)
+        self.client = OllamaClient(
+            settings.ollama_base_urls,
+            settings.ollama_model,
+            timeout=settings.ollama_timeout_sec,
+            cache=llm_cache_for(self.name),
+        )
 
-    def run(self, state: Dict[str, Any]) -> AgentResult:
+    def _messages(self, state: Dict[str, Any]) -> List[Dict[str, str]]:
         user_input = state.get("input", "") or ""
 
         system = (
@@ -28,11 +34,9 @@ class ToolAgent(BaseAgent):
             "- For 'what time is it' => tool_name=now\n"
         )
 
-        raw = self.client.chat(
-            messages=[{"role": "system", "content": system}, {"role": "user", "content": user_input}],
-            response_format="json",
-        )
+        return [{"role": "system", "content": system}, {"role": "user", "content": user_input}]
 
+    def _finish(self, state: Dict[str, Any], raw: str) -> AgentResult:
         try:
             pick = json.loads(raw)
         except Exception:
@@ -40,11 +44,37 @@ class ToolAgent(BaseAgent):
 
         tool_name = (pick.get("tool_name") or "none").strip()
         tool_args = pick.get("tool_args") if isinstance(pick.get("tool_args"), dict) else {}
+        result = self.execute(state, tool_name, tool_args, pick.get("confidence"))
+        result["llm_calls"] = 1
+        return result
+
+    def _planned(self, state: Dict[str, Any]) -> Optional[AgentResult]:
+        """PlannerAgent already chose the tool and args: execute without asking the LLM again."""
+        plan = state.get("planned_tool")
+        if not plan:
+            return None
+        return self.execute(state, plan["tool_name"], plan.get("tool_args") or {}, plan.get("confidence"))
 
+    def execute(self, state: Dict[str, Any], tool_name: str, tool_args: Dict[str, Any], confidence: Any = None) -> AgentResult:
+        """Run a chosen tool (by the LLM pick above, or directly by the orchestrator's fast path)."""
         if tool_name in TOOLS:
             result = TOOLS[tool_name](tool_args)
             state["tool_result"] = {"tool": tool_name, "args": tool_args, "result": result}
-            return AgentResult(agent=self.name, status="ok", data=state["tool_result"], confidence=float(pick.get("confidence", 0.7)), next=["final"])
+            return AgentResult(agent=self.name, status="ok", data=state["tool_result"], confidence=float(confidence if confidence is not None else 0.7), next=["final"])
 
         state["tool_result"] = None
-        return AgentResult(agent=self.name, status="ok", data={"tool": "none"}, confidence=float(pick.get("confidence", 0.5)), next=["final"])
+        return AgentResult(agent=self.name, status="ok", data={"tool": "none"}, confidence=float(confidence if confidence is not None else 0.5), next=["final"])
+
+    def run(self, state: Dict[str, Any]) -> AgentResult:
+        planned = self._planned(state)
+        if planned is not None:
+            return planned
+        raw = self.client.chat(messages=self._messages(state), response_format="json", user_id=state.get("user_id"), deadline=state.get("deadline"))
+        return self._finish(state, raw)
+
+    async def arun(self, state: Dict[str, Any]) -> AgentResult:
+        planned = self._planned(state)
+        if planned is not None:
+            return planned
+        raw = await self.client.achat(messages=self._messages(state), response_format="json", user_id=state.get("user_id"), deadline=state.get("deadline"))
+        return self._finish(state, raw)
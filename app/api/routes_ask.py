@@ -1,10 +1,18 @@
 from __future__ import annotations
 
-from fastapi import APIRouter
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
+from app.core.config import settings
+from app.core.db import get_store
+from app.services.batch_service import run_batch
 from app.services.orchestrator_service import OrchestratorService
-from app.services.chat_service import append_message
+from app.services.chat_service import aappend_message, append_message
+from app.services.job_service import JobQueueFull, ask_jobs
 
 router = APIRouter(tags=["chat"])
 orchestrator = OrchestratorService()
@@ -15,24 +23,112 @@ class AskRequest(BaseModel):
     user_id: str = Field(default="default", max_length=128)
 
 
+class AskBatchRequest(BaseModel):
+    items: List[AskRequest] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=256)
+    # evaluation runs usually should not land in the users' chat history
+    record_chats: bool = False
+
+
+def _reply_meta(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "agent_path": result.get("agent_path", []),
+        "confidence": result.get("confidence", 0.0),
+        "run_id": result.get("run_id"),
+    }
+
+
+def _store_reply(user_id: str, result: Dict[str, Any]) -> None:
+    # store assistant message + include run_id in meta
+    append_message(user_id, "assistant", result.get("reply", ""), meta=_reply_meta(result))
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _run_job(req: AskRequest, run_id: str) -> None:
+    store = get_store()
+    store.set_run_status(run_id, "running")
+    try:
+        result = orchestrator.run(req.message, user_id=req.user_id, run_id=run_id)
+    except Exception as e:
+        store.set_run_status(run_id, "failed", error=str(e))
+        raise
+    _store_reply(req.user_id, result)
+
+
 @router.post("/ask")
-def ask(req: AskRequest):
+async def ask(req: AskRequest, mode: Literal["sync", "async"] = "sync"):
+    # async end to end: waiting on Ollama/Mongo does not pin a threadpool worker
     # store user message
-    append_message(req.user_id, "user", req.message)
+    await aappend_message(req.user_id, "user", req.message)
+
+    if mode == "async":
+        # answer right away; a job worker runs the orchestrator and /runs/{run_id} reports progress.
+        # The run record is created first, so any worker process can report the queued job.
+        store = get_store()
+        run_id = await store.acreate_run(user_id=req.user_id, input_text=req.message)
+        await store.aset_run_status(run_id, "queued")
+        try:
+            ask_jobs.submit(lambda rid: _run_job(req, rid), run_id=run_id)
+        except JobQueueFull as e:
+            await store.aset_run_status(run_id, "failed", error=str(e))
+            raise
+        return JSONResponse(status_code=202, content={"run_id": run_id, "status": "queued", "status_url": f"/runs/{run_id}"})
 
     # run orchestration (includes workflow run logging)
-    result = orchestrator.run(req.message, user_id=req.user_id)
+    result = await orchestrator.arun(req.message, user_id=req.user_id)
 
-    # store assistant message + include run_id in meta
-    append_message(
-        req.user_id,
-        "assistant",
-        result.get("reply", ""),
-        meta={
-            "agent_path": result.get("agent_path", []),
-            "confidence": result.get("confidence", 0.0),
-            "run_id": result.get("run_id"),
-        },
-    )
+    await aappend_message(req.user_id, "assistant", result.get("reply", ""), meta=_reply_meta(result))
 
     return result
+
+
+@router.post("/ask/stream")
+def ask_stream(req: AskRequest):
+    """
+    Server-Sent Events version of /ask.
+    Emits `run`, `agent` (per step), `token` (final reply deltas), optional `blocked`,
+    then `done` with the same payload /ask returns (or `error`).
+    """
+    append_message(req.user_id, "user", req.message)
+
+    def events() -> Iterator[str]:
+        stream = orchestrator.run_stream(req.message, user_id=req.user_id)
+        try:
+            for event in stream:
+                if event["event"] == "done":
+                    _store_reply(req.user_id, event["data"])
+                yield _sse(event["event"], event["data"])
+        except Exception as e:  # noqa: BLE001
+            # headers are already sent, so report the failure in-band
+            yield _sse("error", {"error": str(e)})
+        finally:
+            stream.close()  # on client disconnect: finalize the run now, not whenever it is collected
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/ask/batch")
+async def ask_batch(req: AskBatchRequest):
+    """
+    Run many questions (optionally for different users) with bounded concurrency.
+    Streams newline-delimited JSON: one `/ask` payload per item as it completes (with its `index`,
+    `ok`, `latency_ms`), then a `{"done": true, ...}` summary line.
+    """
+    if len(req.items) > settings.ask_batch_max_items:
+        raise HTTPException(status_code=413, detail=f"At most {settings.ask_batch_max_items} items per batch")
+
+    items = [item.model_dump() for item in req.items]
+    concurrency = req.concurrency or settings.ask_batch_concurrency
+
+    async def lines() -> AsyncIterator[str]:
+        async for line in run_batch(orchestrator, items, concurrency, record_chats=req.record_chats):
+            yield json.dumps(line, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -14,11 +14,20 @@ from app.services.ingestion_service import ingest_pdf
 router = APIRouter(prefix="/files", tags=["files"])
 
 
+class EmbeddingBatchError(BaseModel):
+    start: int
+    end: int
+    error: str
+
+
 class UploadResponse(BaseModel):
     ok: bool
     file_id: str
     filename: str
     chunks: int
+    embedded: int = 0
+    embedding_errors: List[EmbeddingBatchError] = []
+    embed_ms: float = 0.0
 
 
 class UploadErrorItem(BaseModel):
@@ -8,6 +8,7 @@ router = APIRouter(prefix="/runs", tags=["runs"])
 def get_run(run_id: str):
     store = get_store()
     run = store.get_run(run_id)
+    # async /ask jobs: the record exists from submit on ("queued") and fills in step by step
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
     return run
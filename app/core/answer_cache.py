@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+
+def _normalize(vec: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vec))
+    return [x / norm for x in vec] if norm else list(vec)
+
+
+class SemanticAnswerCache:
+    """
+    Per-user cache of final replies keyed by the question embedding and the user's corpus version.
+
+    lookup() returns the most similar cached answer if its cosine similarity reaches `threshold`
+    and it was produced against the current corpus version; entries from older versions
+    (documents ingested since) are dropped as they are found. Each user keeps at most
+    `max_entries_per_user` answers and at most `max_users` users are kept (both LRU).
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries_per_user: int = 256,
+        max_users: int = 1000,
+        ttl_sec: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = float(threshold)
+        self.max_entries_per_user = max(1, int(max_entries_per_user))
+        self.max_users = max(1, int(max_users))
+        self.ttl_sec = float(ttl_sec)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidated = 0
+
+    def lookup(self, user_id: str, embedding: List[float], version: int) -> Optional[Dict[str, Any]]:
+        """Best entry at or above the threshold (with its `similarity`), else None."""
+        q = _normalize(embedding)
+        now = self._clock()
+        with self._lock:
+            entries = self._users.get(user_id) or []
+            live = [e for e in entries if e["version"] == version and e["expires_at"] > now]
+            self.invalidated += len(entries) - len(live)
+            if entries:
+                self._users[user_id] = live
+
+            best: Optional[Dict[str, Any]] = None
+            best_sim = -1.0
+            for e in live:
+                if len(e["embedding"]) != len(q):
+                    continue
+                sim = sum(a * b for a, b in zip(q, e["embedding"]))
+                if sim > best_sim:
+                    best, best_sim = e, sim
+
+            if best is None or best_sim < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # most recently used answer moves to the back (LRU)
+            live.remove(best)
+            live.append(best)
+            self._users.move_to_end(user_id)
+            return {**{k: v for k, v in best.items() if k != "embedding"}, "similarity": round(best_sim, 4)}
+
+    def store(self, user_id: str, embedding: List[float], version: int, answer: Dict[str, Any]) -> None:
+        entry = {
+            **answer,
+            "embedding": _normalize(embedding),
+            "version": version,
+            "expires_at": self._clock() + self.ttl_sec,
+        }
+        with self._lock:
+            entries = self._users.setdefault(user_id, [])
+            entries.append(entry)
+            del entries[: max(0, len(entries) - self.max_entries_per_user)]
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            self.stores += 1
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self.invalidated += len(self._users.pop(user_id, None) or [])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": settings.answer_cache_enabled,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "stores": self.stores,
+                "invalidated": self.invalidated,
+                "users": len(self._users),
+                "entries": sum(len(v) for v in self._users.values()),
+            }
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=settings.answer_cache_threshold,
+    max_entries_per_user=settings.answer_cache_max_entries_per_user,
+    ttl_sec=settings.answer_cache_ttl_sec,
+)
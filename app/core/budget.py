@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's latency budget ran out before an upstream call could finish."""
+
+
+def deadline_in(budget_sec: float) -> Optional[float]:
+    """Absolute monotonic deadline for a budget; None (no deadline) when budget_sec <= 0."""
+    return time.monotonic() + budget_sec if budget_sec and budget_sec > 0 else None
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left before `deadline` (may be negative); None when there is no deadline."""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def capped_timeout(timeout: float, deadline: Optional[float]) -> float:
+    """The per-call timeout, shortened to what is left of the budget; raises once nothing is left."""
+    left = remaining(deadline)
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("request latency budget exhausted")
+    return min(timeout, left)
+
+
+def can_retry(deadline: Optional[float], backoff: float, min_left: float) -> bool:
+    """A retry is only worth it if at least `min_left` seconds remain after the backoff sleep."""
+    left = remaining(deadline)
+    return left is None or left - backoff >= min_left
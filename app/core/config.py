@@ -10,12 +10,56 @@ class Settings(BaseModel):
     ollama_model: str = Field(default_factory=lambda: os.getenv("OLLAMA_MODEL", "qwen2.5:7b"))
     ollama_timeout_sec: int = Field(default_factory=lambda: int(os.getenv("OLLAMA_TIMEOUT_SEC", "60")))
 
+    # Multiple Ollama hosts (comma-separated); defaults to OLLAMA_BASE_URL alone
+    ollama_base_urls: list[str] = Field(default_factory=lambda: [u.strip() for u in os.getenv("OLLAMA_BASE_URLS", os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")).split(",") if u.strip()])
+    ollama_eject_after_failures: int = Field(default_factory=lambda: int(os.getenv("OLLAMA_EJECT_AFTER_FAILURES", "3")))
+    ollama_eject_sec: float = Field(default_factory=lambda: float(os.getenv("OLLAMA_EJECT_SEC", "30")))
+    ollama_slow_threshold_sec: float = Field(default_factory=lambda: float(os.getenv("OLLAMA_SLOW_THRESHOLD_SEC", "0")))  # 0 = never eject for latency
+    ollama_health_interval_sec: float = Field(default_factory=lambda: float(os.getenv("OLLAMA_HEALTH_INTERVAL_SEC", "15")))
+    # Hedged IntentAgent calls: race a second host when the first is slower than its p95
+    ollama_hedge_intent: bool = Field(default_factory=lambda: os.getenv("OLLAMA_HEDGE_INTENT", "false").lower() in ("1","true","yes","y"))
+    ollama_hedge_after_sec: float = Field(default_factory=lambda: float(os.getenv("OLLAMA_HEDGE_AFTER_SEC", "2")))  # until enough samples for a p95
+
+    # Model residency: keep_alive sent with every call, startup warm-up and periodic keep-warm
+    ollama_keep_alive: str = Field(default_factory=lambda: os.getenv("OLLAMA_KEEP_ALIVE", "30m"))
+    ollama_warmup_on_startup: bool = Field(default_factory=lambda: os.getenv("OLLAMA_WARMUP_ON_STARTUP", "true").lower() in ("1","true","yes","y"))
+    ollama_keep_warm_interval_sec: float = Field(default_factory=lambda: float(os.getenv("OLLAMA_KEEP_WARM_INTERVAL_SEC", "300")))  # 0 = off
+
+    # Ollama HTTP transport (shared keep-alive pool)
+    ollama_pool_maxsize: int = Field(default_factory=lambda: int(os.getenv("OLLAMA_POOL_MAXSIZE", "16")))
+    ollama_pool_timeout_sec: float = Field(default_factory=lambda: float(os.getenv("OLLAMA_POOL_TIMEOUT_SEC", "30")))
+    # Admission control: concurrent Ollama calls and how long a queued call may wait before 503
+    ollama_max_concurrency: int = Field(default_factory=lambda: int(os.getenv("OLLAMA_MAX_CONCURRENCY", "8")))
+    ollama_max_queue_wait_sec: float = Field(default_factory=lambda: float(os.getenv("OLLAMA_MAX_QUEUE_WAIT_SEC", "10")))
+    # Share one upstream call between concurrent identical requests
+    ollama_singleflight: bool = Field(default_factory=lambda: os.getenv("OLLAMA_SINGLEFLIGHT", "true").lower() in ("1","true","yes","y"))
+
+    # LLM response cache (deterministic agent calls)
+    llm_cache_backend: str = Field(default_factory=lambda: os.getenv("LLM_CACHE_BACKEND", "memory").lower())
+    llm_cache_agents: list[str] = Field(default_factory=lambda: [a.strip() for a in os.getenv("LLM_CACHE_AGENTS", "intent,planner,tool").split(",") if a.strip()])
+    llm_cache_max_entries: int = Field(default_factory=lambda: int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048")))
+    llm_cache_ttl_sec: float = Field(default_factory=lambda: float(os.getenv("LLM_CACHE_TTL_SEC", "900")))
+
+    # Semantic answer cache: near-duplicate questions (cosine >= threshold, same corpus version) reuse the reply
+    answer_cache_enabled: bool = Field(default_factory=lambda: os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in ("1","true","yes","y"))
+    answer_cache_threshold: float = Field(default_factory=lambda: float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")))
+    answer_cache_max_entries_per_user: int = Field(default_factory=lambda: int(os.getenv("ANSWER_CACHE_MAX_ENTRIES_PER_USER", "256")))
+    answer_cache_ttl_sec: float = Field(default_factory=lambda: float(os.getenv("ANSWER_CACHE_TTL_SEC", "3600")))
+
     # Embeddings
     embed_model: str = Field(default_factory=lambda: os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text"))
     enable_embeddings: bool = Field(default_factory=lambda: os.getenv("ENABLE_EMBEDDINGS", "true").lower() in ("1","true","yes","y"))
+    embed_batch_size: int = Field(default_factory=lambda: int(os.getenv("OLLAMA_EMBED_BATCH_SIZE", "32")))
+    embed_concurrency: int = Field(default_factory=lambda: int(os.getenv("OLLAMA_EMBED_CONCURRENCY", "4")))
 
     # Storage
     storage_dir: str = Field(default_factory=lambda: os.getenv("STORAGE_DIR", os.path.join(os.getcwd(), "storage")))
+    # Local (no Mongo) store: append-only JSONL segments; fsync always | interval | never
+    local_store_fsync: str = Field(default_factory=lambda: os.getenv("LOCAL_STORE_FSYNC", "interval").lower())
+    local_store_fsync_interval_sec: float = Field(default_factory=lambda: float(os.getenv("LOCAL_STORE_FSYNC_INTERVAL_SEC", "1.0")))
+    local_store_segment_mb: float = Field(default_factory=lambda: float(os.getenv("LOCAL_STORE_SEGMENT_MB", "64")))
+    # the runs log is compacted once at least this many records (and more than there are runs) are superseded
+    local_store_compact_min_records: int = Field(default_factory=lambda: int(os.getenv("LOCAL_STORE_COMPACT_MIN_RECORDS", "10000")))
     
     max_upload_bytes: int = 25 * 1024 * 1024
     max_pdf_pages: int = 200
@@ -28,10 +72,63 @@ class Settings(BaseModel):
     mongo_uri: str | None = Field(default_factory=lambda: os.getenv("MONGO_URI") or None)
     mongo_db: str = Field(default_factory=lambda: os.getenv("MONGO_DB", "ai_orchestrator"))
     require_mongo: bool = Field(default_factory=lambda: os.getenv("REQUIRE_MONGO", "true").lower() in ("1","true","yes","y"))
+    # MongoStore vector search: per-user embedding matrices cached in process, cold users evicted past this size
+    mongo_vector_cache_mb: float = Field(default_factory=lambda: float(os.getenv("MONGO_VECTOR_CACHE_MB", "256")))
+
+    # Write-behind for chat/run records: buffered off the request path, bulk-flushed by a background writer
+    write_behind_enabled: bool = Field(default_factory=lambda: os.getenv("WRITE_BEHIND_ENABLED", "true").lower() in ("1","true","yes","y"))
+    write_behind_max_queue: int = Field(default_factory=lambda: int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000")))
+    write_behind_flush_interval_sec: float = Field(default_factory=lambda: float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_SEC", "0.05")))
+    write_behind_batch_size: int = Field(default_factory=lambda: int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500")))
+    write_behind_max_backoff_sec: float = Field(default_factory=lambda: float(os.getenv("WRITE_BEHIND_MAX_BACKOFF_SEC", "5")))
+    write_behind_max_attempts: int = Field(default_factory=lambda: int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5")))
 
     # Orchestration
     max_hops: int = Field(default_factory=lambda: int(os.getenv("MAX_AGENT_HOPS", "6")))
     top_k: int = Field(default_factory=lambda: int(os.getenv("RETRIEVAL_TOP_K", "5")))
+    # Hybrid retrieval: lexical + vector rankings fused by weighted reciprocal rank fusion
+    hybrid_search_enabled: bool = Field(default_factory=lambda: os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() in ("1","true","yes","y"))
+    hybrid_lexical_weight: float = Field(default_factory=lambda: float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0")))
+    hybrid_vector_weight: float = Field(default_factory=lambda: float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0")))
+    hybrid_rrf_k: int = Field(default_factory=lambda: int(os.getenv("HYBRID_RRF_K", "60")))
+    # candidates taken from each ranking before fusion
+    hybrid_candidates: int = Field(default_factory=lambda: int(os.getenv("HYBRID_CANDIDATES", "20")))
+    # retrieve() results cached per (user, normalized query, top_k, mode, search version); the TTL bounds
+    # staleness from writes made by other worker processes
+    retrieval_cache_enabled: bool = Field(default_factory=lambda: os.getenv("RETRIEVAL_CACHE_ENABLED", "true").lower() in ("1","true","yes","y"))
+    retrieval_cache_max_entries: int = Field(default_factory=lambda: int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "1024")))
+    retrieval_cache_ttl_sec: float = Field(default_factory=lambda: float(os.getenv("RETRIEVAL_CACHE_TTL_SEC", "120")))
+    # Approximate vector search: per-user IVF index under STORAGE_DIR/ann, memory-mapped and shared by workers
+    ann_index_enabled: bool = Field(default_factory=lambda: os.getenv("ANN_INDEX_ENABLED", "false").lower() in ("1","true","yes","y"))
+    # users with fewer vectors are scanned exactly; lists are trained at this size
+    ann_min_train: int = Field(default_factory=lambda: int(os.getenv("ANN_MIN_TRAIN", "1024")))
+    # inverted lists scanned per query (more = better recall, slower)
+    ann_nprobe: int = Field(default_factory=lambda: int(os.getenv("ANN_NPROBE", "16")))
+    # classic: IntentAgent then ToolAgent (two LLM calls before final); planner: one PlannerAgent call for both
+    orchestrator_mode: str = Field(default_factory=lambda: os.getenv("ORCHESTRATOR_MODE", "classic").lower())
+    # Rule-based pre-classifier: unambiguous tool requests skip the IntentAgent/ToolAgent LLM calls
+    fast_path_enabled: bool = Field(default_factory=lambda: os.getenv("FAST_PATH_ENABLED", "true").lower() in ("1","true","yes","y"))
+    # Start RetrievalAgent's search alongside IntentAgent; the result is dropped if intent does not ask for it
+    speculative_retrieval: bool = Field(default_factory=lambda: os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() in ("1","true","yes","y"))
+    # Run independent agents (e.g. tool + retrieval) of the same wave concurrently
+    orchestrator_parallel: bool = Field(default_factory=lambda: os.getenv("ORCHESTRATOR_PARALLEL", "true").lower() in ("1","true","yes","y"))
+    orchestrator_max_workers: int = Field(default_factory=lambda: int(os.getenv("ORCHESTRATOR_MAX_WORKERS", "8")))
+
+    # Per-request latency budget (0 = none): the remaining budget caps every Ollama timeout
+    request_budget_sec: float = Field(default_factory=lambda: float(os.getenv("REQUEST_BUDGET_SEC", "90")))
+    # Ollama retries are skipped when less than this would be left after the backoff
+    budget_min_retry_sec: float = Field(default_factory=lambda: float(os.getenv("BUDGET_MIN_RETRY_SEC", "5")))
+    # Degradation: these agents are skipped once less than the final-reply reserve is left
+    budget_final_reserve_sec: float = Field(default_factory=lambda: float(os.getenv("BUDGET_FINAL_RESERVE_SEC", "15")))
+    budget_skippable_agents: list[str] = Field(default_factory=lambda: [a.strip() for a in os.getenv("BUDGET_SKIPPABLE_AGENTS", "retrieval,tool").split(",") if a.strip()])
+
+    # POST /ask?mode=async: bounded worker pool running the orchestrator off the request
+    ask_job_workers: int = Field(default_factory=lambda: int(os.getenv("ASK_JOB_WORKERS", "4")))
+    ask_job_max_queue: int = Field(default_factory=lambda: int(os.getenv("ASK_JOB_MAX_QUEUE", "100")))
+    # POST /ask/batch: items per request, items in flight per batch and across all batches of the process
+    ask_batch_max_items: int = Field(default_factory=lambda: int(os.getenv("ASK_BATCH_MAX_ITEMS", "5000")))
+    ask_batch_concurrency: int = Field(default_factory=lambda: int(os.getenv("ASK_BATCH_CONCURRENCY", "8")))
+    ask_batch_max_in_flight: int = Field(default_factory=lambda: int(os.getenv("ASK_BATCH_MAX_IN_FLIGHT", "16")))
 
     # Safety
     refuse_on_policy_violation: bool = Field(default_factory=lambda: os.getenv("REFUSE_ON_POLICY", "true").lower() in ("1","true","yes","y"))
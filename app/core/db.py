@@ -1,10 +1,26 @@
 from __future__ import annotations
-from typing import Optional
+
+import os
+from typing import Any, Dict, Optional
 from app.core.config import settings
 from app.repositories.base import Store
 
 _store: Optional[Store] = None
 
+def _wrap(store: Store) -> Store:
+    if not settings.write_behind_enabled:
+        return store
+    from app.repositories.write_behind import WriteBehindStore
+    return WriteBehindStore(
+        store,
+        max_queue=settings.write_behind_max_queue,
+        flush_interval=settings.write_behind_flush_interval_sec,
+        batch_size=settings.write_behind_batch_size,
+        max_backoff=settings.write_behind_max_backoff_sec,
+        max_attempts=settings.write_behind_max_attempts,
+        dead_letter_path=os.path.join(settings.storage_dir, "write_behind_dead_letter.jsonl"),
+    )
+
 def get_store() -> Store:
     global _store
     if _store is not None:
@@ -15,9 +31,40 @@ def get_store() -> Store:
 
     if settings.mongo_uri:
         from app.repositories.mongo_store import MongoStore
-        _store = MongoStore(settings.mongo_uri, settings.mongo_db)
+        _store = _wrap(MongoStore(settings.mongo_uri, settings.mongo_db, vector_cache_mb=settings.mongo_vector_cache_mb))
         return _store
 
     from app.repositories.local_json_store import LocalJsonStore
-    _store = LocalJsonStore(base_dir=settings.storage_dir)
+    _store = _wrap(
+        LocalJsonStore(
+            storage_dir=settings.storage_dir,
+            fsync=settings.local_store_fsync,
+            fsync_interval_sec=settings.local_store_fsync_interval_sec,
+            segment_mb=settings.local_store_segment_mb,
+            compact_min_records=settings.local_store_compact_min_records,
+        )
+    )
     return _store
+
+def close_store() -> None:
+    """Flush buffered writes on shutdown (no-op for unbuffered stores)."""
+    close = getattr(_store, "close", None)
+    if close is not None:
+        close()
+
+async def aclose_store() -> None:
+    """Close the store's clients bound to the app's event loop (before close_store(), on shutdown)."""
+    aclose = getattr(_store, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+def store_stats() -> Dict[str, Any]:
+    stats = getattr(_store, "stats", None)
+    return stats() if stats is not None else {}
+
+
+def vector_cache_stats() -> Dict[str, Any]:
+    """MongoStore's per-user embedding matrix cache (empty for other stores)."""
+    store = getattr(_store, "inner", _store)
+    stats = getattr(store, "vector_cache_stats", None)
+    return stats() if stats is not None else {}
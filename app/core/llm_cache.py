@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.shared_work import count_shared
+
+log = logging.getLogger(__name__)
+
+
+def stable_hash(obj: Any) -> str:
+    raw = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cache_key(payload: Dict[str, Any]) -> str:
+    """Stable hash of the parts of a /api/chat payload that determine the answer."""
+    return stable_hash(
+        {
+            "model": payload.get("model"),
+            "messages": payload.get("messages"),
+            "format": payload.get("format"),
+            "temperature": (payload.get("options") or {}).get("temperature"),
+        }
+    )
+
+
+class CacheBackend(ABC):
+    name: str
+    # True when get/set do network I/O; async callers then run them off the event loop
+    blocking: bool = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class InMemoryLRUCache(CacheBackend):
+    """Size-bounded LRU with a per-entry TTL. Local to this process."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024, ttl_sec: float = 600.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_sec = float(ttl_sec)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expired += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl_sec, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._data), "max_entries": self.max_entries, "evictions": self.evictions, "expired": self.expired}
+
+
+class MongoResponseCache(CacheBackend):
+    """Shared across workers. Expiry is handled by a Mongo TTL index on expires_at."""
+
+    name = "mongo"
+    blocking = True
+
+    def __init__(self, collection: Any, ttl_sec: float = 600.0):
+        self.collection = collection
+        self.ttl_sec = float(ttl_sec)
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def get(self, key: str) -> Optional[str]:
+        # TTL monitor runs about once a minute, so filter expired docs ourselves too
+        doc = self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}}, {"value": 1})
+        return doc.get("value") if doc else None
+
+    def set(self, key: str, value: str) -> None:
+        self.collection.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_sec)}},
+            upsert=True,
+        )
+
+
+class ResponseCache:
+    """Counts hits/misses around a backend. Backend failures degrade to a miss, never to an error."""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self.backend.get(key)
+        except Exception:  # noqa: BLE001
+            self._count("errors")
+            value = None
+        self._count("hits" if value is not None else "misses")
+        if value is not None:
+            count_shared("llm_cache_hit")
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        try:
+            self.backend.set(key, value)
+        except Exception:  # noqa: BLE001
+            self._count("errors")
+
+    async def aget(self, key: str) -> Optional[str]:
+        if self.backend.blocking:
+            return await asyncio.to_thread(self.get, key)
+        return self.get(key)
+
+    async def aset(self, key: str, value: str) -> None:
+        if self.backend.blocking:
+            await asyncio.to_thread(self.set, key, value)
+        else:
+            self.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            **self.backend.stats(),
+        }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    if _cache is not None:
+        return _cache
+    with _cache_lock:
+        if _cache is None:
+            if settings.llm_cache_backend == "mongo":
+                if not settings.mongo_uri:
+                    raise RuntimeError("LLM_CACHE_BACKEND=mongo but MONGO_URI is not set.")
+                from pymongo import MongoClient
+
+                collection = MongoClient(settings.mongo_uri)[settings.mongo_db]["llm_cache"]
+                backend: CacheBackend = MongoResponseCache(collection, ttl_sec=settings.llm_cache_ttl_sec)
+            else:
+                backend = InMemoryLRUCache(max_entries=settings.llm_cache_max_entries, ttl_sec=settings.llm_cache_ttl_sec)
+            _cache = ResponseCache(backend)
+    return _cache
+
+
+def response_cache_stats() -> Dict[str, Any]:
+    """get_response_cache().stats(), or a disabled marker when the cache cannot be built (e.g. mongo backend without MONGO_URI)."""
+    try:
+        return get_response_cache().stats()
+    except Exception as e:  # noqa: BLE001
+        return {"enabled": False, "error": str(e), "hits": 0, "misses": 0}
+
+
+def llm_cache_for(agent_name: str) -> Optional[ResponseCache]:
+    """
+    The shared cache if `agent_name` opted in via LLM_CACHE_AGENTS, else None. Agents are built
+    at import time, so a cache that cannot be built (e.g. mongo backend without MONGO_URI)
+    is logged and the agent runs uncached instead of keeping the app from starting.
+    """
+    if agent_name not in settings.llm_cache_agents:
+        return None
+    try:
+        return get_response_cache()
+    except Exception as e:  # noqa: BLE001
+        log.warning("LLM response cache disabled for %s: %s", agent_name, e)
+        return None
@@ -1,11 +1,27 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import threading
 import time
-from typing import Any, Dict, List, Optional
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Sequence, TypeVar, Union
 
+import httpx
 import requests
 
+from app.core.budget import DeadlineExceeded, can_retry, capped_timeout, remaining
+from app.core.config import settings
+from app.core.llm_cache import ResponseCache, cache_key, stable_hash
+from app.core.ollama_endpoints import Endpoint, get_endpoint_pool, percentile
+from app.core.ollama_scheduler import OllamaBusyError, OllamaScheduler, effective_priority, get_scheduler
+from app.core.ollama_transport import AsyncOllamaTransport, OllamaTransport, get_async_transport, get_transport
+from app.core.singleflight import get_singleflight
+
+T = TypeVar("T")
+
 
 class OllamaError(RuntimeError):
     pass
@@ -16,57 +32,577 @@ def _safe_json_loads(s: str) -> Any:
     return json.loads(s)
 
 
+def _check(path: str, r: Union[requests.Response, httpx.Response]) -> None:
+    if r.status_code >= 400:
+        raise OllamaError(f"Ollama {path} failed: {r.status_code} {r.text[:500]}")
+
+
+def _route_missing(r: Union[requests.Response, httpx.Response]) -> bool:
+    """A 404 from a server without the route (older Ollama), not Ollama's JSON 404 for an unknown model."""
+    if r.status_code != 404:
+        return False
+    try:
+        error = str(r.json().get("error") or "")
+    except Exception:  # noqa: BLE001  plain-text "404 page not found"
+        return True
+    return "model" not in error.lower()
+
+
+@contextmanager
+def _deadline_errors(deadline: Optional[float]) -> Iterator[None]:
+    """A transport error raised after the budget ran out (e.g. the capped read timeout) is the deadline."""
+    try:
+        yield
+    except Exception as e:
+        left = remaining(deadline)
+        if left is not None and left <= 0 and not isinstance(e, DeadlineExceeded):
+            raise DeadlineExceeded("request latency budget exhausted") from e
+        raise
+
+
+def _has_time(deadline: Optional[float]) -> bool:
+    left = remaining(deadline)
+    return left is None or left > 0
+
+
+def _chat_content(data: Dict[str, Any]) -> str:
+    return (data.get("message", {}) or {}).get("content", "") or ""
+
+
+def _stream_delta(line: str) -> tuple[str, bool]:
+    """(content delta, done) for one NDJSON line of a streamed /api/chat response."""
+    data = json.loads(line)
+    if data.get("error"):
+        raise OllamaError(f"Ollama /api/chat stream error: {data['error']}")
+    return _chat_content(data), bool(data.get("done"))
+
+
+def _embedding_from(data: Dict[str, Any]) -> List[float]:
+    emb = data.get("embedding")
+    if not isinstance(emb, list):
+        raise OllamaError("Ollama embeddings response missing 'embedding'")
+    return [float(x) for x in emb]
+
+
+def _embeddings_from(data: Dict[str, Any], expected: int) -> List[List[float]]:
+    embs = data.get("embeddings")
+    if not isinstance(embs, list) or len(embs) != expected:
+        raise OllamaError("Ollama embed response missing 'embeddings' or wrong length")
+    return [[float(x) for x in emb] for emb in embs]
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="ollama-hedge")
+        return _hedge_executor
+
+
 class OllamaClient:
-    def __init__(self, base_url: str, model: str, timeout: int = 60):
-        self.base_url = base_url.rstrip("/")
+    def __init__(
+        self,
+        base_url: Union[str, Sequence[str]],
+        model: str,
+        timeout: int = 60,
+        transport: Optional[OllamaTransport] = None,
+        cache: Optional[ResponseCache] = None,
+        coalesce: Optional[bool] = None,
+        priority: str = "interactive",
+        scheduler: Optional[OllamaScheduler] = None,
+        async_transport: Optional[AsyncOllamaTransport] = None,
+    ):
+        # One URL or a list of interchangeable Ollama hosts (least-outstanding balancing)
+        urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        self.endpoints = get_endpoint_pool(urls)
+        self.base_url = self.endpoints.endpoints[0].url
         self.model = model
         self.timeout = timeout
+        # Shared keep-alive pool unless a dedicated transport is injected (tests)
+        self.transport = transport or get_transport()
+        # async methods use the event loop's shared httpx transport unless one is injected
+        self._async_transport = async_transport
+        # Response cache for chat(); None = always call Ollama
+        self.cache = cache
+        # Identical in-flight requests share one upstream call
+        self.coalesce = settings.ollama_singleflight if coalesce is None else coalesce
+        # Admission control: every upstream HTTP call takes a scheduler slot in this priority class
+        self.priority = priority
+        self.scheduler = scheduler or get_scheduler()
+        # Flipped off the first time the server lacks /api/embed (older Ollama)
+        self._batch_embed_supported = True
+        # Recent chat latencies (seconds); their p95 is the hedge delay
+        self._chat_latencies: Deque[float] = deque(maxlen=200)
 
-    def chat(
+    def _priority(self) -> str:
+        # a caller can demote a whole unit of work, e.g. every call an /ask/batch item makes
+        return effective_priority(self.priority)
+
+    def _chat_payload(
         self,
         messages: List[Dict[str, str]],
-        *,
-        response_format: Optional[str] = "json",
-        temperature: float = 0.2,
-        max_retries: int = 2,
-    ) -> str:
+        response_format: Optional[str],
+        temperature: float,
+        stream: bool,
+    ) -> Dict[str, Any]:
         payload: Dict[str, Any] = {
             "model": self.model,
             "messages": messages,
-            "stream": False,
+            "stream": stream,
             "options": {"temperature": temperature},
         }
         if response_format:
             payload["format"] = response_format
+        if settings.ollama_keep_alive:
+            payload["keep_alive"] = settings.ollama_keep_alive
+        return payload
+
+    def _embed_payload(self, field: str, value: Any, model: Optional[str]) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"model": model or self.model, field: value}
+        if settings.ollama_keep_alive:
+            payload["keep_alive"] = settings.ollama_keep_alive
+        return payload
 
+    def _coalesced(self, flight: str, path: str, payload: Dict[str, Any], fn: Callable[[], T], deadline: Optional[float] = None) -> T:
+        """
+        fn() shared with identical calls in flight. A follower gets the leader's outcome, which ran
+        under the leader's deadline: if that ran out while `deadline` (this caller's) has not, fn runs again.
+        """
+        if not self.coalesce:
+            return fn()
+        key = f"{self.endpoints.key}{path}:{stable_hash(payload)}"
+        try:
+            return get_singleflight(flight).do(key, fn)
+        except DeadlineExceeded:
+            if not _has_time(deadline):
+                raise
+        return fn()
+
+    def _send(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        user_id: Optional[str],
+        tried: Optional[List[Endpoint]] = None,
+        deadline: Optional[float] = None,
+    ) -> requests.Response:
+        """
+        One admitted POST to the least-loaded endpoint not yet tried; 5xx counts against the endpoint.
+        With a request deadline, the remaining budget is the HTTP timeout.
+        """
+        with self.scheduler.slot(self._priority(), user_id, deadline):
+            timeout = capped_timeout(self.timeout, deadline)
+            ep = self.endpoints.pick(exclude=tried or ())
+            if tried is not None:
+                tried.append(ep)
+            with self.endpoints.track(ep), _deadline_errors(deadline):
+                r = self.transport.post(f"{ep.url}{path}", json=payload, timeout=timeout)
+                if r.status_code >= 500:
+                    raise OllamaError(f"Ollama {path} failed: {r.status_code} {r.text[:500]}")
+        return r
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        response_format: Optional[str] = "json",
+        temperature: float = 0.2,
+        max_retries: int = 2,
+        user_id: Optional[str] = None,
+        hedge: bool = False,
+        deadline: Optional[float] = None,
+    ) -> str:
+        payload = self._chat_payload(messages, response_format, temperature, stream=False)
+
+        key: Optional[str] = None
+        if self.cache is not None:
+            key = cache_key(payload)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        def call() -> str:
+            content = self._post_chat(payload, max_retries, user_id, hedge, deadline)
+            if key is not None:
+                self.cache.set(key, content)
+            return content
+
+        return self._coalesced("chat", "/api/chat", payload, call, deadline)
+
+    def _chat_once(self, payload: Dict[str, Any], user_id: Optional[str], tried: List[Endpoint], deadline: Optional[float] = None) -> str:
+        t0 = time.monotonic()
+        r = self._send("/api/chat", payload, user_id, tried, deadline)
+        _check("/api/chat", r)
+        content = _chat_content(r.json())
+        self._chat_latencies.append(time.monotonic() - t0)
+        return content
+
+    def _hedge_delay(self) -> float:
+        p95 = percentile(self._chat_latencies, 0.95) if len(self._chat_latencies) >= 20 else None
+        return p95 if p95 is not None else settings.ollama_hedge_after_sec
+
+    def _hedged_chat(self, payload: Dict[str, Any], user_id: Optional[str], tried: List[Endpoint], deadline: Optional[float] = None) -> str:
+        """Send to one endpoint; if it has not answered within the p95 delay, race a second endpoint."""
+        pool = _get_hedge_executor()
+        first = pool.submit(self._chat_once, payload, user_id, tried, deadline)
+        done, _ = wait([first], timeout=self._hedge_delay())
+        if done:
+            return first.result()
+
+        second = pool.submit(self._chat_once, payload, user_id, tried, deadline)
+        pending = {first, second}
+        err: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    # the loser keeps running to completion; its answer is simply dropped
+                    self.endpoints.record_hedge(won=f is second)
+                    return f.result()
+                err = f.exception()
+        self.endpoints.record_hedge(won=False)
+        raise err or OllamaError("Hedged Ollama request failed")
+
+    def _post_chat(
+        self,
+        payload: Dict[str, Any],
+        max_retries: int,
+        user_id: Optional[str],
+        hedge: bool = False,
+        deadline: Optional[float] = None,
+    ) -> str:
         last_err: Exception | None = None
+        tried: List[Endpoint] = []
         for attempt in range(max_retries + 1):
             try:
-                r = requests.post(
-                    f"{self.base_url}/api/chat",
-                    json=payload,
-                    timeout=self.timeout,
-                )
-                if r.status_code >= 400:
-                    raise OllamaError(f"Ollama /api/chat failed: {r.status_code} {r.text[:500]}")
-                data = r.json()
-                return (data.get("message", {}) or {}).get("content", "") or ""
+                if hedge and len(self.endpoints) > 1:
+                    return self._hedged_chat(payload, user_id, tried, deadline)
+                # retries fail over to endpoints not tried yet
+                return self._chat_once(payload, user_id, tried, deadline)
+            except (OllamaBusyError, DeadlineExceeded):
+                # already waited the full queue budget / out of request budget; retrying would not help
+                raise
             except Exception as e:  # noqa: BLE001
                 last_err = e
-                if attempt < max_retries:
-                    time.sleep(0.3 * (attempt + 1))
+                backoff = 0.3 * (attempt + 1)
+                if attempt < max_retries and can_retry(deadline, backoff, settings.budget_min_retry_sec):
+                    time.sleep(backoff)
                     continue
                 raise
 
         raise last_err or OllamaError("Unknown Ollama error")
 
-    def embeddings(self, text: str, *, model: Optional[str] = None) -> List[float]:
-        payload = {"model": model or self.model, "prompt": text}
-        r = requests.post(f"{self.base_url}/api/embeddings", json=payload, timeout=self.timeout)
-        if r.status_code >= 400:
-            raise OllamaError(f"Ollama /api/embeddings failed: {r.status_code} {r.text[:500]}")
-        data = r.json()
-        emb = data.get("embedding")
-        if not isinstance(emb, list):
-            raise OllamaError("Ollama embeddings response missing 'embedding'")
-        return [float(x) for x in emb]
+    def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        response_format: Optional[str] = "json",
+        temperature: float = 0.2,
+        user_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> Iterator[str]:
+        """
+        Like chat(), but yields content deltas as Ollama produces them.
+        No retries: once tokens have been handed out a retry would duplicate them.
+        """
+        payload = self._chat_payload(messages, response_format, temperature, stream=True)
+        with self.scheduler.slot(self._priority(), user_id, deadline):
+            timeout = capped_timeout(self.timeout, deadline)
+            ep = self.endpoints.pick()
+            with self.endpoints.track(ep), _deadline_errors(deadline), self.transport.stream_post(
+                f"{ep.url}/api/chat", json=payload, timeout=timeout
+            ) as r:
+                _check("/api/chat", r)
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    delta, done = _stream_delta(line)
+                    if delta:
+                        yield delta
+                    if done:
+                        break
+
+    def embeddings(
+        self,
+        text: str,
+        *,
+        model: Optional[str] = None,
+        user_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> List[float]:
+        payload = self._embed_payload("prompt", text, model)
+        return self._coalesced("embeddings", "/api/embeddings", payload, lambda: self._post_embeddings(payload, user_id, deadline), deadline)
+
+    def _post_embeddings(self, payload: Dict[str, Any], user_id: Optional[str], deadline: Optional[float] = None) -> List[float]:
+        r = self._send("/api/embeddings", payload, user_id, deadline=deadline)
+        _check("/api/embeddings", r)
+        return _embedding_from(r.json())
+
+    def embed_batch(
+        self,
+        texts: List[str],
+        *,
+        model: Optional[str] = None,
+        concurrency: int = 4,
+        user_id: Optional[str] = None,
+    ) -> List[List[float]]:
+        """
+        Embed many texts in one round trip via /api/embed (multi-input).
+        Falls back to at most `concurrency` parallel /api/embeddings calls on servers without it.
+        """
+        if not texts:
+            return []
+
+        if self._batch_embed_supported:
+            payload = self._embed_payload("input", list(texts), model)
+            embs = self._coalesced("embeddings", "/api/embed", payload, lambda: self._post_embed(payload, user_id))
+            if embs is not None:
+                return embs
+            self._batch_embed_supported = False
+
+        workers = max(1, min(int(concurrency), len(texts)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda t: self.embeddings(t, model=model, user_id=user_id), texts))
+
+    def _post_embed(self, payload: Dict[str, Any], user_id: Optional[str]) -> Optional[List[List[float]]]:
+        """POST /api/embed; None when the server does not have the endpoint (a missing model raises)."""
+        r = self._send("/api/embed", payload, user_id)
+        if _route_missing(r):
+            return None
+        _check("/api/embed", r)
+        return _embeddings_from(r.json(), len(payload["input"]))
+
+    # -------------------- async path --------------------
+    # Same behaviour as the sync methods above (cache, coalescing, admission, balancing,
+    # retries, hedging), but awaiting I/O so one event loop can hold many calls in flight.
+
+    def _atransport(self) -> AsyncOllamaTransport:
+        return self._async_transport or get_async_transport()
+
+    async def _acoalesced(
+        self, flight: str, path: str, payload: Dict[str, Any], fn: Callable[[], Awaitable[T]], deadline: Optional[float] = None
+    ) -> T:
+        if not self.coalesce:
+            return await fn()
+        key = f"{self.endpoints.key}{path}:{stable_hash(payload)}"
+        try:
+            return await get_singleflight(flight).ado(key, fn)
+        except DeadlineExceeded:
+            if not _has_time(deadline):
+                raise
+        return await fn()
+
+    async def _asend(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        user_id: Optional[str],
+        tried: Optional[List[Endpoint]] = None,
+        deadline: Optional[float] = None,
+    ) -> httpx.Response:
+        async with self.scheduler.aslot(self._priority(), user_id, deadline):
+            timeout = capped_timeout(self.timeout, deadline)
+            ep = self.endpoints.pick(exclude=tried or ())
+            if tried is not None:
+                tried.append(ep)
+            with self.endpoints.track(ep), _deadline_errors(deadline):
+                r = await self._atransport().post(f"{ep.url}{path}", json=payload, timeout=timeout)
+                if r.status_code >= 500:
+                    raise OllamaError(f"Ollama {path} failed: {r.status_code} {r.text[:500]}")
+        return r
+
+    async def achat(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        response_format: Optional[str] = "json",
+        temperature: float = 0.2,
+        max_retries: int = 2,
+        user_id: Optional[str] = None,
+        hedge: bool = False,
+        deadline: Optional[float] = None,
+    ) -> str:
+        payload = self._chat_payload(messages, response_format, temperature, stream=False)
+
+        key: Optional[str] = None
+        if self.cache is not None:
+            key = cache_key(payload)
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                return cached
+
+        async def call() -> str:
+            content = await self._apost_chat(payload, max_retries, user_id, hedge, deadline)
+            if key is not None:
+                await self.cache.aset(key, content)
+            return content
+
+        return await self._acoalesced("chat", "/api/chat", payload, call, deadline)
+
+    async def _achat_once(self, payload: Dict[str, Any], user_id: Optional[str], tried: List[Endpoint], deadline: Optional[float] = None) -> str:
+        t0 = time.monotonic()
+        r = await self._asend("/api/chat", payload, user_id, tried, deadline)
+        _check("/api/chat", r)
+        content = _chat_content(r.json())
+        self._chat_latencies.append(time.monotonic() - t0)
+        return content
+
+    async def _ahedged_chat(self, payload: Dict[str, Any], user_id: Optional[str], tried: List[Endpoint], deadline: Optional[float] = None) -> str:
+        first = asyncio.ensure_future(self._achat_once(payload, user_id, tried, deadline))
+        done, _ = await asyncio.wait({first}, timeout=self._hedge_delay())
+        if done:
+            return first.result()
+
+        second = asyncio.ensure_future(self._achat_once(payload, user_id, tried, deadline))
+        pending = {first, second}
+        err: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    # unlike the threaded path, the loser can be cancelled and frees its slot now
+                    for loser in pending:
+                        loser.cancel()
+                    self.endpoints.record_hedge(won=f is second)
+                    return f.result()
+                err = f.exception()
+        self.endpoints.record_hedge(won=False)
+        raise err or OllamaError("Hedged Ollama request failed")
+
+    async def _apost_chat(
+        self,
+        payload: Dict[str, Any],
+        max_retries: int,
+        user_id: Optional[str],
+        hedge: bool = False,
+        deadline: Optional[float] = None,
+    ) -> str:
+        tried: List[Endpoint] = []
+        for attempt in range(max_retries + 1):
+            try:
+                if hedge and len(self.endpoints) > 1:
+                    return await self._ahedged_chat(payload, user_id, tried, deadline)
+                return await self._achat_once(payload, user_id, tried, deadline)
+            except (OllamaBusyError, DeadlineExceeded):
+                raise
+            except Exception:  # noqa: BLE001
+                backoff = 0.3 * (attempt + 1)
+                if attempt < max_retries and can_retry(deadline, backoff, settings.budget_min_retry_sec):
+                    await asyncio.sleep(backoff)
+                    continue
+                raise
+        raise OllamaError("Unknown Ollama error")
+
+    async def achat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        response_format: Optional[str] = "json",
+        temperature: float = 0.2,
+        user_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        payload = self._chat_payload(messages, response_format, temperature, stream=True)
+        async with self.scheduler.aslot(self._priority(), user_id, deadline):
+            timeout = capped_timeout(self.timeout, deadline)
+            ep = self.endpoints.pick()
+            with self.endpoints.track(ep), _deadline_errors(deadline):
+                async with self._atransport().stream_post(f"{ep.url}/api/chat", json=payload, timeout=timeout) as r:
+                    if r.status_code >= 400:
+                        await r.aread()
+                    _check("/api/chat", r)
+                    async for line in r.aiter_lines():
+                        if not line:
+                            continue
+                        delta, done = _stream_delta(line)
+                        if delta:
+                            yield delta
+                        if done:
+                            break
+
+    async def aembeddings(
+        self,
+        text: str,
+        *,
+        model: Optional[str] = None,
+        user_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> List[float]:
+        payload = self._embed_payload("prompt", text, model)
+
+        async def call() -> List[float]:
+            r = await self._asend("/api/embeddings", payload, user_id, deadline=deadline)
+            _check("/api/embeddings", r)
+            return _embedding_from(r.json())
+
+        return await self._acoalesced("embeddings", "/api/embeddings", payload, call, deadline)
+
+    async def aembed_batch(
+        self,
+        texts: List[str],
+        *,
+        model: Optional[str] = None,
+        concurrency: int = 4,
+        user_id: Optional[str] = None,
+    ) -> List[List[float]]:
+        if not texts:
+            return []
+
+        if self._batch_embed_supported:
+            payload = self._embed_payload("input", list(texts), model)
+
+            async def call() -> Optional[List[List[float]]]:
+                r = await self._asend("/api/embed", payload, user_id)
+                if _route_missing(r):
+                    return None
+                _check("/api/embed", r)
+                return _embeddings_from(r.json(), len(texts))
+
+            embs = await self._acoalesced("embeddings", "/api/embed", payload, call)
+            if embs is not None:
+                return embs
+            self._batch_embed_supported = False
+
+        sem = asyncio.Semaphore(max(1, int(concurrency)))
+
+        async def one(text: str) -> List[float]:
+            async with sem:
+                return await self.aembeddings(text, model=model, user_id=user_id)
+
+        return list(await asyncio.gather(*(one(t) for t in texts)))
+
+    def warm(self, *, keep_alive: str, embed: bool = False) -> Dict[str, Optional[str]]:
+        """
+        Load self.model on every host and keep it resident for keep_alive.
+        Returns url -> error message (None when the host loaded the model).
+        """
+        path = "/api/embed" if embed else "/api/generate"
+        payload: Dict[str, Any] = {"model": self.model, "keep_alive": keep_alive}
+        if embed:
+            payload["input"] = ""
+
+        results: Dict[str, Optional[str]] = {}
+        for ep in self.endpoints.endpoints:
+            try:
+                with self.scheduler.slot(self._priority(), None):
+                    r = self.transport.post(f"{ep.url}{path}", json=payload, timeout=self.timeout)
+                results[ep.url] = None if r.status_code < 400 else f"{r.status_code} {r.text[:200]}"
+            except Exception as e:  # noqa: BLE001
+                results[ep.url] = str(e)
+        return results
+
+    def loaded_models(self) -> Dict[str, Optional[List[str]]]:
+        """Model names resident on each host (GET /api/ps); None for hosts that did not answer."""
+        out: Dict[str, Optional[List[str]]] = {}
+        for ep in self.endpoints.endpoints:
+            try:
+                r = self.transport.get(f"{ep.url}/api/ps", timeout=min(self.timeout, 5))
+                models = (r.json().get("models") or []) if r.status_code < 400 else None
+            except Exception:  # noqa: BLE001
+                models = None
+            out[ep.url] = None if models is None else [str(m.get("name") or m.get("model") or "") for m in models]
+        return out
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Collection, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.ollama_transport import OllamaTransport, get_transport
+
+
+def percentile(samples: Sequence[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[idx]
+
+
+class Endpoint:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.latencies: Deque[float] = deque(maxlen=200)
+
+
+class EndpointPool:
+    """
+    A set of Ollama base URLs behind one logical client.
+
+    pick() returns the healthy endpoint with the fewest outstanding requests.
+    Endpoints are ejected for `eject_sec` after `eject_after_failures` consecutive
+    failures, or when their p95 latency exceeds `slow_threshold_sec`; they come back
+    when the ejection lapses or an active health check succeeds.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        *,
+        eject_after_failures: int = 3,
+        eject_sec: float = 30.0,
+        slow_threshold_sec: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not urls:
+            raise ValueError("EndpointPool needs at least one URL")
+        self.endpoints: List[Endpoint] = [Endpoint(u) for u in urls]
+        self.key = ",".join(ep.url for ep in self.endpoints)
+        self.eject_after_failures = max(1, int(eject_after_failures))
+        self.eject_sec = float(eject_sec)
+        self.slow_threshold_sec = float(slow_threshold_sec)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def _healthy(self, ep: Endpoint, now: float) -> bool:
+        return ep.ejected_until <= now
+
+    def pick(self, exclude: Collection[Endpoint] = ()) -> Endpoint:
+        with self._lock:
+            now = self._clock()
+            candidates = [ep for ep in self.endpoints if ep not in exclude] or list(self.endpoints)
+            healthy = [ep for ep in candidates if self._healthy(ep, now)]
+            # if everything is ejected, keep serving from the least-loaded one rather than failing outright
+            pool = healthy or candidates
+            return min(pool, key=lambda ep: (ep.outstanding, ep.requests))
+
+    def _eject(self, ep: Endpoint) -> None:
+        ep.ejected_until = self._clock() + self.eject_sec
+        ep.ejections += 1
+        ep.latencies.clear()
+
+    @contextmanager
+    def track(self, ep: Endpoint) -> Iterator[None]:
+        """Count the call against ep while it runs; record latency on success, a failure on exception."""
+        with self._lock:
+            ep.outstanding += 1
+            ep.requests += 1
+        t0 = self._clock()
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                ep.failures += 1
+                ep.consecutive_failures += 1
+                if ep.consecutive_failures >= self.eject_after_failures:
+                    self._eject(ep)
+            raise
+        else:
+            with self._lock:
+                ep.consecutive_failures = 0
+                ep.latencies.append(self._clock() - t0)
+                if self.slow_threshold_sec > 0 and len(ep.latencies) >= 10:
+                    p95 = percentile(ep.latencies, 0.95)
+                    if p95 is not None and p95 > self.slow_threshold_sec:
+                        self._eject(ep)
+        finally:
+            with self._lock:
+                ep.outstanding -= 1
+
+    def record_hedge(self, won: bool) -> None:
+        with self._lock:
+            self.hedges += 1
+            self.hedge_wins += int(won)
+
+    def check_health(self, transport: OllamaTransport, timeout: float = 2.0) -> None:
+        """Probe every endpoint with GET /api/tags; failures eject, successes re-admit."""
+        for ep in self.endpoints:
+            try:
+                r = transport.get(f"{ep.url}/api/tags", timeout=timeout)
+                ok = r.status_code < 500
+            except Exception:  # noqa: BLE001
+                ok = False
+            with self._lock:
+                if ok:
+                    ep.consecutive_failures = 0
+                    ep.ejected_until = 0.0
+                elif self._healthy(ep, self._clock()):
+                    self._eject(ep)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = self._clock()
+            endpoints = {}
+            for ep in self.endpoints:
+                p95 = percentile(ep.latencies, 0.95)
+                endpoints[ep.url] = {
+                    "healthy": self._healthy(ep, now),
+                    "outstanding": ep.outstanding,
+                    "requests": ep.requests,
+                    "failures": ep.failures,
+                    "ejections": ep.ejections,
+                    "p95_ms": round(p95 * 1000.0, 1) if p95 is not None else None,
+                }
+            return {"endpoints": endpoints, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+
+_pools: Dict[Tuple[str, ...], EndpointPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_endpoint_pool(urls: Sequence[str]) -> EndpointPool:
+    """Process-wide pool per URL set, so every client talking to the same hosts shares load counts."""
+    key = tuple(u.rstrip("/") for u in urls)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = EndpointPool(
+                key,
+                eject_after_failures=settings.ollama_eject_after_failures,
+                eject_sec=settings.ollama_eject_sec,
+                slow_threshold_sec=settings.ollama_slow_threshold_sec,
+            )
+            _pools[key] = pool
+        return pool
+
+
+def endpoint_stats() -> Dict[str, Any]:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {p.key: p.stats() for p in pools}
+
+
+_health_stop = threading.Event()
+_health_thread: Optional[threading.Thread] = None
+
+
+def start_health_checks(interval_sec: float) -> None:
+    """Background loop probing every known pool; no-op if disabled or already running."""
+    global _health_thread
+    if interval_sec <= 0 or (_health_thread is not None and _health_thread.is_alive()):
+        return
+    _health_stop.clear()
+
+    def loop() -> None:
+        while not _health_stop.wait(interval_sec):
+            with _pools_lock:
+                pools = list(_pools.values())
+            for pool in pools:
+                pool.check_health(get_transport())
+
+    _health_thread = threading.Thread(target=loop, name="ollama-health", daemon=True)
+    _health_thread.start()
+
+
+def stop_health_checks() -> None:
+    _health_stop.set()
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, Optional
+
+from app.core.budget import DeadlineExceeded, remaining
+from app.core.config import settings
+
+# Highest priority first. Interactive /ask traffic always drains before ingestion embeddings.
+PRIORITIES = ("interactive", "ingestion", "background")
+
+# Priority class forced on the Ollama calls made in this context (e.g. /ask/batch items); None = the client's own
+_priority_override: ContextVar[Optional[str]] = ContextVar("ollama_priority", default=None)
+
+
+@contextmanager
+def priority_class(priority: str) -> Iterator[None]:
+    """Run the Ollama calls made in this context (and the tasks/threads started from it) in `priority`."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority class: {priority}")
+    token = _priority_override.set(priority)
+    try:
+        yield
+    finally:
+        _priority_override.reset(token)
+
+
+def effective_priority(default: str) -> str:
+    return _priority_override.get() or default
+
+
+class OllamaBusyError(RuntimeError):
+    """No Ollama slot became free within the max queue wait (surfaced as HTTP 503)."""
+
+
+class _Ticket:
+    def __init__(self, priority: str, user_id: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.user_id = user_id
+        self.granted = False
+        self.event = threading.Event()
+        # async waiters are woken through a future on their own event loop
+        self.loop = loop
+        self.future: Optional[asyncio.Future] = loop.create_future() if loop is not None else None
+
+    def wake(self) -> None:
+        self.event.set()
+        if self.future is not None:
+            try:
+                self.loop.call_soon_threadsafe(self._resolve)  # type: ignore[union-attr]
+            except RuntimeError:
+                pass  # loop already closed; nobody is waiting any more
+
+    def _resolve(self) -> None:
+        if not self.future.done():  # type: ignore[union-attr]
+            self.future.set_result(None)  # type: ignore[union-attr]
+
+
+class _ClassStats:
+    def __init__(self) -> None:
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+
+class OllamaScheduler:
+    """
+    Bounded-concurrency admission control in front of Ollama.
+
+    At most `max_concurrency` calls run at once. Waiters are served strictly by
+    priority class, and round-robin across users within a class so one user's
+    burst cannot starve the others. A waiter that is not admitted within
+    `max_queue_wait` seconds gets OllamaBusyError instead of piling up.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue_wait: float = 10.0, clock: Callable[[], float] = time.monotonic):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue_wait = float(max_queue_wait)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        # priority -> user_id -> FIFO of tickets; dict order is the round-robin order
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Ticket]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._stats: Dict[str, _ClassStats] = {p: _ClassStats() for p in PRIORITIES}
+
+    def _queued(self) -> int:
+        return sum(len(q) for users in self._queues.values() for q in users.values())
+
+    def _record_admit(self, priority: str, waited_ms: float) -> None:
+        st = self._stats[priority]
+        st.admitted += 1
+        st.wait_ms_total += waited_ms
+        st.wait_ms_max = max(st.wait_ms_max, waited_ms)
+
+    def _pop_next(self) -> Optional[_Ticket]:
+        for p in PRIORITIES:
+            users = self._queues[p]
+            if not users:
+                continue
+            user_id, q = next(iter(users.items()))
+            ticket = q.popleft()
+            # rotate this user to the back of the class
+            del users[user_id]
+            if q:
+                users[user_id] = q
+            return ticket
+        return None
+
+    def _remove(self, ticket: _Ticket) -> None:
+        users = self._queues[ticket.priority]
+        q = users.get(ticket.user_id)
+        if q is None:
+            return
+        try:
+            q.remove(ticket)
+        except ValueError:
+            return
+        if not q:
+            del users[ticket.user_id]
+
+    def _enqueue(self, priority: str, user_id: Optional[str], loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Ticket]:
+        """Admit immediately (returns None) or queue a ticket to wait on."""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority}")
+        with self._lock:
+            if self.in_flight < self.max_concurrency and self._queued() == 0:
+                self.in_flight += 1
+                self._record_admit(priority, 0.0)
+                return None
+            ticket = _Ticket(priority, user_id or "anonymous", loop)
+            self._queues[priority].setdefault(ticket.user_id, deque()).append(ticket)
+            return ticket
+
+    def _settle(self, ticket: _Ticket, t0: float, deadline: Optional[float] = None) -> None:
+        """After the wait: record the admission, or dequeue the ticket and raise OllamaBusyError (DeadlineExceeded once the budget is gone)."""
+        with self._lock:
+            waited_ms = (self._clock() - t0) * 1000.0
+            if ticket.granted:
+                self._record_admit(ticket.priority, waited_ms)
+                return
+            self._remove(ticket)
+            self._stats[ticket.priority].rejected += 1
+
+        left = remaining(deadline)
+        if left is not None and left < self.max_queue_wait - waited_ms / 1000.0:
+            raise DeadlineExceeded(f"request latency budget exhausted waiting for a {ticket.priority} Ollama slot")
+        raise OllamaBusyError(f"Ollama is busy: no slot for {ticket.priority} request within {self.max_queue_wait}s")
+
+    def _max_wait(self, deadline: Optional[float]) -> float:
+        """The queue wait, capped at what is left of the request's latency budget."""
+        left = remaining(deadline)
+        if left is None:
+            return self.max_queue_wait
+        return max(0.0, min(self.max_queue_wait, left))
+
+    def acquire(self, priority: str = "interactive", user_id: Optional[str] = None, deadline: Optional[float] = None) -> None:
+        t0 = self._clock()
+        ticket = self._enqueue(priority, user_id)
+        if ticket is None:
+            return
+        ticket.event.wait(self._max_wait(deadline))
+        self._settle(ticket, t0, deadline)
+
+    async def acquire_async(self, priority: str = "interactive", user_id: Optional[str] = None, deadline: Optional[float] = None) -> None:
+        """Same admission as acquire(), but waits without blocking the event loop."""
+        t0 = self._clock()
+        ticket = self._enqueue(priority, user_id, asyncio.get_running_loop())
+        if ticket is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), self._max_wait(deadline))  # type: ignore[arg-type]
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # the caller went away: give back a slot that was handed over meanwhile
+            with self._lock:
+                granted = ticket.granted
+                if not granted:
+                    self._remove(ticket)
+            if granted:
+                self.release()
+            raise
+        self._settle(ticket, t0, deadline)
+
+    def release(self) -> None:
+        with self._lock:
+            ticket = self._pop_next()
+            if ticket is None:
+                self.in_flight -= 1
+                return
+            # hand the slot straight to the next waiter; in_flight is unchanged
+            ticket.granted = True
+            ticket.wake()
+
+    @contextmanager
+    def slot(self, priority: str = "interactive", user_id: Optional[str] = None, deadline: Optional[float] = None) -> Iterator[None]:
+        self.acquire(priority, user_id, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, priority: str = "interactive", user_id: Optional[str] = None, deadline: Optional[float] = None) -> AsyncIterator[None]:
+        await self.acquire_async(priority, user_id, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            classes = {}
+            for p in PRIORITIES:
+                st = self._stats[p]
+                classes[p] = {
+                    "queued": sum(len(q) for q in self._queues[p].values()),
+                    "users_waiting": len(self._queues[p]),
+                    "admitted": st.admitted,
+                    "rejected": st.rejected,
+                    "avg_queue_ms": round(st.wait_ms_total / st.admitted, 3) if st.admitted else 0.0,
+                    "max_queue_ms": round(st.wait_ms_max, 3),
+                }
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue_wait_sec": self.max_queue_wait,
+                "in_flight": self.in_flight,
+                "queued": self._queued(),
+                "classes": classes,
+            }
+
+
+_scheduler: Optional[OllamaScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> OllamaScheduler:
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = OllamaScheduler(
+                max_concurrency=settings.ollama_max_concurrency,
+                max_queue_wait=settings.ollama_max_queue_wait_sec,
+            )
+    return _scheduler
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+
+
+class PoolTimeoutError(RuntimeError):
+    """No connection to the Ollama host became free within the pool timeout."""
+
+
+def _host_of(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class _HostSlots:
+    def __init__(self, size: int):
+        self.size = size
+        self.sem = threading.BoundedSemaphore(size)
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waiting = 0
+        self.requests = 0
+        self.pool_timeouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+
+class OllamaTransport:
+    """
+    Process-wide keep-alive HTTP transport shared by every OllamaClient.
+
+    One requests.Session with a bounded urllib3 pool per host. A per-host
+    semaphore caps concurrent requests, so callers wait (up to pool_timeout)
+    for a pooled connection instead of opening new sockets.
+    """
+
+    def __init__(self, max_connections_per_host: int = 16, pool_timeout: float = 30.0):
+        self.max_connections_per_host = max(1, int(max_connections_per_host))
+        self.pool_timeout = float(pool_timeout)
+
+        self._adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=self.max_connections_per_host,
+            pool_block=True,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _HostSlots] = {}
+
+    def _host_slots(self, url: str) -> Tuple[str, _HostSlots]:
+        host = _host_of(url)
+        with self._lock:
+            slots = self._hosts.get(host)
+            if slots is None:
+                slots = _HostSlots(self.max_connections_per_host)
+                self._hosts[host] = slots
+        return host, slots
+
+    @contextmanager
+    def connection(self, url: str) -> Iterator[None]:
+        """Hold one of the host's connection slots for the duration of the block."""
+        host, slots = self._host_slots(url)
+
+        t0 = time.perf_counter()
+        with self._lock:
+            slots.waiting += 1
+        acquired = slots.sem.acquire(timeout=self.pool_timeout)
+        waited_ms = (time.perf_counter() - t0) * 1000.0
+
+        with self._lock:
+            slots.waiting -= 1
+            if acquired:
+                slots.in_use += 1
+                slots.peak_in_use = max(slots.peak_in_use, slots.in_use)
+                slots.requests += 1
+                slots.wait_ms_total += waited_ms
+                slots.wait_ms_max = max(slots.wait_ms_max, waited_ms)
+            else:
+                slots.pool_timeouts += 1
+
+        if not acquired:
+            raise PoolTimeoutError(f"No free Ollama connection to {host} within {self.pool_timeout}s")
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                slots.in_use -= 1
+            slots.sem.release()
+
+    def post(self, url: str, *, json: Dict[str, Any], timeout: float) -> requests.Response:
+        with self.connection(url):
+            return self.session.post(url, json=json, timeout=timeout)
+
+    def get(self, url: str, *, timeout: float) -> requests.Response:
+        with self.connection(url):
+            return self.session.get(url, timeout=timeout)
+
+    @contextmanager
+    def stream_post(self, url: str, *, json: Dict[str, Any], timeout: float) -> Iterator[requests.Response]:
+        """POST with a streamed response body; the connection slot is held until the block exits."""
+        with self.connection(url):
+            r = self.session.post(url, json=json, timeout=timeout, stream=True)
+            try:
+                yield r
+            finally:
+                r.close()
+
+    def stats(self) -> Dict[str, Any]:
+        opened_by_host: Dict[str, int] = {}
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            netloc = f"{key.key_host}:{key.key_port}" if key.key_port else key.key_host
+            host = f"{key.key_scheme}://{netloc}"
+            opened_by_host[host] = opened_by_host.get(host, 0) + int(getattr(pool, "num_connections", 0))
+
+        hosts: Dict[str, Any] = {}
+        with self._lock:
+            snapshot = list(self._hosts.items())
+        for host, s in snapshot:
+            hosts[host] = {
+                "max_connections": s.size,
+                "in_use": s.in_use,
+                "peak_in_use": s.peak_in_use,
+                "waiting": s.waiting,
+                "saturation": round(s.in_use / s.size, 3),
+                "requests": s.requests,
+                "connections_opened": opened_by_host.get(host, 0),
+                "pool_timeouts": s.pool_timeouts,
+                "avg_wait_ms": round(s.wait_ms_total / s.requests, 3) if s.requests else 0.0,
+                "max_wait_ms": round(s.wait_ms_max, 3),
+            }
+        return {
+            "max_connections_per_host": self.max_connections_per_host,
+            "pool_timeout_sec": self.pool_timeout,
+            "hosts": hosts,
+        }
+
+
+_transport: Optional[OllamaTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> OllamaTransport:
+    global _transport
+    if _transport is not None:
+        return _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = OllamaTransport(
+                max_connections_per_host=settings.ollama_pool_maxsize,
+                pool_timeout=settings.ollama_pool_timeout_sec,
+            )
+    return _transport
+
+
+class AsyncOllamaTransport:
+    """
+    asyncio counterpart of OllamaTransport for the async request path.
+
+    One httpx.AsyncClient per host, capped at max_connections_per_host, so a single
+    event loop can keep many Ollama calls in flight without a thread each. Waiting
+    longer than pool_timeout for a connection raises PoolTimeoutError.
+    Bound to the event loop it was created on (see get_async_transport()).
+    """
+
+    def __init__(self, max_connections_per_host: int = 16, pool_timeout: float = 30.0):
+        self.max_connections_per_host = max(1, int(max_connections_per_host))
+        self.pool_timeout = float(pool_timeout)
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._in_use: Dict[str, int] = {}
+        self._requests: Dict[str, int] = {}
+        self._pool_timeouts: Dict[str, int] = {}
+
+    def _client(self, url: str) -> Tuple[str, httpx.AsyncClient]:
+        host = _host_of(url)
+        client = self._clients.get(host)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_connections_per_host,
+                max_keepalive_connections=self.max_connections_per_host,
+            )
+            client = httpx.AsyncClient(limits=limits)
+            self._clients[host] = client
+        return host, client
+
+    def _timeout(self, timeout: float) -> httpx.Timeout:
+        return httpx.Timeout(timeout, pool=self.pool_timeout)
+
+    @asynccontextmanager
+    async def _tracked(self, host: str) -> AsyncIterator[None]:
+        self._in_use[host] = self._in_use.get(host, 0) + 1
+        self._requests[host] = self._requests.get(host, 0) + 1
+        try:
+            yield
+        except httpx.PoolTimeout as e:
+            self._pool_timeouts[host] = self._pool_timeouts.get(host, 0) + 1
+            raise PoolTimeoutError(f"No free Ollama connection to {host} within {self.pool_timeout}s") from e
+        finally:
+            self._in_use[host] -= 1
+
+    async def post(self, url: str, *, json: Dict[str, Any], timeout: float) -> httpx.Response:
+        host, client = self._client(url)
+        async with self._tracked(host):
+            return await client.post(url, json=json, timeout=self._timeout(timeout))
+
+    async def get(self, url: str, *, timeout: float) -> httpx.Response:
+        host, client = self._client(url)
+        async with self._tracked(host):
+            return await client.get(url, timeout=self._timeout(timeout))
+
+    @asynccontextmanager
+    async def stream_post(self, url: str, *, json: Dict[str, Any], timeout: float) -> AsyncIterator[httpx.Response]:
+        """POST with a streamed response body; the connection is held until the block exits."""
+        host, client = self._client(url)
+        async with self._tracked(host):
+            async with client.stream("POST", url, json=json, timeout=self._timeout(timeout)) as r:
+                yield r
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_connections_per_host": self.max_connections_per_host,
+            "pool_timeout_sec": self.pool_timeout,
+            "hosts": {
+                host: {
+                    "in_use": self._in_use.get(host, 0),
+                    "requests": self._requests.get(host, 0),
+                    "pool_timeouts": self._pool_timeouts.get(host, 0),
+                }
+                for host in list(self._clients)
+            },
+        }
+
+
+# httpx clients belong to the loop that created them, so keep one transport per event loop
+_async_transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOllamaTransport]" = weakref.WeakKeyDictionary()
+
+
+def get_async_transport() -> AsyncOllamaTransport:
+    loop = asyncio.get_running_loop()
+    transport = _async_transports.get(loop)
+    if transport is None:
+        transport = AsyncOllamaTransport(
+            max_connections_per_host=settings.ollama_pool_maxsize,
+            pool_timeout=settings.ollama_pool_timeout_sec,
+        )
+        _async_transports[loop] = transport
+    return transport
+
+
+async def close_async_transport() -> None:
+    transport = _async_transports.pop(asyncio.get_running_loop(), None)
+    if transport is not None:
+        await transport.aclose()
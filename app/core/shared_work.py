@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+
+class SharedWork:
+    """Counts of LLM/embedding work served without an upstream call, for one unit of work (e.g. an /ask/batch)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()  # asyncio.to_thread copies the context, so threads count into the same tally
+        self.counts: Dict[str, int] = {}
+
+    def add(self, kind: str) -> None:
+        with self._lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def get(self, kind: str) -> int:
+        with self._lock:
+            return self.counts.get(kind, 0)
+
+
+_current: ContextVar[Optional[SharedWork]] = ContextVar("shared_work", default=None)
+
+
+@contextmanager
+def track_shared_work() -> Iterator[SharedWork]:
+    """Tally shared work done in this context (and the tasks/threads started from it)."""
+    tally = SharedWork()
+    token = _current.set(tally)
+    try:
+        yield tally
+    finally:
+        _current.reset(token)
+
+
+def count_shared(kind: str) -> None:
+    """Record one unit of shared work (e.g. "llm_cache_hit", "coalesced:chat") against the current tally, if any."""
+    tally = _current.get()
+    if tally is not None:
+        tally.add(kind)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.core.shared_work import count_shared
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one execution.
+    The first caller (leader) runs fn; callers arriving while it is in flight
+    wait and receive the same result or exception. Shared results must be treated as read-only.
+    """
+
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        # async callers coalesce per event loop (futures cannot cross loops)
+        self._acalls: Dict[Tuple[int, str], asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.coalesced += 1
+                count_shared(f"coalesced:{self.name}")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Async counterpart of do(); fn is awaited once per key and loop while in flight."""
+        loop = asyncio.get_running_loop()
+        akey = (id(loop), key)
+        with self._lock:
+            fut = self._acalls.get(akey)
+            leader = fut is None
+            if leader:
+                fut = loop.create_future()
+                self._acalls[akey] = fut
+                self.executed += 1
+            else:
+                self.coalesced += 1
+                count_shared(f"coalesced:{self.name}")
+
+        if not leader:
+            # shield: a cancelled follower must not cancel the shared call
+            return await asyncio.shield(fut)
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                fut.cancel()
+            else:
+                fut.set_exception(e)
+                fut.exception()  # mark retrieved: with no followers nobody else reads it
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._acalls.pop(akey, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._calls) + len(self._acalls)
+        total = self.executed + self.coalesced
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
+
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_singleflight(name: str) -> SingleFlight:
+    """Process-wide group per call type (e.g. "chat", "embeddings")."""
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = SingleFlight(name)
+            _flights[name] = flight
+        return flight
+
+
+def singleflight_stats() -> Dict[str, Any]:
+    with _flights_lock:
+        snapshot = dict(_flights)
+    return {name: f.stats() for name, f in snapshot.items()}
@@ -1,9 +1,24 @@
 from __future__ import annotations
 
+import asyncio
+from contextlib import asynccontextmanager
+
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
+from app.core.answer_cache import answer_cache
 from app.core.config import settings
+from app.core.db import aclose_store, close_store, store_stats, vector_cache_stats
+from app.core.llm_cache import response_cache_stats
+from app.core.ollama_endpoints import endpoint_stats, start_health_checks, stop_health_checks
+from app.core.ollama_scheduler import OllamaBusyError, get_scheduler
+from app.core.ollama_transport import PoolTimeoutError, close_async_transport, get_transport
+from app.core.singleflight import singleflight_stats
+from app.services.job_service import JobQueueFull, ask_jobs
+from app.services.orchestrator_service import route_stats, speculation_stats
+from app.services.search_service import ann_stats, retrieval_cache
+from app.services.warmup_service import warmer
 from app.api.routes_ask import router as ask_router
 from app.api.routes_files import router as files_router
 from app.api.routes_runs import router as runs_router
@@ -11,7 +26,38 @@ from app.api.routes_runs import router as runs_router
 # Load .env early
 load_dotenv()
 
-app = FastAPI(title="AI Agent Orchestrator (Ollama)")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    start_health_checks(settings.ollama_health_interval_sec)
+    if settings.ollama_warmup_on_startup:
+        # Block startup until models are loaded so the first /ask never pays the load
+        try:
+            await asyncio.to_thread(warmer.warm_once)
+        except Exception:  # noqa: BLE001
+            pass
+    warmer.start()
+    yield
+    warmer.stop()
+    stop_health_checks()
+    await close_async_transport()
+    # Let running async /ask jobs finish before their writes are flushed
+    await asyncio.to_thread(ask_jobs.close)
+    await aclose_store()
+    # Persist buffered chat/run writes before the process exits
+    await asyncio.to_thread(close_store)
+
+
+app = FastAPI(title="AI Agent Orchestrator (Ollama)", lifespan=lifespan)
+
+
+@app.exception_handler(OllamaBusyError)
+@app.exception_handler(PoolTimeoutError)
+@app.exception_handler(JobQueueFull)
+def ollama_busy(_: Request, exc: Exception):
+    # Fail fast instead of piling up threads behind a saturated Ollama
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 
 @app.get("/health")
 def health():
@@ -21,6 +67,25 @@ def health():
         "storage": "mongo" if settings.mongo_uri else ("local_json" if not settings.require_mongo else "mongo_required_missing_uri"),
         "require_mongo": settings.require_mongo,
         "max_hops": settings.max_hops,
+        "ollama_models": warmer.status(),
+    }
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "ollama_endpoints": endpoint_stats(),
+        "ollama_transport": get_transport().stats(),
+        "ollama_scheduler": get_scheduler().stats(),
+        "llm_cache": response_cache_stats(),
+        "ollama_singleflight": singleflight_stats(),
+        "router": route_stats.stats(),
+        "speculative_retrieval": speculation_stats.stats(),
+        "answer_cache": answer_cache.stats(),
+        "store_writes": store_stats(),
+        "vector_cache": vector_cache_stats(),
+        "ann_index": ann_stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "ask_jobs": ask_jobs.stats(),
     }
 
 # Routers (NO extra prefixes because routes already include their own paths)
@@ -0,0 +1,92 @@
+"""
+Recall-vs-latency benchmark of the IVF AnnIndex against exact (brute-force) cosine search.
+
+    python -m app.repositories.ann_bench --vectors 100000 --dim 384 --queries 200
+
+Vectors are synthetic but clustered (documents about a few hundred topics), which is the
+shape real chunk embeddings have; uniformly random vectors would understate IVF recall.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from .ann_index import AnnIndex
+from .vector_index import _top_k, _unit
+
+
+def clustered(n: int, dim: int, topics: int, spread: float, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(topics, dim))
+    return centers[rng.integers(topics, size=n)] + spread * rng.normal(size=(n, dim))
+
+
+def _pct(samples: List[float], p: float) -> float:
+    return round(float(np.percentile(samples, p)), 3)
+
+
+def run(
+    vectors: int = 20_000,
+    dim: int = 128,
+    queries: int = 100,
+    top_k: int = 10,
+    topics: int = 200,
+    spread: float = 0.6,
+    nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32),
+    seed: int = 0,
+) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    data = clustered(vectors, dim, topics, spread, rng).astype(np.float32)
+    qs = clustered(queries, dim, topics, spread, rng)
+    unit = data / np.linalg.norm(data, axis=1, keepdims=True)
+    ids = list(range(vectors))
+
+    exact: List[set] = []
+    exact_ms: List[float] = []
+    for q in qs:
+        t0 = time.perf_counter()
+        hits = _top_k(unit, ids, _unit(q.tolist()), top_k)
+        exact_ms.append((time.perf_counter() - t0) * 1000.0)
+        exact.append({i for _, i in hits})
+
+    with tempfile.TemporaryDirectory() as root:
+        index = AnnIndex(root, min_train=min(vectors, 1024))
+        t0 = time.perf_counter()
+        index.add("bench", ((row.tolist(), {"chunk_index": i}) for i, row in enumerate(data)))
+        build_sec = time.perf_counter() - t0
+
+        rows = [{"nprobe": "exact", "recall": 1.0, "p50_ms": _pct(exact_ms, 50), "p95_ms": _pct(exact_ms, 95)}]
+        for nprobe in nprobes:
+            recalls, ms = [], []
+            for q, truth in zip(qs, exact):
+                t0 = time.perf_counter()
+                hits = index.search("bench", q.tolist(), top_k, nprobe=nprobe)
+                ms.append((time.perf_counter() - t0) * 1000.0)
+                recalls.append(len(truth & {m["chunk_index"] for _, m in hits}) / top_k)
+            rows.append({"nprobe": nprobe, "recall": round(float(np.mean(recalls)), 4), "p50_ms": _pct(ms, 50), "p95_ms": _pct(ms, 95)})
+
+    return {"vectors": vectors, "dim": dim, "top_k": top_k, "build_sec": round(build_sec, 2), "results": rows}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    report = run(args.vectors, args.dim, args.queries, args.top_k, args.topics, nprobes=args.nprobe)
+    print(f"{report['vectors']} vectors x {report['dim']} dims, top_k={report['top_k']}, build {report['build_sec']}s")
+    print(f"{'nprobe':>8} {'recall':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in report["results"]:
+        print(f"{r['nprobe']:>8} {r['recall']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .vector_index import _top_k, _unit
+
+try:  # cross-process writer lock (POSIX); threads are serialized either way
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+# (embedding, chunk) as yielded by Store.iter_embeddings
+Pair = Tuple[Optional[List[float]], Dict[str, Any]]
+
+
+def _hit_meta(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "source_type": "file",
+        "source": chunk.get("filename", chunk.get("file_id", "unknown")),
+        "file_id": chunk.get("file_id"),
+        "chunk_index": chunk.get("chunk_index"),
+        "snippet": (chunk.get("content") or "")[:800].replace("\n", " ").strip(),
+    }
+
+
+def _kmeans(sample: np.ndarray, nlist: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over unit rows; returns unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        norms = np.linalg.norm(sums, axis=1)
+        empty = norms == 0
+        # empty lists are re-seeded from random rows instead of collapsing
+        sums[empty] = sample[rng.integers(sample.shape[0], size=int(empty.sum()))]
+        norms[empty] = 1.0
+        centroids = (sums / norms[:, None]).astype(np.float32)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], block):
+        labels[start : start + block] = np.argmax(vectors[start : start + block] @ centroids.T, axis=1)
+    return labels
+
+
+class _View:
+    """A read-only snapshot of one user's index files (memory-mapped)."""
+
+    def __init__(self, path: str, manifest: Dict[str, Any]):
+        self.stamp = manifest["generation"]
+        self.count = int(manifest["count"])
+        self.dim = int(manifest["dim"])
+        self.path = path
+        self.vectors: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        self.order: Optional[np.ndarray] = None
+        self.bounds: Optional[np.ndarray] = None
+        if self.count == 0:
+            return
+
+        # files may hold a torn tail past `count`; the manifest is what readers trust
+        self.vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        self.offsets = np.memmap(os.path.join(path, "offsets.u64"), dtype=np.uint64, mode="r", shape=(self.count,))
+        train = manifest.get("train")
+        if train:
+            self.centroids = np.load(os.path.join(path, f"centroids-{train}.npy"), mmap_mode="r")
+            labels = np.memmap(os.path.join(path, f"assign-{train}.i32"), dtype=np.int32, mode="r", shape=(self.count,))
+            # inverted lists: row ids grouped by list, list c is order[bounds[c]:bounds[c + 1]]
+            self.order = np.argsort(labels, kind="stable")
+            self.bounds = np.searchsorted(labels[self.order], np.arange(self.centroids.shape[0] + 1))
+
+    def candidates(self, q: np.ndarray, nprobe: int) -> Optional[np.ndarray]:
+        """Row ids in the `nprobe` lists closest to q; None means scan everything."""
+        if self.centroids is None:
+            return None
+        nprobe = min(nprobe, self.centroids.shape[0])
+        scores = self.centroids @ q
+        probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.bounds[c] : self.bounds[c + 1]] for c in probes])
+
+    def metas(self, rows: List[int]) -> List[Dict[str, Any]]:
+        out = []
+        with open(os.path.join(self.path, "chunks.jsonl"), "rb") as f:
+            for row in rows:
+                f.seek(int(self.offsets[row]))
+                out.append(json.loads(f.readline()))
+        return out
+
+
+class AnnIndex:
+    """
+    IVF (inverted file) approximate nearest-neighbour index over chunk embeddings, one
+    directory per user under `root`:
+
+      manifest.json          count, dim, current training generation (atomically replaced)
+      vectors.f32            unit float32 rows, append-only, memory-mapped by readers
+      chunks.jsonl           hit metadata per row, with byte offsets in offsets.u64
+      centroids-<gen>.npy    spherical k-means centroids (~sqrt(count) lists)
+      assign-<gen>.i32       list id per row
+
+    Below `min_train` vectors a user is searched exactly. Once trained, a query scores the
+    centroids and scans only the `nprobe` nearest lists. New vectors are appended and assigned
+    to their nearest centroid; the lists are retrained when the user's vector count has doubled
+    since the last training. Every uvicorn worker maps the same files (the page cache is shared)
+    and picks up other workers' appends when manifest.json changes.
+    """
+
+    def __init__(self, root: str, min_train: int = 1024, nprobe: int = 16, max_train_sample: int = 50_000):
+        self.root = root
+        self.min_train = max(1, int(min_train))
+        self.nprobe = max(1, int(nprobe))
+        self.max_train_sample = max(1, int(max_train_sample))
+        self._lock = threading.Lock()
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self._views: Dict[str, _View] = {}
+        self.searches = 0
+        self.scanned = 0
+
+    # -------------------- files --------------------
+
+    def _dir(self, user_id: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:20])
+
+    @staticmethod
+    def _read_manifest(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_manifest(path: str, manifest: Dict[str, Any]) -> None:
+        tmp = os.path.join(path, "manifest.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(path, "manifest.json"))
+
+    @contextmanager
+    def _writing(self, user_id: str) -> Iterator[str]:
+        with self._lock:
+            lock = self._user_locks.setdefault(user_id, threading.Lock())
+        path = self._dir(user_id)
+        os.makedirs(path, exist_ok=True)
+        with lock, open(os.path.join(path, "lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            yield path
+
+    # -------------------- writes --------------------
+
+    def exists(self, user_id: str) -> bool:
+        return os.path.exists(os.path.join(self._dir(user_id), "manifest.json"))
+
+    def add(self, user_id: str, pairs: Iterable[Pair]) -> int:
+        """Append (embedding, chunk) pairs; returns how many were indexed. Creates the index if needed."""
+        with self._writing(user_id) as path:
+            return self._add(path, user_id, self._read_manifest(path), pairs)
+
+    def ensure(self, user_id: str, load: Callable[[], Iterable[Pair]]) -> None:
+        """Build the user's index from `load()` unless it exists (concurrent callers build it once)."""
+        if self.exists(user_id):
+            return
+        with self._writing(user_id) as path:
+            if self._read_manifest(path) is None:
+                self._add(path, user_id, None, load())
+
+    def _add(self, path: str, user_id: str, manifest: Optional[Dict[str, Any]], pairs: Iterable[Pair], batch: int = 4096) -> int:
+        manifest = manifest or {
+            "user_id": user_id, "dim": 0, "count": 0, "meta_bytes": 0, "train": 0, "trained_count": 0, "generation": 0,
+        }
+        self._truncate_tail(path, manifest)
+        added = 0
+        rows: List[np.ndarray] = []
+        metas: List[Dict[str, Any]] = []
+        for embedding, chunk in pairs:
+            vec = _unit(embedding) if embedding else None
+            if vec is None or (manifest["dim"] and vec.shape[0] != manifest["dim"]):
+                continue  # no embedding, or one from a different embed model
+            manifest["dim"] = manifest["dim"] or int(vec.shape[0])
+            rows.append(vec)
+            metas.append(_hit_meta(chunk))
+            if len(rows) >= batch:
+                added += self._append(path, manifest, rows, metas)
+                rows, metas = [], []
+        added += self._append(path, manifest, rows, metas)
+
+        count, trained = manifest["count"], manifest["trained_count"]
+        if (not trained and count >= self.min_train) or (trained and count >= 2 * trained):
+            self._train(path, manifest)
+        manifest["generation"] += 1
+        self._write_manifest(path, manifest)
+        return added
+
+    @staticmethod
+    def _truncate_tail(path: str, manifest: Dict[str, Any]) -> None:
+        # drop bytes a crashed writer appended without committing them to the manifest
+        sizes = {
+            "vectors.f32": manifest["count"] * manifest["dim"] * 4,
+            "offsets.u64": manifest["count"] * 8,
+            "chunks.jsonl": manifest["meta_bytes"],
+        }
+        if manifest["train"]:
+            sizes[f"assign-{manifest['train']}.i32"] = manifest["count"] * 4
+        for name, size in sizes.items():
+            file = os.path.join(path, name)
+            if os.path.exists(file) and os.path.getsize(file) > size:
+                os.truncate(file, size)
+
+    def _append(self, path: str, manifest: Dict[str, Any], rows: List[np.ndarray], metas: List[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        matrix = np.vstack(rows).astype(np.float32)
+        offsets = np.empty(len(metas), dtype=np.uint64)
+        pos = manifest["meta_bytes"]
+        with open(os.path.join(path, "chunks.jsonl"), "ab") as f:
+            for i, meta in enumerate(metas):
+                line = (json.dumps(meta, ensure_ascii=False) + "\n").encode("utf-8")
+                offsets[i] = pos
+                f.write(line)
+                pos += len(line)
+        with open(os.path.join(path, "offsets.u64"), "ab") as f:
+            f.write(offsets.tobytes())
+        with open(os.path.join(path, "vectors.f32"), "ab") as f:
+            f.write(matrix.tobytes())
+        if manifest["train"]:
+            centroids = np.load(os.path.join(path, f"centroids-{manifest['train']}.npy"))
+            with open(os.path.join(path, f"assign-{manifest['train']}.i32"), "ab") as f:
+                f.write(_assign(matrix, centroids).tobytes())
+        manifest["count"] += len(rows)
+        manifest["meta_bytes"] = pos
+        return len(rows)
+
+    def _train(self, path: str, manifest: Dict[str, Any]) -> None:
+        count, dim = manifest["count"], manifest["dim"]
+        vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(count, dim))
+        rng = np.random.default_rng(count)
+        sample_rows = np.sort(rng.choice(count, min(count, self.max_train_sample), replace=False))
+        sample = np.asarray(vectors[sample_rows])
+        nlist = max(1, min(int(round(np.sqrt(count))), sample.shape[0]))
+        centroids = _kmeans(sample, nlist)
+
+        previous, train = manifest["train"], manifest["train"] + 1
+        np.save(os.path.join(path, f"centroids-{train}.npy"), centroids)
+        _assign(vectors, centroids).tofile(os.path.join(path, f"assign-{train}.i32"))
+        manifest["train"], manifest["trained_count"] = train, count
+        if previous:
+            # readers that already mapped the old generation keep their mapping until they reload
+            for name in (f"centroids-{previous}.npy", f"assign-{previous}.i32"):
+                try:
+                    os.remove(os.path.join(path, name))
+                except FileNotFoundError:
+                    pass
+
+    # -------------------- reads --------------------
+
+    def _view(self, user_id: str) -> Optional[_View]:
+        path = self._dir(user_id)
+        for _ in range(2):
+            manifest = self._read_manifest(path)
+            if manifest is None:
+                return None
+            with self._lock:
+                view = self._views.get(user_id)
+            if view is not None and view.stamp == manifest["generation"]:
+                return view
+            try:
+                view = _View(path, manifest)
+            except FileNotFoundError:
+                continue  # retrained between reading the manifest and opening its files
+            with self._lock:
+                self._views[user_id] = view
+            return view
+        return None
+
+    def search(self, user_id: str, query_embedding: List[float], top_k: int, nprobe: Optional[int] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """(cosine, hit metadata) for the approximate top_k, best first."""
+        view = self._view(user_id)
+        q = _unit(query_embedding) if query_embedding else None
+        if view is None or view.vectors is None or q is None or q.shape[0] != view.dim:
+            return []
+
+        rows = view.candidates(q, nprobe or self.nprobe)
+        if rows is None:
+            rows, matrix = np.arange(view.count), view.vectors
+        else:
+            rows = np.sort(rows)  # ascending row ids read the mapping sequentially
+            matrix = view.vectors[rows]
+        with self._lock:
+            self.searches += 1
+            self.scanned += int(rows.shape[0])
+        top = _top_k(matrix, rows, q, top_k)
+        metas = view.metas([int(row) for _, row in top])
+        return [(score, meta) for (score, _), meta in zip(top, metas)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            views = list(self._views.values())
+            return {
+                "users_loaded": len(views),
+                "vectors": sum(v.count for v in views),
+                "trained_users": sum(1 for v in views if v.centroids is not None),
+                "searches": self.searches,
+                "avg_scanned": round(self.scanned / self.searches, 1) if self.searches else 0.0,
+            }
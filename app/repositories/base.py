@@ -1,11 +1,55 @@
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# A buffered chat/run write (see WriteBehindStore):
+# {"op": "append_chat"|"create_run"|"append_run_step"|"finalize_run"|"set_run_status", "id", ...}
+# "id" is generated when the op is enqueued, so a store can apply a retried op idempotently.
+WriteOp = Dict[str, Any]
+
+
+def fold_writes(ops: List[WriteOp]) -> Tuple[List[WriteOp], "OrderedDict[str, Dict[str, Any]]"]:
+    """
+    Split a batch into chat inserts and per-run writes, folding each run's ops together:
+    run_id -> {"create": op|None, "steps": [...], "step_ids": [op id per step], "final": op|None,
+    "status": fields|None}. "status" holds the status set after the last finalize, so it wins over it.
+    A run created, stepped and finalized within one batch becomes a single insert.
+    """
+    chats: List[WriteOp] = []
+    runs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    for op in ops:
+        if op["op"] == "append_chat":
+            chats.append(op)
+            continue
+        run = runs.setdefault(op["run_id"], {"create": None, "steps": [], "step_ids": [], "final": None, "status": None})
+        if op["op"] == "create_run":
+            run["create"] = op
+        elif op["op"] == "append_run_step":
+            run["steps"].append({"agent": op["agent"], "output": op["output"]})
+            run["step_ids"].append(op.get("id"))
+        elif op["op"] == "finalize_run":
+            run["final"] = op
+            run["status"] = None
+        elif op["op"] == "set_run_status":
+            run["status"] = run_status_fields(op["status"], op.get("error"))
+    return chats, runs
+
+
+def run_status_fields(status: str, error: Optional[str] = None) -> Dict[str, Any]:
+    return {"status": status, "error": error} if error else {"status": status}
 
 
 class Store(ABC):
-    """Storage abstraction. Implemented by MongoStore and LocalJsonStore."""
+    """
+    Storage abstraction. Implemented by MongoStore and LocalJsonStore.
+
+    The a* methods are the async interface used by the async request path. By default
+    they run the sync method in a worker thread; stores with a native async driver override them.
+    """
 
     @abstractmethod
     def append_chat(self, user_id: str, role: str, text: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -31,6 +75,21 @@ class Store(ABC):
     ) -> None:
         raise NotImplementedError
 
+    def add_chunks(self, user_id: str, file_id: str, filename: str, chunks: List[Tuple[str, Optional[List[float]]]]) -> None:
+        """Store one file's chunks ((content, embedding), in chunk order). Stores override this with a bulk write."""
+        for idx, (content, embedding) in enumerate(chunks):
+            self.add_chunk(user_id, file_id, filename, idx, content, embedding)
+
+    def corpus_version(self, user_id: str) -> int:
+        """
+        Counter that changes whenever the user's files or chunks change; caches of data derived
+        from the corpus key on it. Stores shared by several processes keep it in the database.
+        """
+        return 0
+
+    async def acorpus_version(self, user_id: str) -> int:
+        return await asyncio.to_thread(self.corpus_version, user_id)
+
     @abstractmethod
     def search(
         self,
@@ -40,3 +99,99 @@ class Store(ABC):
         query_embedding: Optional[List[float]] = None,
     ) -> List[Dict[str, Any]]:
         raise NotImplementedError
+
+    def search_chats(self, user_id: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Chat-history hits (source_type "chat"), the ones search() appends after the file chunks."""
+        return []
+
+    def vector_search(self, user_id: str, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        """File-chunk hits ranked by embedding similarity (hybrid retrieval); [] where the store has no vector search."""
+        return []
+
+    def iter_embeddings(self, user_id: str) -> Iterator[Tuple[Optional[List[float]], Dict[str, Any]]]:
+        """(embedding, chunk) for the user's embedded chunks; used to (re)build vector indexes."""
+        return iter(())
+
+    # -------------------- workflow runs --------------------
+
+    @abstractmethod
+    def create_run(self, user_id: str, input_text: str, run_id: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_run_step(self, run_id: str, agent: str, output: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def finalize_run(self, run_id: str, final_reply: str, agent_path: List[str], confidence: float) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_run_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        """Set a run's status ("queued", "running", "failed", ...) outside of finalize_run (async jobs)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_runs(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def is_transient_error(self, exc: BaseException) -> bool:
+        """True for errors worth retrying as they are (store unreachable); anything else may be a bad write."""
+        return isinstance(exc, OSError)
+
+    def apply_writes(self, ops: List[WriteOp]) -> None:
+        """Apply buffered writes in order. Stores override this with a bulk write."""
+        for op in ops:
+            kind = op["op"]
+            if kind == "append_chat":
+                self.append_chat(op["user_id"], op["role"], op["text"], op.get("meta"))
+            elif kind == "create_run":
+                self.create_run(op["user_id"], op["input_text"], run_id=op["run_id"])
+            elif kind == "append_run_step":
+                self.append_run_step(op["run_id"], op["agent"], op["output"])
+            elif kind == "finalize_run":
+                self.finalize_run(op["run_id"], op["final_reply"], op["agent_path"], op["confidence"])
+            elif kind == "set_run_status":
+                self.set_run_status(op["run_id"], op["status"], op.get("error"))
+
+    # -------------------- async interface --------------------
+
+    async def aappend_chat(self, user_id: str, role: str, text: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.append_chat, user_id, role, text, meta)
+
+    async def aget_recent_chats(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get_recent_chats, user_id, limit)
+
+    async def asearch(
+        self,
+        user_id: str,
+        query: str,
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.search, user_id, query, top_k, query_embedding)
+
+    async def asearch_chats(self, user_id: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.search_chats, user_id, query, top_k)
+
+    async def avector_search(self, user_id: str, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.vector_search, user_id, query_embedding, top_k)
+
+    async def acreate_run(self, user_id: str, input_text: str, run_id: Optional[str] = None) -> str:
+        return await asyncio.to_thread(self.create_run, user_id, input_text, run_id)
+
+    async def aappend_run_step(self, run_id: str, agent: str, output: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self.append_run_step, run_id, agent, output)
+
+    async def afinalize_run(self, run_id: str, final_reply: str, agent_path: List[str], confidence: float) -> None:
+        await asyncio.to_thread(self.finalize_run, run_id, final_reply, agent_path, confidence)
+
+    async def aset_run_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        await asyncio.to_thread(self.set_run_status, run_id, status, error)
+
+    async def aclose(self) -> None:
+        """Release what the async interface holds on the running event loop (app shutdown)."""
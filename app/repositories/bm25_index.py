@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+
+from .record_log import FSYNC_POLICIES
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+class _UserPostings:
+    def __init__(self) -> None:
+        self.postings: Dict[str, Dict[int, int]] = {}  # term -> {doc_id: term frequency}
+        self.doc_len: Dict[int, int] = {}
+        self.docs: Dict[int, Dict[str, Any]] = {}
+        self.total_len = 0
+
+    def add(self, doc_id: int, tf: Dict[str, int], meta: Dict[str, Any]) -> None:
+        if doc_id in self.doc_len:
+            return
+        for term, n in tf.items():
+            self.postings.setdefault(term, {})[doc_id] = n
+        length = sum(tf.values())
+        self.doc_len[doc_id] = length
+        self.total_len += length
+        self.docs[doc_id] = meta
+
+
+class BM25Index:
+    """
+    Per-user inverted index over file chunks with BM25 scoring.
+
+    Postings, document lengths and the df/avgdl statistics live in memory; every added chunk is
+    also appended, already tokenized, to `path` (one JSON line per chunk), which is replayed once
+    on load. A query only touches the postings of its own terms.
+
+    The log is written through one open handle and follows the same fsync policy as RecordLog
+    ("always" | "interval" | "never"); with "interval" the owner calls sync() on a timer.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        k1: float = 1.5,
+        b: float = 0.75,
+        fsync: str = "interval",
+        fsync_interval_sec: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = path
+        self.k1 = float(k1)
+        self.b = float(b)
+        self.fsync = fsync
+        self.fsync_interval_sec = float(fsync_interval_sec)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._users: Dict[str, _UserPostings] = {}
+        self._file: Optional[IO[bytes]] = None
+        self._dirty = False
+        self._last_sync = clock()
+        self.docs = 0
+        self.syncs = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break  # torn last line from a crash; the owner sees the short count and rebuilds
+                self._apply(rec)
+
+    def _apply(self, rec: Dict[str, Any]) -> None:
+        user = self._users.setdefault(rec["user_id"], _UserPostings())
+        if rec["doc_id"] not in user.doc_len:
+            self.docs += 1
+        user.add(rec["doc_id"], rec["tf"], rec["meta"])
+
+    def add(self, user_id: str, doc_id: int, content: str, meta: Dict[str, Any]) -> None:
+        """Index one chunk and append it to the postings log."""
+        self.add_many(user_id, [(doc_id, content, meta)])
+
+    def add_many(self, user_id: str, docs: List[Tuple[int, str, Dict[str, Any]]]) -> None:
+        """Index (doc_id, content, meta) chunks with a single write to the postings log."""
+        recs = [{"user_id": user_id, "doc_id": doc_id, "tf": dict(Counter(tokenize(content))), "meta": meta} for doc_id, content, meta in docs]
+        if not recs:
+            return
+        data = "".join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in recs).encode("utf-8")
+        with self._lock:
+            for rec in recs:
+                self._apply(rec)
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            self._file.write(data)
+            self._file.flush()
+            self._dirty = True
+            if self.fsync == "always" or (self.fsync == "interval" and self._clock() - self._last_sync >= self.fsync_interval_sec):
+                self._sync()
+
+    def _sync(self) -> None:
+        if self._file is not None and self._dirty and self.fsync != "never":
+            os.fsync(self._file.fileno())
+            self.syncs += 1
+        self._dirty = False
+        self._last_sync = self._clock()
+
+    def sync(self) -> None:
+        with self._lock:
+            self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            self._sync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def rebuild(self, docs: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """
+        Re-index (user_id, content, meta) docs, numbered by position, and rewrite the log
+        (first run over an existing store, or after a crash left the log behind).
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._users = {}
+            self.docs = 0
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for doc_id, (user_id, content, meta) in enumerate(docs):
+                    rec = {"user_id": user_id, "doc_id": doc_id, "tf": dict(Counter(tokenize(content))), "meta": meta}
+                    self._apply(rec)
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                f.flush()
+                if self.fsync != "never":
+                    os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+    def search(self, user_id: str, query: str, top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        """(BM25 score, chunk meta) for the top_k chunks, best first; chunks sharing no term are not scored."""
+        terms = set(tokenize(query))
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None or not user.doc_len or not terms:
+                return []
+            n = len(user.doc_len)
+            avgdl = user.total_len / n if user.total_len else 1.0
+            scores: Dict[int, float] = {}
+            for term in terms:
+                posting = user.postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = tf + self.k1 * (1.0 - self.b + self.b * user.doc_len[doc_id] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / norm
+            best = heapq.nlargest(int(top_k), scores.items(), key=lambda kv: kv[1])
+            return [(score, user.docs[doc_id]) for doc_id, score in best]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "docs": self.docs,
+                "syncs": self.syncs,
+                "terms": sum(len(u.postings) for u in self._users.values()),
+            }
+
@@ -2,60 +2,210 @@ from __future__ import annotations
 
 import json
 import os
+import threading
 import uuid
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from .base import Store
+from .base import Store, WriteOp, fold_writes, run_status_fields
+from .bm25_index import BM25Index
+from .record_log import RecordLog
+from .vector_index import VectorIndex
 
 
 def _now_iso() -> str:
     return datetime.utcnow().isoformat() + "Z"
 
 
+def _iso(at: Optional[datetime]) -> str:
+    return at.isoformat() + "Z" if at else _now_iso()
+
+
 class LocalJsonStore(Store):
-    """File-based storage (storage/index.json, storage/chats.json). Good for demo/offline use."""
+    """
+    Log-structured local storage for demo/offline use. Files, chunks, chats and runs are
+    append-only JSONL segments under storage/log/<kind>/ (RecordLog); the state is replayed into
+    memory on startup, so a write appends one line and reads never touch disk. With the
+    "interval" fsync policy a background thread syncs the logs every `fsync_interval_sec`, so
+    idle periods do not leave records unsynced. The runs log (several records per run) is
+    compacted once most of its records are superseded; there is no compaction schedule, the
+    check runs on each runs write and after the startup replay. Lexical search uses the BM25
+    postings log storage/bm25_postings.jsonl.
+    Legacy index.json / chats.json / runs.json are imported once, when the logs are empty.
+    """
+
+    LOGS = ("files", "chunks", "chats", "runs")
 
-    def __init__(self, storage_dir: str):
+    def __init__(
+        self,
+        storage_dir: str,
+        fsync: str = "interval",
+        fsync_interval_sec: float = 1.0,
+        segment_mb: float = 64,
+        compact_min_records: int = 10_000,
+    ):
         self.storage_dir = storage_dir
         os.makedirs(self.storage_dir, exist_ok=True)
         self._chats_path = os.path.join(self.storage_dir, "chats.json")
         self._index_path = os.path.join(self.storage_dir, "index.json")
+        self._runs_path = os.path.join(self.storage_dir, "runs.json")
+        self._bm25_path = os.path.join(self.storage_dir, "bm25_postings.jsonl")
+        self.compact_min_records = max(1, int(compact_min_records))
+        self._fsync = fsync
+        self._fsync_interval_sec = float(fsync_interval_sec)
+        # log appends and the in-memory state they mirror change together
+        self._lock = threading.RLock()
+        self._logs = {
+            kind: RecordLog(
+                os.path.join(self.storage_dir, "log", kind),
+                segment_bytes=int(segment_mb * 1024 * 1024),
+                fsync=fsync,
+                fsync_interval_sec=fsync_interval_sec,
+            )
+            for kind in self.LOGS
+        }
+        self._files: List[Dict[str, Any]] = []
+        # position in this list is the chunk's BM25 doc id
+        self._chunks: List[Dict[str, Any]] = []
+        self._chats: Dict[str, List[Dict[str, Any]]] = {}
+        # write ids of buffered chats already logged, so a retried batch does not log them twice
+        self._chat_write_ids: set = set()
+        self._runs: Dict[str, Dict[str, Any]] = {}
+        # corpus_version() per user; this store is single-process, so memory is the shared place
+        self._versions: Dict[str, int] = {}
+        # chunk embeddings for semantic search, built from the chunks on first use
+        self._vectors: Optional[VectorIndex] = None
+        # inverted index for lexical search, loaded from bm25_postings.jsonl on first use
+        self._bm25: Optional[BM25Index] = None
+        self._load()
+
+        self._stop = threading.Event()
+        self._syncer: Optional[threading.Thread] = None
+        if fsync == "interval" and fsync_interval_sec > 0:
+            self._syncer = threading.Thread(target=self._sync_loop, args=(float(fsync_interval_sec),), name="local-store-fsync", daemon=True)
+            self._syncer.start()
+
+    # -------------------- log replay --------------------
+
+    def _load(self) -> None:
+        self._files.extend(self._logs["files"].load())
+        self._chunks.extend(self._logs["chunks"].load())
+        for doc in self._logs["chats"].load():
+            self._chats.setdefault(doc.get("user_id"), []).append(doc)
+            if doc.get("write_id"):
+                self._chat_write_ids.add(doc["write_id"])
+        for rec in self._logs["runs"].load():
+            self._apply_run(rec)
+        if not any(log.records for log in self._logs.values()):
+            self._import_legacy()
+        self._maybe_compact_runs()
+
+    def _import_legacy(self) -> None:
+        """One-time import of the pre-log whole-file JSON storage."""
+        def read(path: str, default: Any) -> Any:
+            if not os.path.exists(path):
+                return default
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        index = read(self._index_path, {})
+        chats = read(self._chats_path, [])
+        runs = read(self._runs_path, {})
+        for kind, docs in (("files", index.get("files", [])), ("chunks", index.get("chunks", [])), ("chats", chats)):
+            if docs:
+                self._log(kind, list(docs))
+        if runs:
+            self._log_runs([{"op": "create", "run": run} for run in runs.values()])
+        for log in self._logs.values():
+            log.sync()
+
+    def _log(self, kind: str, docs: List[Dict[str, Any]]) -> None:
+        self._logs[kind].append(docs)
+        if kind in ("files", "chunks"):
+            for user_id in {doc.get("user_id") for doc in docs}:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        for doc in docs:
+            if kind == "files":
+                self._files.append(doc)
+            elif kind == "chunks":
+                self._chunks.append(doc)
+            elif kind == "chats":
+                self._chats.setdefault(doc.get("user_id"), []).append(doc)
+                if doc.get("write_id"):
+                    self._chat_write_ids.add(doc["write_id"])
+
+    # runs log records: {"op": "create", "run"} | {"op": "steps", "run_id", "steps"} | {"op": "final"|"status", "run_id", "fields"}
+    def _apply_run(self, rec: Dict[str, Any]) -> None:
+        if rec["op"] == "create":
+            self._runs[rec["run"]["run_id"]] = rec["run"]
+            return
+        run = self._runs.get(rec["run_id"])
+        if run is None:
+            return
+        if rec["op"] == "steps":
+            run["steps"].extend(rec["steps"])
+        elif rec["op"] in ("final", "status"):
+            run.update(rec["fields"])
 
-        if not os.path.exists(self._chats_path):
-            with open(self._chats_path, "w", encoding="utf-8") as f:
-                json.dump([], f)
-        if not os.path.exists(self._index_path):
-            with open(self._index_path, "w", encoding="utf-8") as f:
-                json.dump({"files": [], "chunks": []}, f)
+    def _log_runs(self, records: List[Dict[str, Any]]) -> None:
+        log = self._logs["runs"]
+        log.append(records)
+        for rec in records:
+            self._apply_run(rec)
+        self._maybe_compact_runs()
 
-    def _read_json(self, path: str) -> Any:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    def _maybe_compact_runs(self) -> None:
+        # steps and finals are superseded by a compacted "create" holding the whole run
+        log = self._logs["runs"]
+        superseded = log.records - len(self._runs)
+        if superseded >= self.compact_min_records and superseded > len(self._runs):
+            log.compact({"op": "create", "run": run} for run in self._runs.values())
 
-    def _write_json(self, path: str, obj: Any) -> None:
-        tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(obj, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, path)
+    def corpus_version(self, user_id: str) -> int:
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def _sync_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            with self._lock:
+                for log in self._logs.values():
+                    log.sync()  # no-op unless something was appended since the last sync
+                if self._bm25 is not None:
+                    self._bm25.sync()
+
+    def close(self) -> None:
+        """Stop the syncer, then sync and close the logs (app shutdown)."""
+        self._stop.set()
+        if self._syncer is not None:
+            self._syncer.join(timeout=5)
+        with self._lock:
+            for log in self._logs.values():
+                log.sync()
+                log.close()
+            if self._bm25 is not None:
+                self._bm25.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {kind: log.stats() for kind, log in self._logs.items()}
+
+    # -------------------- chats, files, chunks --------------------
 
     def append_chat(self, user_id: str, role: str, text: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        chats = self._read_json(self._chats_path)
         doc = {"user_id": user_id, "role": role, "text": text, "meta": meta or {}, "created_at": _now_iso()}
-        chats.append(doc)
-        self._write_json(self._chats_path, chats)
-        return doc
+        with self._lock:
+            self._log("chats", [doc])
+        return dict(doc)
 
     def get_recent_chats(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
-        chats = self._read_json(self._chats_path)
-        user_chats = [c for c in chats if c.get("user_id") == user_id]
-        return list(reversed(user_chats[-limit:]))
+        with self._lock:
+            user_chats = self._chats.get(user_id, [])[-limit:] if limit > 0 else []
+            return [dict(c) for c in reversed(user_chats)]
 
     def create_file(self, user_id: str, filename: str, content_type: str) -> str:
-        idx = self._read_json(self._index_path)
         file_id = str(uuid.uuid4())
-        idx["files"].append({"user_id": user_id, "file_id": file_id, "filename": filename, "content_type": content_type, "created_at": _now_iso()})
-        self._write_json(self._index_path, idx)
+        with self._lock:
+            self._log("files", [{"user_id": user_id, "file_id": file_id, "filename": filename, "content_type": content_type, "created_at": _now_iso()}])
         return file_id
 
     def add_chunk(
@@ -67,54 +217,195 @@ class LocalJsonStore(Store):
         content: str,
         embedding: Optional[List[float]] = None,
     ) -> None:
-        idx = self._read_json(self._index_path)
-        idx["chunks"].append(
-            {
-                "user_id": user_id,
-                "file_id": file_id,
-                "filename": filename,
-                "chunk_index": chunk_index,
-                "content": content,
-                "embedding": embedding,
-            }
-        )
-        self._write_json(self._index_path, idx)
+        chunk = {
+            "user_id": user_id,
+            "file_id": file_id,
+            "filename": filename,
+            "chunk_index": chunk_index,
+            "content": content,
+            "embedding": embedding,
+        }
+        with self._lock:
+            bm25 = self._bm25_index()
+            doc_id = len(self._chunks)
+            self._log("chunks", [chunk])
+            bm25.add(user_id, doc_id, content, self._bm25_meta(chunk))
+            if self._vectors is not None:
+                self._vectors.add(user_id, embedding, self._vector_meta(chunk))
 
-    def search(self, user_id: str, query: str, top_k: int = 5, query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
-        idx = self._read_json(self._index_path)
-        chunks = [c for c in idx.get("chunks", []) if c.get("user_id") == user_id]
-        q = (query or "").lower()
+    def add_chunks(self, user_id: str, file_id: str, filename: str, chunks: List[Tuple[str, Optional[List[float]]]]) -> None:
+        """One chunks-log append and one postings write for the whole file."""
+        docs = [
+            {"user_id": user_id, "file_id": file_id, "filename": filename, "chunk_index": idx, "content": content, "embedding": embedding}
+            for idx, (content, embedding) in enumerate(chunks)
+        ]
+        if not docs:
+            return
+        with self._lock:
+            bm25 = self._bm25_index()
+            first = len(self._chunks)
+            self._log("chunks", docs)
+            bm25.add_many(user_id, [(first + i, c["content"], self._bm25_meta(c)) for i, c in enumerate(docs)])
+            if self._vectors is not None:
+                for c in docs:
+                    self._vectors.add(user_id, c["embedding"], self._vector_meta(c))
 
-        def score_text(c: Dict[str, Any]) -> float:
-            text = (c.get("content") or "").lower()
-            if not q:
-                return 0.0
-            # simple term frequency score
-            return sum(text.count(tok) for tok in q.split() if tok)
+    @staticmethod
+    def _vector_meta(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: chunk.get(k) for k in ("file_id", "filename", "chunk_index", "content")}
 
-        scored = []
-        for c in chunks:
-            s = score_text(c)
-            if s > 0:
-                scored.append((s, c))
-        scored.sort(key=lambda x: x[0], reverse=True)
-
-        hits: List[Dict[str, Any]] = []
-        for s, c in scored[:top_k]:
-            hits.append(
-                {
-                    "source_type": "file",
-                    "source": c.get("filename", c.get("file_id", "unknown")),
-                    "file_id": c.get("file_id"),
-                    "chunk_index": c.get("chunk_index"),
-                    "score": float(s),
-                    "snippet": (c.get("content") or "")[:800].replace("\n", " ").strip(),
-                }
-            )
+    @staticmethod
+    def _bm25_meta(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        # what a hit needs: the snippet is the first 800 characters anyway
+        return {"file_id": chunk.get("file_id"), "filename": chunk.get("filename"), "chunk_index": chunk.get("chunk_index"), "content": (chunk.get("content") or "")[:800]}
+
+    def _bm25_index(self) -> BM25Index:
+        """Load the persisted postings once; rebuild them if they do not cover the chunks log (upgrade or crash)."""
+        if self._bm25 is None:
+            with self._lock:
+                if self._bm25 is None:
+                    bm25 = BM25Index(self._bm25_path, fsync=self._fsync, fsync_interval_sec=self._fsync_interval_sec)
+                    if bm25.docs != len(self._chunks):
+                        bm25.rebuild([(c.get("user_id"), c.get("content") or "", self._bm25_meta(c)) for c in self._chunks])
+                    self._bm25 = bm25
+        return self._bm25
+
+    def _vector_index(self) -> VectorIndex:
+        """Build the in-memory embedding index once; add_chunk keeps it current afterwards."""
+        if self._vectors is None:
+            with self._lock:
+                if self._vectors is None:
+                    vectors = VectorIndex()
+                    for c in self._chunks:
+                        vectors.add(c.get("user_id"), c.get("embedding"), self._vector_meta(c))
+                    self._vectors = vectors
+        return self._vectors
 
-        # also search chats
-        chats = self._read_json(self._chats_path)
-        user_chats = [c for c in chats if c.get("user_id") == user_id]
+    def iter_embeddings(self, user_id: str) -> Iterator[Tuple[Optional[List[float]], Dict[str, Any]]]:
+        with self._lock:
+            return iter([(c.get("embedding"), self._vector_meta(c)) for c in self._chunks if c.get("user_id") == user_id and c.get("embedding")])
+
+    # -------------------- workflow runs --------------------
+
+    @staticmethod
+    def _run_doc(user_id: str, input_text: str, run_id: str, at: Optional[datetime] = None) -> Dict[str, Any]:
+        return {"run_id": run_id, "user_id": user_id, "input": input_text, "steps": [], "status": "running", "created_at": _iso(at)}
+
+    @staticmethod
+    def _final_fields(final_reply: str, agent_path: List[str], confidence: float, at: Optional[datetime] = None) -> Dict[str, Any]:
+        return {"final_reply": final_reply, "agent_path": agent_path, "confidence": confidence, "status": "completed", "completed_at": _iso(at)}
+
+    def create_run(self, user_id: str, input_text: str, run_id: Optional[str] = None) -> str:
+        run_id = run_id or str(uuid.uuid4())
+        with self._lock:
+            self._log_runs([{"op": "create", "run": self._run_doc(user_id, input_text, run_id)}])
+        return run_id
+
+    def append_run_step(self, run_id: str, agent: str, output: Dict[str, Any]) -> None:
+        with self._lock:
+            if run_id in self._runs:
+                self._log_runs([{"op": "steps", "run_id": run_id, "steps": [{"agent": agent, "output": output}]}])
+
+    def finalize_run(self, run_id: str, final_reply: str, agent_path: List[str], confidence: float) -> None:
+        with self._lock:
+            if run_id in self._runs:
+                self._log_runs([{"op": "final", "run_id": run_id, "fields": self._final_fields(final_reply, agent_path, confidence)}])
+
+    def set_run_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            if run_id in self._runs:
+                self._log_runs([{"op": "status", "run_id": run_id, "fields": run_status_fields(status, error)}])
+
+    def apply_writes(self, ops: List[WriteOp]) -> None:
+        """Apply a batch with one append to the chats log and one to the runs log."""
+        chats, runs = fold_writes(ops)
+        with self._lock:
+            chats = [op for op in chats if op.get("id") not in self._chat_write_ids]
+            if chats:
+                self._log(
+                    "chats",
+                    [
+                        {
+                            "user_id": op["user_id"],
+                            "role": op["role"],
+                            "text": op["text"],
+                            "meta": op.get("meta") or {},
+                            "created_at": _iso(op.get("at")),
+                            **({"write_id": op["id"]} if op.get("id") else {}),
+                        }
+                        for op in chats
+                    ],
+                )
+
+            records: List[Dict[str, Any]] = []
+            for run_id, w in runs.items():
+                final = w["final"]
+                fields = self._final_fields(final["final_reply"], final["agent_path"], final["confidence"], final.get("at")) if final else None
+                if w["create"] is not None:
+                    # a run created within the batch becomes one record
+                    create = w["create"]
+                    run = self._run_doc(create["user_id"], create["input_text"], run_id, create.get("at"))
+                    run["steps"] = list(w["steps"])
+                    run.update(fields or {})
+                    run.update(w["status"] or {})
+                    records.append({"op": "create", "run": run})
+                    continue
+                if run_id not in self._runs:
+                    continue
+                if w["steps"]:
+                    records.append({"op": "steps", "run_id": run_id, "steps": w["steps"]})
+                if fields:
+                    records.append({"op": "final", "run_id": run_id, "fields": fields})
+                if w["status"]:
+                    records.append({"op": "status", "run_id": run_id, "fields": w["status"]})
+            if records:
+                self._log_runs(records)
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            run = self._runs.get(run_id)
+            return {**run, "steps": list(run["steps"])} if run is not None else None
+
+    def list_runs(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            runs = [{**r, "steps": list(r["steps"])} for r in self._runs.values() if r.get("user_id") == user_id]
+        runs.sort(key=lambda r: r.get("created_at") or "", reverse=True)
+        return runs[:limit]
+
+    @staticmethod
+    def _chunk_hit(c: Dict[str, Any], score: float) -> Dict[str, Any]:
+        return {
+            "source_type": "file",
+            "source": c.get("filename", c.get("file_id", "unknown")),
+            "file_id": c.get("file_id"),
+            "chunk_index": c.get("chunk_index"),
+            "score": float(score),
+            "snippet": (c.get("content") or "")[:800].replace("\n", " ").strip(),
+        }
+
+    def _lexical_chunk_hits(self, user_id: str, q: str, top_k: int) -> List[Dict[str, Any]]:
+        return [self._chunk_hit(c, score) for score, c in self._bm25_index().search(user_id, q, top_k)]
+
+    def vector_search(self, user_id: str, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        return [self._chunk_hit(c, score) for score, c in self._vector_index().search(user_id, query_embedding, top_k)]
+
+    def search(self, user_id: str, query: str, top_k: int = 5, query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """
+        File chunks by cosine similarity when a query embedding is given and the user has embedded
+        chunks (score = cosine), otherwise by BM25; chat history fills the remaining slots.
+        """
+        q = (query or "").lower()
+        hits = self.vector_search(user_id, query_embedding, top_k) if query_embedding else []
+        if not hits:
+            hits = self._lexical_chunk_hits(user_id, q, top_k)
+        return hits + self.search_chats(user_id, q, top_k - len(hits))
+
+    def search_chats(self, user_id: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        if top_k <= 0:
+            return []
+        q = (query or "").lower()
+        with self._lock:
+            user_chats = list(self._chats.get(user_id, []))
         chat_scored = []
         for c in user_chats:
             text = (c.get("text") or "").lower()
@@ -123,15 +414,14 @@ class LocalJsonStore(Store):
                 chat_scored.append((s, c))
         chat_scored.sort(key=lambda x: x[0], reverse=True)
 
-        for s, c in chat_scored[: max(0, top_k - len(hits))]:
-            hits.append(
-                {
-                    "source_type": "chat",
-                    "source": "chat_history",
-                    "score": float(s),
-                    "snippet": (c.get("text") or "")[:800].replace("\n", " ").strip(),
-                    "created_at": c.get("created_at"),
-                }
-            )
-
-        return hits
+        return [
+            {
+                "source_type": "chat",
+                "source": "chat_history",
+                "score": float(s),
+                "snippet": (c.get("text") or "")[:800].replace("\n", " ").strip(),
+                "created_at": c.get("created_at"),
+                **({"write_id": c["write_id"]} if c.get("write_id") else {}),
+            }
+            for s, c in chat_scored[:top_k]
+        ]
@@ -1,28 +1,45 @@
 from __future__ import annotations
 
+import asyncio
+import uuid
+import weakref
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, InsertOne, MongoClient, UpdateOne
 from pymongo.collection import Collection
-from pymongo.errors import OperationFailure
+from pymongo.errors import ConnectionFailure, OperationFailure
 
-from .base import Store
+from .base import Store, WriteOp, fold_writes, run_status_fields
+from .vector_index import UserMatrixCache
 
 
 class MongoStore(Store):
-    def __init__(self, mongo_uri: str, db_name: str):
+    def __init__(self, mongo_uri: str, db_name: str, vector_cache_mb: float = 256):
         self.client = MongoClient(mongo_uri)
         self.db = self.client[db_name]
+        self._mongo_uri = mongo_uri
+        self._db_name = db_name
+        # AsyncMongoClient is bound to one event loop; created lazily per loop, closed by aclose()
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncMongoClient]" = weakref.WeakKeyDictionary()
 
         self.chats: Collection = self.db["chats"]
         self.files: Collection = self.db["files"]
         self.chunks: Collection = self.db["file_chunks"]
 
+        # per-user corpus version, shared by every worker: {_id: user_id, version}
+        self.versions: Collection = self.db["corpus_versions"]
+
+        # vector top-k is served from per-user embedding matrices loaded from file_chunks;
+        # storing chunks bumps the user's version so the next search (in any worker) rebuilds a stale matrix
+        self._matrices = UserMatrixCache(self.iter_embeddings, max_bytes=int(vector_cache_mb * 1024 * 1024))
+
         # ---- non-text indexes (safe to create repeatedly) ----
         self.chats.create_index([("user_id", 1), ("created_at", -1)])
         self.files.create_index([("user_id", 1), ("created_at", -1)])
         self.chunks.create_index([("user_id", 1), ("file_id", 1), ("chunk_index", 1)])
+        # buffered run writes are upserts by run_id, so a retried create can never add a second run
+        self.db["workflow_runs"].create_index("run_id", unique=True)
 
         # ---- text indexes (Mongo allows ONLY one text index per collection) ----
         # chats: ensure text index exists on "text"
@@ -56,21 +73,34 @@ class MongoStore(Store):
 
         # -------------------- workflow runs --------------------
 
-    def create_run(self, user_id: str, input_text: str) -> str:
-        import uuid
+    @staticmethod
+    def _run_doc(user_id: str, input_text: str, run_id: Optional[str] = None, at: Optional[datetime] = None) -> Dict[str, Any]:
+        return {
+            "run_id": run_id or str(uuid.uuid4()),
+            "user_id": user_id,
+            "input": input_text,
+            "steps": [],
+            "status": "running",
+            "created_at": at or datetime.utcnow(),
+        }
 
-        run_id = str(uuid.uuid4())
-        self.db["workflow_runs"].insert_one(
-            {
-                "run_id": run_id,
-                "user_id": user_id,
-                "input": input_text,
-                "steps": [],
-                "status": "running",
-                "created_at": datetime.utcnow(),
-            }
-        )
-        return run_id
+    @staticmethod
+    def _final_fields(final_reply: str, agent_path: list[str], confidence: float, at: Optional[datetime] = None) -> Dict[str, Any]:
+        return {
+            "final_reply": final_reply,
+            "agent_path": agent_path,
+            "confidence": confidence,
+            "status": "completed",
+            "completed_at": at or datetime.utcnow(),
+        }
+
+    def _finalize_update(self, final_reply: str, agent_path: list[str], confidence: float) -> Dict[str, Any]:
+        return {"$set": self._final_fields(final_reply, agent_path, confidence)}
+
+    def create_run(self, user_id: str, input_text: str, run_id: Optional[str] = None) -> str:
+        doc = self._run_doc(user_id, input_text, run_id)
+        self.db["workflow_runs"].insert_one(doc)
+        return doc["run_id"]
 
     def append_run_step(self, run_id: str, agent: str, output: dict) -> None:
         self.db["workflow_runs"].update_one(
@@ -79,18 +109,10 @@ class MongoStore(Store):
         )
 
     def finalize_run(self, run_id: str, final_reply: str, agent_path: list[str], confidence: float) -> None:
-        self.db["workflow_runs"].update_one(
-            {"run_id": run_id},
-            {
-                "$set": {
-                    "final_reply": final_reply,
-                    "agent_path": agent_path,
-                    "confidence": confidence,
-                    "status": "completed",
-                    "completed_at": datetime.utcnow(),
-                }
-            },
-        )
+        self.db["workflow_runs"].update_one({"run_id": run_id}, self._finalize_update(final_reply, agent_path, confidence))
+
+    def set_run_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        self.db["workflow_runs"].update_one({"run_id": run_id}, {"$set": run_status_fields(status, error)})
 
     def get_run(self, run_id: str) -> dict | None:
         return self.db["workflow_runs"].find_one({"run_id": run_id}, {"_id": 0})
@@ -112,16 +134,76 @@ class MongoStore(Store):
         text: str,
         meta: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-        doc = {
+        doc = self._chat_doc(user_id, role, text, meta)
+        self.chats.insert_one(doc)
+        doc.pop("_id", None)
+        return doc
+
+    @staticmethod
+    def _chat_doc(user_id: str, role: str, text: str, meta: Optional[Dict[str, Any]], at: Optional[datetime] = None) -> Dict[str, Any]:
+        return {
             "user_id": user_id,
             "role": role,
             "text": text,
             "meta": meta or {},
-            "created_at": datetime.utcnow(),
+            "created_at": at or datetime.utcnow(),
         }
-        self.chats.insert_one(doc)
-        doc.pop("_id", None)
-        return doc
+
+    # -------------------- buffered writes --------------------
+
+    def is_transient_error(self, exc: BaseException) -> bool:
+        return isinstance(exc, (ConnectionFailure, OSError))
+
+    def apply_writes(self, ops: List[WriteOp]) -> None:
+        """
+        One bulk_write for chats and one for runs, whatever the batch size. Both are idempotent,
+        so the write-behind buffer can retry a batch that was partly applied: chats are upserted
+        by their write id, runs are upserted by run_id (unique) and a step is only appended if its
+        op id is not on the run yet.
+        """
+        chats, runs = fold_writes(ops)
+        if chats:
+            requests: List[Any] = []
+            for op in chats:
+                doc = self._chat_doc(op["user_id"], op["role"], op["text"], op.get("meta"), op.get("at"))
+                if op.get("id"):
+                    doc["write_id"] = op["id"]
+                    requests.append(UpdateOne({"_id": op["id"]}, {"$setOnInsert": doc}, upsert=True))
+                else:
+                    requests.append(InsertOne(doc))
+            self.chats.bulk_write(requests, ordered=True)
+
+        requests = []
+        for run_id, w in runs.items():
+            final = w["final"]
+            final_fields = (
+                self._final_fields(final["final_reply"], final["agent_path"], final["confidence"], final.get("at")) if final else {}
+            )
+            final_fields.update(w["status"] or {})
+            create = w["create"]
+            base = self._run_doc(create["user_id"], create["input_text"], run_id, create.get("at")) if create is not None else {}
+            requests.append(self._run_upsert(run_id, base, w["steps"], w["step_ids"], final_fields))
+        if requests:
+            # one op per run, so order across runs does not matter
+            self.db["workflow_runs"].bulk_write(requests, ordered=False)
+
+    @staticmethod
+    def _run_upsert(
+        run_id: str, base: Dict[str, Any], steps: List[Dict[str, Any]], step_ids: List[Optional[str]], final_fields: Dict[str, Any]
+    ) -> UpdateOne:
+        """Pipeline update: create the run if `base` is given and missing, append the steps it does not have yet, set `final_fields`."""
+        new_steps = [{**step, "op_id": op_id} if op_id else step for step, op_id in zip(steps, step_ids)]
+        have = {"$ifNull": ["$steps", []]}
+        fresh = {
+            "$filter": {
+                "input": {"$literal": new_steps},
+                "cond": {"$not": [{"$in": ["$$this.op_id", {"$ifNull": ["$steps.op_id", []]}]}]},
+            }
+        }
+        stage: Dict[str, Any] = {k: {"$ifNull": [f"${k}", {"$literal": v}]} for k, v in base.items() if k != "steps"}
+        stage["steps"] = {"$concatArrays": [have, fresh]}
+        stage.update({k: {"$literal": v} for k, v in final_fields.items()})
+        return UpdateOne({"run_id": run_id}, [{"$set": stage}], upsert=bool(base))
 
     def get_recent_chats(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         return list(self.chats.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).limit(limit))
@@ -129,8 +211,6 @@ class MongoStore(Store):
     # -------------------- files + chunks --------------------
 
     def create_file(self, user_id: str, filename: str, content_type: str) -> str:
-        import uuid
-
         file_id = str(uuid.uuid4())
         self.files.insert_one(
             {
@@ -152,19 +232,45 @@ class MongoStore(Store):
         content: str,
         embedding: Optional[List[float]] = None,
     ) -> None:
-        # Store content in BOTH fields to support existing Atlas indexes (often on "text").
-        self.chunks.insert_one(
-            {
-                "user_id": user_id,
-                "file_id": file_id,
-                "filename": filename,
-                "chunk_index": int(chunk_index),
-                "content": content,
-                "text": content,  # ✅ critical for compatibility with existing "text_text" index
-                "embedding": embedding,
-                "created_at": datetime.utcnow(),
-            }
+        self.chunks.insert_one(self._chunk_doc(user_id, file_id, filename, chunk_index, content, embedding))
+        self._bump_version(user_id)
+
+    def add_chunks(self, user_id: str, file_id: str, filename: str, chunks: List[Tuple[str, Optional[List[float]]]]) -> None:
+        """One insert_many and one version bump for a whole file."""
+        if not chunks:
+            return
+        self.chunks.insert_many(
+            [self._chunk_doc(user_id, file_id, filename, idx, content, embedding) for idx, (content, embedding) in enumerate(chunks)],
+            ordered=True,
         )
+        self._bump_version(user_id)
+
+    @staticmethod
+    def _chunk_doc(
+        user_id: str, file_id: str, filename: str, chunk_index: int, content: str, embedding: Optional[List[float]]
+    ) -> Dict[str, Any]:
+        # Store content in BOTH fields to support existing Atlas indexes (often on "text").
+        return {
+            "user_id": user_id,
+            "file_id": file_id,
+            "filename": filename,
+            "chunk_index": int(chunk_index),
+            "content": content,
+            "text": content,  # ✅ critical for compatibility with existing "text_text" index
+            "embedding": embedding,
+            "created_at": datetime.utcnow(),
+        }
+
+    def _bump_version(self, user_id: str) -> None:
+        self.versions.update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+
+    def corpus_version(self, user_id: str) -> int:
+        doc = self.versions.find_one({"_id": user_id}, {"version": 1})
+        return int(doc["version"]) if doc else 0
+
+    async def acorpus_version(self, user_id: str) -> int:
+        doc = await self._adb()["corpus_versions"].find_one({"_id": user_id}, {"version": 1})
+        return int(doc["version"]) if doc else 0
 
     # -------------------- search --------------------
 
@@ -176,8 +282,8 @@ class MongoStore(Store):
         query_embedding: Optional[List[float]] = None,
     ) -> List[Dict[str, Any]]:
         """
-        For now: Mongo $text search across file chunks + chats.
-        (Embedding search can be added later.)
+        File chunks by cosine similarity when a query embedding is given and the user has embedded
+        chunks, otherwise by Mongo $text search; chats fill the remaining slots ($text).
         """
 
         q = (query or "").strip()
@@ -185,55 +291,156 @@ class MongoStore(Store):
             return []
 
         # file chunks
-        hits = list(
-            self.chunks.find(
-                {"user_id": user_id, "$text": {"$search": q}},
-                {
-                    "_id": 0,
-                    "score": {"$meta": "textScore"},
-                    "content": 1,
-                    "file_id": 1,
-                    "filename": 1,
-                    "chunk_index": 1,
-                },
-            )
-            .sort([("score", {"$meta": "textScore"})])
-            .limit(int(top_k))
+        results = self.vector_search(user_id, query_embedding, top_k) if query_embedding else []
+        if not results:
+            hits = list(self.chunks.find(*self._chunk_query(user_id, q)).sort(self._BY_SCORE).limit(int(top_k)))
+            results = [self._chunk_hit(h) for h in hits]
+
+        # chats (fill remaining slots)
+        return results + self.search_chats(user_id, q, int(top_k) - len(results))
+
+    def search_chats(self, user_id: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        q = (query or "").strip()
+        if not q or top_k <= 0:
+            return []
+        hits = list(self.chats.find(*self._chat_query(user_id, q)).sort(self._BY_SCORE).limit(int(top_k)))
+        return [self._chat_hit(h) for h in hits]
+
+    def iter_embeddings(self, user_id: str) -> Iterator[Tuple[Optional[List[float]], Dict[str, Any]]]:
+        cursor = self.chunks.find(
+            {"user_id": user_id, "embedding": {"$ne": None}},
+            {"_id": 0, "embedding": 1, "content": 1, "file_id": 1, "filename": 1, "chunk_index": 1},
         )
+        for doc in cursor:
+            # only the snippet is kept in memory next to the matrix
+            doc["content"] = (doc.get("content") or "")[:800]
+            yield doc.pop("embedding", None), doc
 
-        results: List[Dict[str, Any]] = []
-        for h in hits:
-            results.append(
-                {
-                    "source_type": "file",
-                    "source": h.get("filename", h.get("file_id", "unknown")),
-                    "file_id": h.get("file_id"),
-                    "chunk_index": h.get("chunk_index"),
-                    "score": float(h.get("score", 0.0)),
-                    "snippet": (h.get("content") or "")[:800].replace("\n", " ").strip(),
-                }
-            )
+    def vector_search(self, user_id: str, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        hits = self._matrices.search(user_id, self.corpus_version(user_id), query_embedding, top_k)
+        return [self._chunk_hit({**chunk, "score": score}) for score, chunk in hits]
 
-        # chats (fill remaining slots)
-        remaining = max(0, int(top_k) - len(results))
-        if remaining > 0:
-            chat_hits = list(
-                self.chats.find(
-                    {"user_id": user_id, "$text": {"$search": q}},
-                    {"_id": 0, "score": {"$meta": "textScore"}, "text": 1, "created_at": 1},
-                )
-                .sort([("score", {"$meta": "textScore"})])
-                .limit(remaining)
-            )
-            for h in chat_hits:
-                results.append(
-                    {
-                        "source_type": "chat",
-                        "source": "chat_history",
-                        "score": float(h.get("score", 0.0)),
-                        "snippet": (h.get("text") or "")[:800].replace("\n", " ").strip(),
-                        "created_at": (h.get("created_at").isoformat() + "Z") if h.get("created_at") else None,
-                    }
-                )
-
-        return results
+    def vector_cache_stats(self) -> Dict[str, Any]:
+        return self._matrices.stats()
+
+    _BY_SCORE = [("score", {"$meta": "textScore"})]
+
+    @staticmethod
+    def _chunk_query(user_id: str, q: str) -> tuple:
+        return (
+            {"user_id": user_id, "$text": {"$search": q}},
+            {
+                "_id": 0,
+                "score": {"$meta": "textScore"},
+                "content": 1,
+                "file_id": 1,
+                "filename": 1,
+                "chunk_index": 1,
+            },
+        )
+
+    @staticmethod
+    def _chat_query(user_id: str, q: str) -> tuple:
+        return (
+            {"user_id": user_id, "$text": {"$search": q}},
+            {"_id": 0, "score": {"$meta": "textScore"}, "text": 1, "created_at": 1, "write_id": 1},
+        )
+
+    @staticmethod
+    def _chunk_hit(h: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "source_type": "file",
+            "source": h.get("filename", h.get("file_id", "unknown")),
+            "file_id": h.get("file_id"),
+            "chunk_index": h.get("chunk_index"),
+            "score": float(h.get("score", 0.0)),
+            "snippet": (h.get("content") or "")[:800].replace("\n", " ").strip(),
+        }
+
+    @staticmethod
+    def _chat_hit(h: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "source_type": "chat",
+            "source": "chat_history",
+            "score": float(h.get("score", 0.0)),
+            "snippet": (h.get("text") or "")[:800].replace("\n", " ").strip(),
+            "created_at": (h.get("created_at").isoformat() + "Z") if h.get("created_at") else None,
+            **({"write_id": h["write_id"]} if h.get("write_id") else {}),
+        }
+
+    # -------------------- async (native driver) --------------------
+
+    def _adb(self) -> Any:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncMongoClient(self._mongo_uri)
+            self._async_clients[loop] = client
+        return client[self._db_name]
+
+    async def aclose(self) -> None:
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def close(self) -> None:
+        self.client.close()
+
+    async def aappend_chat(
+        self,
+        user_id: str,
+        role: str,
+        text: str,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        doc = self._chat_doc(user_id, role, text, meta)
+        await self._adb()["chats"].insert_one(doc)
+        doc.pop("_id", None)
+        return doc
+
+    async def aget_recent_chats(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        cursor = self._adb()["chats"].find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).limit(limit)
+        return await cursor.to_list()
+
+    async def asearch(
+        self,
+        user_id: str,
+        query: str,
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict[str, Any]]:
+        q = (query or "").strip()
+        if not q:
+            return []
+
+        db = self._adb()
+        results = await self.avector_search(user_id, query_embedding, top_k) if query_embedding else []
+        if not results:
+            hits = await db["file_chunks"].find(*self._chunk_query(user_id, q)).sort(self._BY_SCORE).limit(int(top_k)).to_list()
+            results = [self._chunk_hit(h) for h in hits]
+
+        return results + await self.asearch_chats(user_id, q, int(top_k) - len(results))
+
+    async def asearch_chats(self, user_id: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        q = (query or "").strip()
+        if not q or top_k <= 0:
+            return []
+        hits = await self._adb()["chats"].find(*self._chat_query(user_id, q)).sort(self._BY_SCORE).limit(int(top_k)).to_list()
+        return [self._chat_hit(h) for h in hits]
+
+    async def acreate_run(self, user_id: str, input_text: str, run_id: Optional[str] = None) -> str:
+        doc = self._run_doc(user_id, input_text, run_id)
+        await self._adb()["workflow_runs"].insert_one(doc)
+        return doc["run_id"]
+
+    async def aappend_run_step(self, run_id: str, agent: str, output: dict) -> None:
+        await self._adb()["workflow_runs"].update_one(
+            {"run_id": run_id},
+            {"$push": {"steps": {"agent": agent, "output": output}}},
+        )
+
+    async def afinalize_run(self, run_id: str, final_reply: str, agent_path: list[str], confidence: float) -> None:
+        await self._adb()["workflow_runs"].update_one({"run_id": run_id}, self._finalize_update(final_reply, agent_path, confidence))
+
+    async def aset_run_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        await self._adb()["workflow_runs"].update_one({"run_id": run_id}, {"$set": run_status_fields(status, error)})
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from typing import IO, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_SEGMENT = re.compile(r"^(\d{6})\.jsonl$")
+_SNAPSHOT = re.compile(r"^snapshot-(\d{6})\.jsonl$")
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+def _fsync_dir(path: str) -> None:
+    # makes renames/unlinks durable; not supported on every platform
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class RecordLog:
+    """
+    Append-only JSONL log of dict records in numbered segments under `path`
+    (000001.jsonl, 000002.jsonl, ...), rotated past `segment_bytes`.
+
+    compact(records) replaces everything written so far with `records`: they go to
+    snapshot-<seq>.jsonl, which stands for every segment numbered below <seq>; older files are
+    deleted afterwards, so a crash mid-compaction leaves either the old files or the snapshot.
+    load() returns the snapshot plus the later segments; a torn last line (crash during a write)
+    is truncated away.
+
+    fsync policy: "always" syncs every append, "interval" at most every `fsync_interval_sec`
+    (an append or sync() after that), "never" leaves it to the OS. Appends are always flushed
+    to the OS, so only a machine crash can lose unsynced records. An append only syncs when
+    the interval is already over, so the owner must also call sync() on a timer (LocalJsonStore
+    runs one) to bound the window when writes stop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        fsync: str = "interval",
+        fsync_interval_sec: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = path
+        self.segment_bytes = max(1, int(segment_bytes))
+        self.fsync = fsync
+        self.fsync_interval_sec = float(fsync_interval_sec)
+        self._clock = clock
+        os.makedirs(path, exist_ok=True)
+
+        self._file: Optional[IO[bytes]] = None
+        self._seq = 1
+        self._size = 0
+        self._dirty = False
+        self._last_sync = clock()
+
+        self.records = 0  # records currently on disk (snapshot + segments)
+        self.appends = 0
+        self.syncs = 0
+        self.compactions = 0
+        self.truncated_bytes = 0
+
+    # -------------------- files --------------------
+
+    def _listing(self) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]:
+        segments, snapshots = [], []
+        for name in os.listdir(self.path):
+            m = _SEGMENT.match(name)
+            if m:
+                segments.append((int(m.group(1)), name))
+                continue
+            m = _SNAPSHOT.match(name)
+            if m:
+                snapshots.append((int(m.group(1)), name))
+        return sorted(segments), sorted(snapshots)
+
+    def _read(self, name: str, truncate_torn: bool) -> List[Dict[str, Any]]:
+        file = os.path.join(self.path, name)
+        records: List[Dict[str, Any]] = []
+        good = 0
+        with open(file, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                good += len(line)
+        size = os.path.getsize(file)
+        if size > good and truncate_torn:
+            os.truncate(file, good)
+            self.truncated_bytes += size - good
+        return records
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Every record in write order (the latest snapshot, then the segments after it)."""
+        segments, snapshots = self._listing()
+        base = snapshots[-1][0] if snapshots else 0
+        records: List[Dict[str, Any]] = []
+        if snapshots:
+            records.extend(self._read(snapshots[-1][1], truncate_torn=False))
+
+        live = [(seq, name) for seq, name in segments if seq >= base]
+        for i, (seq, name) in enumerate(live):
+            records.extend(self._read(name, truncate_torn=i == len(live) - 1))
+
+        # leftovers of a compaction that crashed before its cleanup
+        for seq, name in segments:
+            if seq < base:
+                os.remove(os.path.join(self.path, name))
+        for seq, name in snapshots[:-1]:
+            os.remove(os.path.join(self.path, name))
+
+        self._seq = live[-1][0] if live else max(base, 1)
+        self.records = len(records)
+        return records
+
+    def _open(self) -> IO[bytes]:
+        if self._file is None:
+            self._file = open(os.path.join(self.path, f"{self._seq:06d}.jsonl"), "ab")
+            self._size = self._file.tell()
+        return self._file
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            self._dirty = False
+
+    # -------------------- writes --------------------
+
+    def append(self, records: Iterable[Dict[str, Any]]) -> None:
+        data = b"".join(
+            (json.dumps(r, ensure_ascii=False, separators=(",", ":"), default=str) + "\n").encode("utf-8") for r in records
+        )
+        if not data:
+            return
+        f = self._open()
+        f.write(data)
+        f.flush()
+        self._size += len(data)
+        self.records += data.count(b"\n")
+        self.appends += 1
+        self._dirty = True
+
+        if self.fsync == "always" or (self.fsync == "interval" and self._clock() - self._last_sync >= self.fsync_interval_sec):
+            self.sync()
+        if self._size >= self.segment_bytes:
+            self._close_segment()
+            self._seq += 1
+
+    def sync(self) -> None:
+        if self._file is not None and self._dirty and self.fsync != "never":
+            os.fsync(self._file.fileno())
+            self.syncs += 1
+        self._dirty = False
+        self._last_sync = self._clock()
+
+    def compact(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Replace the whole log with `records` (the live state)."""
+        self._close_segment()
+        self._seq += 1
+        snapshot = os.path.join(self.path, f"snapshot-{self._seq:06d}.jsonl")
+        tmp = snapshot + ".tmp"
+        count = 0
+        with open(tmp, "wb") as f:
+            for r in records:
+                f.write((json.dumps(r, ensure_ascii=False, separators=(",", ":"), default=str) + "\n").encode("utf-8"))
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, snapshot)
+        _fsync_dir(self.path)
+
+        segments, snapshots = self._listing()
+        for seq, name in segments + snapshots:
+            if seq < self._seq:
+                os.remove(os.path.join(self.path, name))
+        self.records = count
+        self.compactions += 1
+
+    def close(self) -> None:
+        self._close_segment()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "records": self.records,
+            "segment": self._seq,
+            "appends": self.appends,
+            "syncs": self.syncs,
+            "compactions": self.compactions,
+            "truncated_bytes": self.truncated_bytes,
+        }
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class _UserVectors:
+    """One user's chunk embeddings: a contiguous float32 matrix of unit rows, grown by doubling."""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.dim = dim
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.size = 0
+        self.chunks: List[Dict[str, Any]] = []
+
+    def add(self, vec: np.ndarray, chunk: Dict[str, Any]) -> None:
+        if self.size == self.matrix.shape[0]:
+            grown = np.zeros((self.size * 2, self.dim), dtype=np.float32)
+            grown[: self.size] = self.matrix[: self.size]
+            self.matrix = grown
+        self.matrix[self.size] = vec
+        self.size += 1
+        self.chunks.append(chunk)
+
+    def nbytes(self) -> int:
+        return int(self.matrix.nbytes)
+
+
+def _unit(embedding: List[float]) -> Optional[np.ndarray]:
+    vec = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if vec.ndim == 1 and norm > 0 else None
+
+
+def _top_k(matrix: np.ndarray, chunks: List[Dict[str, Any]], q: Optional[np.ndarray], top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+    if q is None or q.shape[0] != matrix.shape[1] or top_k <= 0:
+        return []
+    scores = matrix @ q
+    k = min(int(top_k), scores.shape[0])
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(float(scores[i]), chunks[i]) for i in top]
+
+
+class VectorIndex:
+    """
+    In-memory cosine index over chunk embeddings, one matrix per user.
+
+    Rows are L2-normalized on insert, so top-k search is one matrix-vector product plus
+    np.argpartition. A user's dimension is fixed by their first embedding; vectors of a
+    different size (e.g. from another embed model) are skipped.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._users: Dict[str, _UserVectors] = {}
+
+    def add(self, user_id: str, embedding: Optional[List[float]], chunk: Dict[str, Any]) -> bool:
+        """Index one chunk; returns False when it has no usable embedding."""
+        vec = _unit(embedding) if embedding else None
+        if vec is None:
+            return False
+        with self._lock:
+            vectors = self._users.get(user_id)
+            if vectors is None:
+                vectors = self._users[user_id] = _UserVectors(vec.shape[0])
+            if vec.shape[0] != vectors.dim:
+                return False
+            vectors.add(vec, chunk)
+        return True
+
+    def _snapshot(self, user_id: str) -> Tuple[Optional[np.ndarray], List[Dict[str, Any]]]:
+        with self._lock:
+            vectors = self._users.get(user_id)
+            if vectors is None or vectors.size == 0:
+                return None, []
+            # rows [0, size) never change once written; growth allocates a new matrix
+            return vectors.matrix[: vectors.size], vectors.chunks[: vectors.size]
+
+    def search(self, user_id: str, query_embedding: List[float], top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        """(cosine, chunk) pairs for the top_k most similar chunks, best first."""
+        matrix, chunks = self._snapshot(user_id)
+        if matrix is None:
+            return []
+        return _top_k(matrix, chunks, _unit(query_embedding), top_k)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "vectors": sum(v.size for v in self._users.values()),
+                "bytes": sum(v.nbytes() for v in self._users.values()),
+            }
+
+
+Loader = Callable[[str], Iterable[Tuple[Optional[List[float]], Dict[str, Any]]]]
+
+
+class _CachedMatrix:
+    def __init__(self, version: int, matrix: np.ndarray, chunks: List[Dict[str, Any]]):
+        self.version = version
+        self.matrix = matrix
+        self.chunks = chunks
+
+
+class UserMatrixCache:
+    """
+    LRU of per-user embedding matrices for stores without a native vector index.
+
+    A user's matrix is built on first search from `loader(user_id)` ((embedding, chunk) pairs)
+    and tagged with the user's corpus version; a search with a newer version rebuilds it.
+    Cold users are evicted once the matrices exceed `max_bytes` (the most recent one is
+    always kept, even when it alone is over the cap).
+    """
+
+    def __init__(self, loader: Loader, max_bytes: int):
+        self.loader = loader
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[str, _CachedMatrix]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def _build(self, user_id: str, version: int) -> _CachedMatrix:
+        rows: List[np.ndarray] = []
+        chunks: List[Dict[str, Any]] = []
+        for embedding, chunk in self.loader(user_id):
+            vec = _unit(embedding) if embedding else None
+            if vec is None or (rows and vec.shape[0] != rows[0].shape[0]):
+                continue
+            rows.append(vec)
+            chunks.append(chunk)
+        matrix = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+        return _CachedMatrix(version, matrix, chunks)
+
+    def _get(self, user_id: str, version: int) -> _CachedMatrix:
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached is not None and cached.version == version:
+                self._users.move_to_end(user_id)
+                self.hits += 1
+                return cached
+
+        # load outside the lock so one cold user does not stall searches for everyone else
+        built = self._build(user_id, version)
+        with self._lock:
+            self.loads += 1
+            current = self._users.get(user_id)
+            if current is not None and current.version > version:
+                return built  # a fresher matrix landed meanwhile; serve ours without caching it
+            if current is not None:
+                self._bytes -= current.matrix.nbytes
+            self._users[user_id] = built
+            self._users.move_to_end(user_id)
+            self._bytes += built.matrix.nbytes
+            while self._bytes > self.max_bytes and len(self._users) > 1:
+                _, cold = self._users.popitem(last=False)
+                self._bytes -= cold.matrix.nbytes
+                self.evictions += 1
+        return built
+
+    def search(self, user_id: str, version: int, query_embedding: List[float], top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        cached = self._get(user_id, version)
+        if not cached.chunks:
+            return []
+        return _top_k(cached.matrix, cached.chunks, _unit(query_embedding), top_k)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "vectors": sum(len(m.chunks) for m in self._users.values()),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,461 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .base import Store, WriteOp
+
+log = logging.getLogger(__name__)
+
+
+def _op_id() -> str:
+    return uuid.uuid4().hex
+
+
+class WriteBehindStore(Store):
+    """
+    Wraps a Store and takes chat and workflow-run writes off the request path.
+
+    append_chat / create_run / append_run_step / finalize_run only enqueue; a background
+    writer drains the bounded queue every `flush_interval` seconds and hands the batch to
+    `inner.apply_writes()` (one bulk write per collection for MongoStore), so a whole /ask
+    costs no DB round trip on the hot path.
+
+    Guarantees:
+    - writes are applied in enqueue order (one apply lock serializes every flush);
+    - when the queue is full, the caller waits up to `put_timeout`, then flushes synchronously
+      (back-pressure, nothing is dropped);
+    - every op carries an id generated at enqueue time and stores apply batches idempotently,
+      so retrying a partly applied batch does not write anything twice;
+    - a failed batch is kept and retried, with the writer backing off exponentially up to
+      `max_backoff` seconds while the store keeps failing;
+    - when the store rejects a batch (anything but a transient error), its ops are applied one
+      by one; an op rejected `max_attempts` times is moved to the dead-letter file
+      (`dead_letter_path`, JSON lines) and logged instead of blocking the buffer forever;
+    - the retry backlog is bounded: once it reaches max_queue the writer stops draining the
+      queue, so the queue fills and callers get an error instead of buffering without bound;
+    - close() (app shutdown) stops the writer and flushes what is left.
+
+    Reads never fail because of a write error. Recent-chat and search reads merge the chats
+    still buffered here into the store's results (no flush on the request path); run reads
+    flush best-effort first. Files and chunks pass straight through to the wrapped store.
+    """
+
+    def __init__(
+        self,
+        inner: Store,
+        max_queue: int = 10_000,
+        flush_interval: float = 0.05,
+        batch_size: int = 500,
+        put_timeout: float = 1.0,
+        max_backoff: float = 5.0,
+        max_attempts: int = 5,
+        dead_letter_path: Optional[str] = None,
+    ):
+        self.inner = inner
+        self.flush_interval = float(flush_interval)
+        self.batch_size = max(1, int(batch_size))
+        self.put_timeout = float(put_timeout)
+        self.max_backoff = max(self.flush_interval, float(max_backoff))
+        self.max_attempts = max(1, int(max_attempts))
+        self.dead_letter_path = dead_letter_path
+        self._queue: "queue.Queue[WriteOp]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._apply_lock = threading.Lock()
+        # guards _retry/_inflight, so readers can snapshot every op not yet applied
+        self._state_lock = threading.Lock()
+        self._retry: List[WriteOp] = []
+        self._inflight: List[WriteOp] = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+
+        self.enqueued = 0
+        self.applied = 0
+        self.batches = 0
+        self.sync_flushes = 0
+        self.errors = 0
+        self.dead_lettered = 0
+        self.max_depth = 0
+
+        self._thread = threading.Thread(target=self._loop, name="store-write-behind", daemon=True)
+        self._thread.start()
+
+    # -------------------- queue --------------------
+
+    def _try_enqueue(self, op: WriteOp) -> bool:
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            return False
+        self._enqueued()
+        return True
+
+    def _enqueue(self, op: WriteOp) -> None:
+        if self._try_enqueue(op):
+            return
+        if not self._closed:
+            self._wake.set()
+            try:
+                self._queue.put(op, timeout=self.put_timeout)
+                self._enqueued()
+                return
+            except queue.Full:
+                pass
+        # writer cannot keep up (or we are shut down): write through, after everything queued before
+        self.sync_flushes += 1
+        self.flush(extra=[op])
+
+    def _enqueued(self) -> None:
+        self.enqueued += 1
+        depth = self._queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        if depth >= self.batch_size:
+            self._wake.set()
+
+    def _loop(self) -> None:
+        delay = 0.0
+        while not self._stop.is_set():
+            if delay:
+                self._stop.wait(delay)  # store failing: full queues must not cut the backoff short
+            else:
+                self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                delay = 0.0
+            except Exception:  # noqa: BLE001
+                # counted and logged in flush(); the batch stays buffered for the next round
+                delay = min(self.max_backoff, max(self.flush_interval, delay * 2))
+
+    def flush(self, extra: Optional[List[WriteOp]] = None) -> None:
+        """Apply everything queued so far (plus `extra`), in order."""
+        with self._apply_lock:
+            with self._state_lock:
+                if extra and len(self._retry) >= self._queue.maxsize:
+                    # the store has been failing long enough to fill the backlog: surface it like a sync write would
+                    raise RuntimeError(f"Store unavailable: {len(self._retry)} buffered writes not yet persisted")
+                pending, self._retry = self._retry, []
+                # `extra` must follow everything queued before it; otherwise leave the queue alone
+                # once the backlog is full, so back-pressure reaches the callers
+                while extra or len(pending) < self._queue.maxsize:
+                    try:
+                        pending.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                pending.extend(extra or [])
+                self._inflight = pending
+
+            left: List[WriteOp] = pending
+            try:
+                for start in range(0, len(pending), self.batch_size):
+                    left = pending[start:]
+                    batch = pending[start : start + self.batch_size]
+                    try:
+                        self.inner.apply_writes(batch)
+                    except Exception as e:
+                        self.errors += 1
+                        # a transient error says nothing about the ops; otherwise find the one the store rejects
+                        unapplied = batch if self.inner.is_transient_error(e) else self._apply_one_by_one(batch)
+                        if unapplied:
+                            left = unapplied + pending[start + self.batch_size :]
+                            log.warning("write-behind flush failed (%s: %s); %d writes kept for retry", type(e).__name__, e, len(left))
+                            raise
+                    else:
+                        self.applied += len(batch)
+                        self.batches += 1
+                left = []
+            finally:
+                with self._state_lock:
+                    self._retry = left
+                    self._inflight = []
+
+    def _apply_one_by_one(self, batch: List[WriteOp]) -> List[WriteOp]:
+        """Apply `batch` op by op, dead-lettering ops rejected max_attempts times; returns the ops left to retry."""
+        for i, op in enumerate(batch):
+            try:
+                self.inner.apply_writes([op])
+            except Exception as e:
+                if self.inner.is_transient_error(e):
+                    return batch[i:]
+                op["attempts"] = op.get("attempts", 0) + 1
+                if op["attempts"] < self.max_attempts:
+                    return batch[i:]
+                self._dead_letter(op, e)
+                continue
+            self.applied += 1
+        return []
+
+    def _dead_letter(self, op: WriteOp, error: BaseException) -> None:
+        self.dead_lettered += 1
+        log.error("write-behind: dropping %s op %s after %d attempts: %s", op.get("op"), op.get("id"), op.get("attempts", 0), error)
+        if not self.dead_letter_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"op": op, "error": f"{type(error).__name__}: {error}"}, ensure_ascii=False, default=str) + "\n")
+        except Exception:  # noqa: BLE001
+            log.exception("write-behind: could not write the dead-letter file")
+
+    def close(self) -> None:
+        """Stop the writer and flush the remaining writes (called on app shutdown)."""
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        for attempt in range(3):
+            try:
+                self.flush()
+                break
+            except Exception:  # noqa: BLE001
+                time.sleep(0.2 * (attempt + 1))
+        else:
+            log.error("write-behind: %d writes could not be persisted on shutdown", len(self._retry))
+        close = getattr(self.inner, "close", None)
+        if close is not None:
+            close()
+
+    async def aclose(self) -> None:
+        # the remaining writes are flushed by close(), through the inner store's sync client
+        await self.inner.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "max_depth": self.max_depth,
+            "pending_retry": len(self._retry),
+            "enqueued": self.enqueued,
+            "applied": self.applied,
+            "batches": self.batches,
+            "avg_batch": round(self.applied / self.batches, 2) if self.batches else 0.0,
+            "sync_flushes": self.sync_flushes,
+            "errors": self.errors,
+            "dead_lettered": self.dead_lettered,
+        }
+
+    # -------------------- buffered writes --------------------
+
+    @staticmethod
+    def _chat_op(user_id: str, role: str, text: str, meta: Optional[Dict[str, Any]]) -> WriteOp:
+        return {"op": "append_chat", "id": _op_id(), "user_id": user_id, "role": role, "text": text, "meta": meta or {}, "at": datetime.utcnow()}
+
+    @staticmethod
+    def _chat_doc(op: WriteOp) -> Dict[str, Any]:
+        return {"user_id": op["user_id"], "role": op["role"], "text": op["text"], "meta": op["meta"], "created_at": op["at"]}
+
+    @staticmethod
+    def _create_op(user_id: str, input_text: str, run_id: Optional[str]) -> WriteOp:
+        return {"op": "create_run", "id": _op_id(), "run_id": run_id or str(uuid.uuid4()), "user_id": user_id, "input_text": input_text, "at": datetime.utcnow()}
+
+    @staticmethod
+    def _step_op(run_id: str, agent: str, output: Dict[str, Any]) -> WriteOp:
+        return {"op": "append_run_step", "id": _op_id(), "run_id": run_id, "agent": agent, "output": output}
+
+    @staticmethod
+    def _final_op(run_id: str, final_reply: str, agent_path: List[str], confidence: float) -> WriteOp:
+        return {
+            "op": "finalize_run",
+            "id": _op_id(),
+            "run_id": run_id,
+            "final_reply": final_reply,
+            "agent_path": list(agent_path),
+            "confidence": confidence,
+            "at": datetime.utcnow(),
+        }
+
+    @staticmethod
+    def _status_op(run_id: str, status: str, error: Optional[str]) -> WriteOp:
+        return {"op": "set_run_status", "id": _op_id(), "run_id": run_id, "status": status, "error": error}
+
+    def append_chat(self, user_id: str, role: str, text: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        op = self._chat_op(user_id, role, text, meta)
+        self._enqueue(op)
+        return self._chat_doc(op)
+
+    def create_run(self, user_id: str, input_text: str, run_id: Optional[str] = None) -> str:
+        op = self._create_op(user_id, input_text, run_id)
+        self._enqueue(op)
+        return op["run_id"]
+
+    def append_run_step(self, run_id: str, agent: str, output: Dict[str, Any]) -> None:
+        self._enqueue(self._step_op(run_id, agent, output))
+
+    def finalize_run(self, run_id: str, final_reply: str, agent_path: List[str], confidence: float) -> None:
+        self._enqueue(self._final_op(run_id, final_reply, agent_path, confidence))
+
+    def set_run_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        self._enqueue(self._status_op(run_id, status, error))
+
+    def apply_writes(self, ops: List[WriteOp]) -> None:
+        for op in ops:
+            self._enqueue(op if op.get("id") else {**op, "id": _op_id()})
+
+    # async callers only leave the loop when the queue is full
+    async def _aenqueue(self, op: WriteOp) -> None:
+        if not self._try_enqueue(op):
+            await asyncio.to_thread(self._enqueue, op)
+
+    async def aappend_chat(self, user_id: str, role: str, text: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        op = self._chat_op(user_id, role, text, meta)
+        await self._aenqueue(op)
+        return self._chat_doc(op)
+
+    async def acreate_run(self, user_id: str, input_text: str, run_id: Optional[str] = None) -> str:
+        op = self._create_op(user_id, input_text, run_id)
+        await self._aenqueue(op)
+        return op["run_id"]
+
+    async def aappend_run_step(self, run_id: str, agent: str, output: Dict[str, Any]) -> None:
+        await self._aenqueue(self._step_op(run_id, agent, output))
+
+    async def afinalize_run(self, run_id: str, final_reply: str, agent_path: List[str], confidence: float) -> None:
+        await self._aenqueue(self._final_op(run_id, final_reply, agent_path, confidence))
+
+    async def aset_run_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        await self._aenqueue(self._status_op(run_id, status, error))
+
+    # -------------------- reads (read-your-writes) --------------------
+
+    def _flush_quietly(self) -> None:
+        try:
+            self.flush()
+        except Exception:  # noqa: BLE001
+            pass  # logged in flush(); the read serves what the store has
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        self._flush_quietly()
+        return self.inner.get_run(run_id)
+
+    def list_runs(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        self._flush_quietly()
+        return self.inner.list_runs(user_id, limit)
+
+    def _pending_chats(self, user_id: str) -> List[WriteOp]:
+        """Chat ops of `user_id` not yet known to be applied, oldest first."""
+        with self._state_lock:
+            ops = self._retry + self._inflight
+            with self._queue.mutex:
+                ops = ops + list(self._queue.queue)
+        return [op for op in ops if op["op"] == "append_chat" and op["user_id"] == user_id]
+
+    @staticmethod
+    def _unseen(pending: List[WriteOp], found: List[Dict[str, Any]]) -> List[WriteOp]:
+        # an op applied while the store was being read shows up there with its write_id
+        seen = {d.get("write_id") for d in found}
+        return [op for op in pending if op["id"] not in seen]
+
+    @staticmethod
+    def _public(doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in doc.items() if k != "write_id"}
+
+    def get_recent_chats(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        pending = self._pending_chats(user_id)
+        chats = self.inner.get_recent_chats(user_id, limit)
+        fresh = [self._chat_doc(op) for op in reversed(self._unseen(pending, chats))]
+        return [self._public(c) for c in fresh + chats][: max(0, limit)]
+
+    @staticmethod
+    def _pending_hits(pending: List[WriteOp], query: str) -> List[Dict[str, Any]]:
+        # the same term-count scoring LocalJsonStore uses for chat history
+        terms = [t for t in (query or "").lower().split() if t]
+        hits = []
+        for op in pending:
+            text = (op["text"] or "").lower()
+            score = sum(text.count(t) for t in terms)
+            if score > 0:
+                hits.append(
+                    {
+                        "source_type": "chat",
+                        "source": "chat_history",
+                        "score": float(score),
+                        "snippet": (op["text"] or "")[:800].replace("\n", " ").strip(),
+                        "created_at": op["at"].isoformat() + "Z",
+                    }
+                )
+        return hits
+
+    def _merge_chats(self, pending: List[WriteOp], query: str, hits: List[Dict[str, Any]], slots: int) -> List[Dict[str, Any]]:
+        chats = hits + self._pending_hits(self._unseen(pending, hits), query)
+        chats.sort(key=lambda h: h.get("score", 0.0), reverse=True)
+        return [self._public(h) for h in chats[: max(0, slots)]]
+
+    def _merge_search(self, pending: List[WriteOp], query: str, found: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        files = [h for h in found if h.get("source_type") != "chat"]
+        chats = [h for h in found if h.get("source_type") == "chat"]
+        return files + self._merge_chats(pending, query, chats, int(top_k) - len(files))
+
+    def search(
+        self,
+        user_id: str,
+        query: str,
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict[str, Any]]:
+        pending = self._pending_chats(user_id)
+        return self._merge_search(pending, query, self.inner.search(user_id, query, top_k, query_embedding), top_k)
+
+    async def asearch(
+        self,
+        user_id: str,
+        query: str,
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict[str, Any]]:
+        pending = self._pending_chats(user_id)
+        return self._merge_search(pending, query, await self.inner.asearch(user_id, query, top_k, query_embedding), top_k)
+
+    def search_chats(self, user_id: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        pending = self._pending_chats(user_id)
+        return self._merge_chats(pending, query, self.inner.search_chats(user_id, query, top_k), top_k)
+
+    async def asearch_chats(self, user_id: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        pending = self._pending_chats(user_id)
+        return self._merge_chats(pending, query, await self.inner.asearch_chats(user_id, query, top_k), top_k)
+
+    # -------------------- pass-through --------------------
+
+    def is_transient_error(self, exc: BaseException) -> bool:
+        return self.inner.is_transient_error(exc)
+
+    def create_file(self, user_id: str, filename: str, content_type: str) -> str:
+        return self.inner.create_file(user_id, filename, content_type)
+
+    def add_chunk(
+        self,
+        user_id: str,
+        file_id: str,
+        filename: str,
+        chunk_index: int,
+        content: str,
+        embedding: Optional[List[float]] = None,
+    ) -> None:
+        self.inner.add_chunk(user_id, file_id, filename, chunk_index, content, embedding)
+
+    def add_chunks(self, user_id: str, file_id: str, filename: str, chunks: List[Tuple[str, Optional[List[float]]]]) -> None:
+        self.inner.add_chunks(user_id, file_id, filename, chunks)
+
+    def corpus_version(self, user_id: str) -> int:
+        return self.inner.corpus_version(user_id)
+
+    async def acorpus_version(self, user_id: str) -> int:
+        return await self.inner.acorpus_version(user_id)
+
+    def vector_search(self, user_id: str, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        return self.inner.vector_search(user_id, query_embedding, top_k)
+
+    async def avector_search(self, user_id: str, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        return await self.inner.avector_search(user_id, query_embedding, top_k)
+
+    def iter_embeddings(self, user_id: str) -> Iterator[Tuple[Optional[List[float]], Dict[str, Any]]]:
+        return self.inner.iter_embeddings(user_id)
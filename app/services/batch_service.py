@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import weakref
+from typing import Any, AsyncIterator, Dict, List
+
+from app.core.config import settings
+from app.core.ollama_scheduler import priority_class
+from app.core.shared_work import SharedWork, track_shared_work
+from app.services.chat_service import aappend_message
+from app.services.orchestrator_service import OrchestratorService
+
+# Items in flight across all batches, so concurrent batches cannot crowd out interactive traffic.
+# asyncio primitives belong to one loop; the app runs one loop per process.
+_item_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _batch_slots() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    slots = _item_slots.get(loop)
+    if slots is None:
+        slots = _item_slots[loop] = asyncio.Semaphore(max(1, settings.ask_batch_max_in_flight))
+    return slots
+
+
+def _shared_summary(tally: SharedWork) -> Dict[str, int]:
+    """LLM/embedding work this batch got from the response cache or an identical in-flight call."""
+    return {
+        "llm_cache_hits": tally.get("llm_cache_hit"),
+        "coalesced_llm_calls": tally.get("coalesced:chat"),
+        "coalesced_embeddings": tally.get("coalesced:embeddings"),
+    }
+
+
+async def run_batch(
+    orchestrator: OrchestratorService,
+    items: List[Dict[str, Any]],
+    concurrency: int,
+    record_chats: bool = False,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run many {"message", "user_id"} items through orchestrator.arun with at most `concurrency`
+    in flight, yielding one result per item as it completes (tagged with its index), then a summary.
+
+    Items share the process-wide LLM response cache and singleflight, so repeated questions
+    (e.g. the same intent prompt for different users) cost one upstream call. Their Ollama calls
+    run in the "background" priority class, and at most ASK_BATCH_MAX_IN_FLIGHT items of all
+    batches run at once, so batches only use capacity interactive /ask traffic leaves free.
+    """
+    t0 = time.perf_counter()
+    pending = iter(enumerate(items))
+    results: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+
+    async def one(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        user_id = item.get("user_id") or "default"
+        started = time.perf_counter()
+        try:
+            if record_chats:
+                await aappend_message(user_id, "user", item["message"])
+            with priority_class("background"):
+                out = await orchestrator.arun(item["message"], user_id=user_id)
+            if record_chats:
+                meta = {"agent_path": out.get("agent_path", []), "confidence": out.get("confidence", 0.0), "run_id": out.get("run_id")}
+                await aappend_message(user_id, "assistant", out.get("reply", ""), meta=meta)
+            line: Dict[str, Any] = {"index": index, "user_id": user_id, "ok": True, **out}
+        except Exception as e:  # noqa: BLE001
+            line = {"index": index, "user_id": user_id, "ok": False, "error": str(e)}
+        line["latency_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        return line
+
+    async def worker() -> None:
+        # workers pull from one shared iterator, so at most `concurrency` items are ever in flight
+        for index, item in pending:
+            async with _batch_slots():
+                line = await one(index, item)
+            await results.put(line)
+
+    # workers copy the context when created, so they all count into this batch's tally
+    with track_shared_work() as tally:
+        workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(int(concurrency), len(items))))]
+    failed = 0
+    try:
+        for _ in range(len(items)):
+            line = await results.get()
+            failed += 0 if line["ok"] else 1
+            yield line
+    finally:
+        # client went away mid-stream: stop starting new items
+        for w in workers:
+            w.cancel()
+
+    yield {
+        "done": True,
+        "total": len(items),
+        "failed": failed,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+        "shared": _shared_summary(tally),
+    }
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import time
 from typing import Any, Dict, List, Optional
 
 from pypdf import PdfReader
 
+from app.core.answer_cache import answer_cache
 from app.core.config import settings
 from app.core.db import get_store
 from app.core.ollama_client import OllamaClient
+from app.services.search_service import index_chunks
 
 
 def extract_pdf_text(file_path: str, max_pages: Optional[int] = None) -> str:
@@ -100,27 +103,60 @@ def ingest_pdf(
         max_chunks=max_chunks,
     )
 
-    client: Optional[OllamaClient] = None
-    if compute_embeddings:
-        client = OllamaClient(settings.ollama_base_url, settings.embed_model, timeout=settings.ollama_timeout_sec)
+    embeddings: List[Optional[List[float]]] = [None] * len(chunks)
+    embedding_errors: List[Dict[str, Any]] = []
+    t0 = time.perf_counter()
 
-    for idx, chunk in enumerate(chunks):
-        emb = None
-        if compute_embeddings and client:
+    if compute_embeddings and chunks:
+        client = OllamaClient(
+            settings.ollama_base_urls,
+            settings.embed_model,
+            timeout=settings.ollama_timeout_sec,
+            priority="ingestion",
+        )
+        batch_size = max(1, int(settings.embed_batch_size))
+
+        for start in range(0, len(chunks), batch_size):
             # Keep embedding input bounded
-            safe = chunk[:2000]
+            batch = [chunk[:2000] for chunk in chunks[start : start + batch_size]]
             try:
-                emb = client.embeddings(safe, model=settings.embed_model)
-            except Exception:
-                emb = None
-
-        store.add_chunk(
-            user_id=user_id,
-            file_id=file_id,
-            filename=filename,
-            chunk_index=idx,
-            content=chunk,
-            embedding=emb,
+                vectors = client.embed_batch(
+                    batch,
+                    model=settings.embed_model,
+                    concurrency=settings.embed_concurrency,
+                    user_id=user_id,
+                )
+            except Exception as e:  # noqa: BLE001
+                # A failed batch leaves its chunks without embeddings; the rest of the file still ingests
+                embedding_errors.append({"start": start, "end": start + len(batch), "error": str(e)[:500]})
+                continue
+            embeddings[start : start + len(vectors)] = vectors
+
+    embed_ms = (time.perf_counter() - t0) * 1000.0
+
+    # one bulk write (and one corpus version bump) for the whole file
+    store.add_chunks(user_id, file_id, filename, list(zip(chunks, embeddings)))
+
+    if any(e is not None for e in embeddings):
+        index_chunks(
+            user_id,
+            [
+                (embeddings[idx], {"file_id": file_id, "filename": filename, "chunk_index": idx, "content": chunk})
+                for idx, chunk in enumerate(chunks)
+            ],
         )
 
-    return {"ok": True, "file_id": file_id, "filename": filename, "chunks": len(chunks)}
+    if chunks:
+        # answers cached against the previous documents are stale now (add_chunks moved the
+        # store's corpus version for every worker; this just frees them here right away)
+        answer_cache.invalidate(user_id)
+
+    return {
+        "ok": True,
+        "file_id": file_id,
+        "filename": filename,
+        "chunks": len(chunks),
+        "embedded": sum(1 for e in embeddings if e is not None),
+        "embedding_errors": embedding_errors,
+        "embed_ms": round(embed_ms, 1),
+    }
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+
+class JobQueueFull(RuntimeError):
+    """The async /ask queue is at capacity; the caller should retry later."""
+
+
+class JobPool:
+    """
+    Bounded worker pool for `POST /ask?mode=async`.
+
+    submit() returns a run_id at once; one of `workers` threads later calls the job with it.
+    Job status (queued -> running -> completed | failed) lives in the run record in the store,
+    not here, so every worker process can report it and a crash leaves queued runs visible:
+    the caller creates the record before submit() and the job updates it (see routes_ask).
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 100):
+        self.workers = max(1, int(workers))
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._busy = 0
+        self._busy_sec = 0.0
+        self._started_at: Optional[float] = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _start(self) -> None:
+        # workers start with the first job, so importing the app does not spawn threads
+        if self._threads:
+            return
+        self._started_at = time.monotonic()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"ask-job-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, fn: Callable[[str], Any], run_id: Optional[str] = None) -> str:
+        """Queue fn(run_id); raises JobQueueFull instead of waiting when the queue is at capacity."""
+        run_id = run_id or str(uuid.uuid4())
+        with self._lock:
+            self._start()
+            try:
+                self._queue.put_nowait((run_id, fn))
+            except queue.Full:
+                self.rejected += 1
+                raise JobQueueFull(f"Async job queue full ({self._queue.maxsize} queued)")
+            self.submitted += 1
+        return run_id
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            run_id, fn = item
+            with self._lock:
+                self._busy += 1
+            t0 = time.monotonic()
+            ok = True
+            try:
+                fn(run_id)
+            except Exception:  # noqa: BLE001
+                ok = False  # the job records its failure on the run
+            with self._lock:
+                self._busy -= 1
+                self._busy_sec += time.monotonic() - t0
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the workers once the jobs already queued are done, waiting at most `timeout` (app shutdown)."""
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        deadline = time.monotonic() + timeout
+        for t in self._threads:
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            self._threads = []  # a later submit() starts fresh workers
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            uptime = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+            return {
+                "workers": self.workers,
+                "busy": self._busy,
+                "utilization": round(self._busy / self.workers, 4),
+                "avg_utilization": round(self._busy_sec / (uptime * self.workers), 4) if uptime else 0.0,
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+
+ask_jobs = JobPool(workers=settings.ask_job_workers, max_queue=settings.ask_job_max_queue)
@@ -1,15 +1,198 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Generator, Iterator, List, Optional, Tuple, Union
 
+from app.core.answer_cache import answer_cache
+from app.core.budget import DeadlineExceeded, deadline_in, remaining
 from app.core.db import get_store
 from app.core.config import settings
+from app.core.ollama_client import OllamaClient
 
+from app.agents.base import AgentResult
 from app.agents.intent import IntentAgent
+from app.agents.planner import PlannerAgent
 from app.agents.retrieval import RetrievalAgent
 from app.agents.tool import ToolAgent
 from app.agents.safety import SafetyAgent
 from app.agents.final_builder import FinalBuilderAgent
+from app.services.search_service import aretrieve, retrieve
+from app.tools.registry import fast_path
+
+
+Event = Dict[str, Any]
+
+# Agents that consume upstream results: they run alone, once everything queued before them is done.
+JOIN_AGENTS = {"final", "safety"}
+
+# FinalBuilder's stand-in when the latency budget runs out before a reply could be generated
+BUDGET_FALLBACK_REPLY = "Sorry, I ran out of time while answering. Please try again."
+
+# ORCHESTRATOR_MODE -> entry agent
+MODES = {"classic": "intent", "planner": "planner"}
+
+# LLM round trips a fast-path hit skips, per mode (IntentAgent + ToolAgent, or the one PlannerAgent call)
+FAST_PATH_LLM_CALLS_SAVED = {"classic": 2, "planner": 1}
+
+
+def _mode() -> str:
+    return settings.orchestrator_mode if settings.orchestrator_mode in MODES else "classic"
+
+
+class RouteStats:
+    """
+    How requests left the pre-classifier (fast_path vs llm) and the LLM calls that saved,
+    plus completed runs and LLM calls per orchestrator mode so classic and planner can be compared.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.llm = 0
+        self.llm_calls_saved = 0
+        self.by_tool: Dict[str, int] = {}
+        self.by_mode: Dict[str, Dict[str, int]] = {}
+
+    def record(self, route: str, tool: Optional[str] = None, mode: str = "classic") -> None:
+        with self._lock:
+            if route == "fast_path":
+                self.fast_path += 1
+                self.llm_calls_saved += FAST_PATH_LLM_CALLS_SAVED.get(mode, 0)
+                self.by_tool[tool or "?"] = self.by_tool.get(tool or "?", 0) + 1
+            else:
+                self.llm += 1
+
+    def record_run(self, mode: str, llm_calls: int) -> None:
+        with self._lock:
+            m = self.by_mode.setdefault(mode, {"runs": 0, "llm_calls": 0})
+            m["runs"] += 1
+            m["llm_calls"] += llm_calls
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.fast_path + self.llm
+            return {
+                "fast_path": self.fast_path,
+                "llm": self.llm,
+                "fast_path_ratio": round(self.fast_path / total, 4) if total else 0.0,
+                "llm_calls_saved": self.llm_calls_saved,
+                "by_tool": dict(self.by_tool),
+                "by_mode": {
+                    mode: {**m, "avg_llm_calls": round(m["llm_calls"] / m["runs"], 3) if m["runs"] else 0.0}
+                    for mode, m in self.by_mode.items()
+                },
+            }
+
+
+route_stats = RouteStats()
+
+
+class SpeculationStats:
+    """Speculative retrieval outcomes: adopted (hit) vs discarded (wasted), and the search time thrown away."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.launched = 0
+        self.hits = 0
+        self.wasted = 0
+        self.wasted_ms = 0.0
+
+    def record(self, used: bool, search_ms: Optional[float]) -> None:
+        with self._lock:
+            self.launched += 1
+            if used:
+                self.hits += 1
+            else:
+                self.wasted += 1
+                self.wasted_ms += search_ms or 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": settings.speculative_retrieval,
+                "launched": self.launched,
+                "hits": self.hits,
+                "wasted": self.wasted,
+                "hit_rate": round(self.hits / self.launched, 4) if self.launched else 0.0,
+                "wasted_search_ms": round(self.wasted_ms, 3),
+            }
+
+
+speculation_stats = SpeculationStats()
+
+
+class _Speculation:
+    """A retrieval search started alongside the entry agent; adopted if intent routes to retrieval, else discarded."""
+
+    def __init__(self, retrieval: RetrievalAgent, state: Dict[str, Any]):
+        self.retrieval = retrieval
+        self.state = state
+        self.user_id = state["user_id"]
+        self.query = state.get("input", "") or ""
+        self.used = False
+        self.search_ms: Optional[float] = None
+        self.future: Any = None  # concurrent.futures.Future or asyncio.Task
+
+    def _timed(self) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            emb = self.retrieval.query_embedding(self.state)
+            return retrieve(user_id=self.user_id, query=self.query, top_k=settings.top_k, query_embedding=emb)
+        finally:
+            self.search_ms = (time.perf_counter() - t0) * 1000.0
+
+    async def _atimed(self) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            emb = await self.retrieval.aquery_embedding(self.state)
+            return await aretrieve(user_id=self.user_id, query=self.query, top_k=settings.top_k, query_embedding=emb)
+        finally:
+            self.search_ms = (time.perf_counter() - t0) * 1000.0
+
+    def start(self) -> "_Speculation":
+        self.future = _agent_pool().submit(self._timed)
+        return self
+
+    def astart(self) -> "_Speculation":
+        self.future = asyncio.ensure_future(self._atimed())
+        # a discarded search that failed must not warn about an unretrieved exception
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return self
+
+    def hits(self) -> Dict[str, Any]:
+        self.used = True
+        return self.future.result()
+
+    async def ahits(self) -> Dict[str, Any]:
+        self.used = True
+        return await self.future
+
+    def settle(self) -> Dict[str, Any]:
+        """Discard the search if it was not adopted; returns the run step describing the outcome."""
+        if not self.used:
+            self.future.cancel()
+        # a discarded search may still be running: count its wasted time once it actually ends
+        self.future.add_done_callback(lambda _: speculation_stats.record(self.used, self.search_ms))
+        return {"used": self.used, "search_ms": round(self.search_ms, 3) if self.search_ms is not None else None}
+
+    def cancel(self) -> None:
+        """The run failed or was cancelled: stop the search even if it was adopted."""
+        self.future.cancel()
+        self.settle()
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _agent_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.orchestrator_max_workers, thread_name_prefix="agent")
+        return _pool
 
 
 class OrchestratorService:
@@ -19,19 +202,155 @@ class OrchestratorService:
         self.max_hops = max_hops or settings.max_hops
         self.agents = {
             "intent": IntentAgent(),
+            "planner": PlannerAgent(),
             "retrieval": RetrievalAgent(),
             "tool": ToolAgent(),
             "final": FinalBuilderAgent(),
             "safety": SafetyAgent(),
         }
+        # question embeddings for the semantic answer cache
+        self.embedder = OllamaClient(settings.ollama_base_urls, settings.embed_model, timeout=settings.ollama_timeout_sec)
 
-    def run(self, user_message: str, user_id: str = "default") -> Dict[str, Any]:
-        store = get_store()
+    def run(self, user_message: str, user_id: str = "default", run_id: Optional[str] = None) -> Dict[str, Any]:
+        """Run the workflow; `run_id` names a run record the caller already created (async jobs create it at submit)."""
+        result: Dict[str, Any] = {}
+        for event in self._execute(user_message, user_id, stream=False, run_id=run_id):
+            if event["event"] == "done":
+                result = event["data"]
+        return result
+
+    def run_stream(self, user_message: str, user_id: str = "default") -> Iterator[Event]:
+        """
+        Same flow as run(), as a stream of events:
+        run -> agent (per step) -> token (FinalBuilder deltas) -> [blocked] -> done.
+        """
+        return self._execute(user_message, user_id, stream=True)
+
+    def _stream_final(self, state: Dict[str, Any]) -> Generator[Event, None, AgentResult]:
+        """Stream FinalBuilder tokens, stopping early if SafetyAgent flags the partial reply."""
+        safety: SafetyAgent = self.agents["safety"]  # type: ignore[assignment]
+        tokens = self.agents["final"].run_stream(state)  # type: ignore[attr-defined]
+        parts: List[str] = []
+        while True:
+            try:
+                delta = next(tokens)
+            except StopIteration as stop:
+                return stop.value
+
+            parts.append(delta)
+            flags = safety.check("".join(parts))
+            if flags:
+                tokens.close()
+                # SafetyAgent runs next and replaces the partial reply with its refusal
+                state["draft_reply"] = "".join(parts).strip()
+                yield {"event": "blocked", "data": {"flags": flags}}
+                return AgentResult(
+                    agent="final",
+                    status="ok",
+                    data={"reply": state["draft_reply"], "truncated": True},
+                    confidence=float(state.get("confidence", 0.5)),
+                    next=["safety"],
+                    llm_calls=1,
+                )
+
+            yield {"event": "token", "data": {"text": delta}}
+
+    def _next_wave(self, queue: List[str], budget: int) -> List[str]:
+        """
+        Pop the next set of agents that may run together: the head of the queue plus the
+        independent agents queued right behind it (e.g. tool + retrieval), up to the hop budget.
+        """
+        wave = [queue.pop(0)]
+        if wave[0] in JOIN_AGENTS or not settings.orchestrator_parallel:
+            return wave
+        while queue and len(wave) < budget and queue[0] not in JOIN_AGENTS:
+            wave.append(queue.pop(0))
+        return wave
+
+    def _speculate(self, state: Dict[str, Any], queue: List[str]) -> Optional[_Speculation]:
+        if not settings.speculative_retrieval or queue != [state["entry"]]:
+            return None
+        return _Speculation(self.agents["retrieval"], state)  # type: ignore[arg-type]
+
+    @staticmethod
+    def _degraded(name: str, state: Dict[str, Any], reason: str) -> AgentResult:
+        """
+        Stand-in step for an agent skipped or cut short by the latency budget.
+        The request carries on to FinalBuilder (or, for FinalBuilder itself, a fallback reply).
+        """
+        left = remaining(state.get("deadline"))
+        state["degraded"].append({"agent": name, "reason": reason})
+        if name == "final":
+            state["draft_reply"] = BUDGET_FALLBACK_REPLY
+            state["confidence"] = 0.0
+        return AgentResult(
+            agent=name,
+            status="degraded",
+            data={"reason": reason, "remaining_ms": round(left * 1000.0, 1) if left is not None else None},
+            confidence=0.0,
+            next=["safety"] if name == "final" else ["final"],
+        )
+
+    def _budget_skip(self, name: str, state: Dict[str, Any]) -> Optional[AgentResult]:
+        """Degradation policy: skippable hops (retrieval, tool) give way once only the final-reply reserve is left."""
+        left = remaining(state.get("deadline"))
+        if left is None or name not in settings.budget_skippable_agents or left >= settings.budget_final_reserve_sec:
+            return None
+        return self._degraded(name, state, "skipped_low_budget")
+
+    def _run_agent(self, name: str, state: Dict[str, Any], spec: Optional[_Speculation]) -> AgentResult:
+        skipped = self._budget_skip(name, state)
+        if skipped is not None:
+            return skipped
+        if name == "retrieval" and spec is not None:
+            try:
+                return self.agents["retrieval"].finish(state, spec.hits(), speculative=True)  # type: ignore[attr-defined]
+            except Exception:  # noqa: BLE001
+                pass  # speculative search failed: search again for real
+        try:
+            return self.agents[name].run(state)
+        except DeadlineExceeded:
+            return self._degraded(name, state, "deadline_exceeded")
+
+    async def _arun_agent(self, name: str, state: Dict[str, Any], spec: Optional[_Speculation]) -> AgentResult:
+        skipped = self._budget_skip(name, state)
+        if skipped is not None:
+            return skipped
+        if name == "retrieval" and spec is not None:
+            try:
+                return self.agents["retrieval"].finish(state, await spec.ahits(), speculative=True)  # type: ignore[attr-defined]
+            except Exception:  # noqa: BLE001
+                pass
+        try:
+            return await self.agents[name].arun(state)
+        except DeadlineExceeded:
+            return self._degraded(name, state, "deadline_exceeded")
+
+    def _run_wave(
+        self,
+        wave: List[str],
+        state: Dict[str, Any],
+        spec: Optional[_Speculation] = None,
+    ) -> List[Union[AgentResult, BaseException]]:
+        """Run a wave and return each agent's result (or exception) in wave order."""
+        if len(wave) == 1:
+            try:
+                return [self._run_agent(wave[0], state, spec)]
+            except Exception as e:  # noqa: BLE001
+                return [e]
 
-        # Create workflow run (n8n-style execution record)
-        run_id = store.create_run(user_id=user_id, input_text=user_message)
+        # Agents in a wave write disjoint state keys (tool_result / retrieval_hits)
+        futures = [_agent_pool().submit(self._run_agent, name, state, spec) for name in wave]
+        outcomes: List[Union[AgentResult, BaseException]] = []
+        for fut in futures:
+            try:
+                outcomes.append(fut.result())
+            except Exception as e:  # noqa: BLE001
+                outcomes.append(e)
+        return outcomes
 
-        state: Dict[str, Any] = {
+    def _initial_state(self, user_message: str, user_id: str, run_id: str) -> Dict[str, Any]:
+        return {
             "user_id": user_id,
             "input": user_message,
             "agent_path": [],
@@ -41,73 +360,356 @@ class OrchestratorService:
             "draft_reply": "",
             "confidence": 0.5,
             "run_id": run_id,  # optional: allow agents to access it if needed
+            "route": "llm",
+            "mode": _mode(),
+            "entry": MODES[_mode()],
+            "llm_calls": 0,
+            "budget_sec": settings.request_budget_sec,
+            "deadline": deadline_in(settings.request_budget_sec),
+            "started": time.monotonic(),
+            "degraded": [],
+        }
+
+    def _pre_route(self, state: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[AgentResult]]:
+        """
+        Rule-based pre-classifier in front of the entry agent (IntentAgent or PlannerAgent).
+        Returns the "router" step to log and, on a fast-path hit, the tool step already executed.
+        """
+        mode = state["mode"]
+        match = fast_path(state.get("input", "")) if settings.fast_path_enabled else None
+        if match is None:
+            route_stats.record("llm", mode=mode)
+            return {"route": "llm", "mode": mode}, None
+
+        tool_name, tool_args = match
+        state["route"] = "fast_path"
+        state["intent"] = {
+            "intent": "action",
+            "needs_retrieval": False,
+            "needs_tools": True,
+            "notes": f"fast_path:{tool_name}",
+            "confidence": 1.0,
+        }
+        result = self.agents["tool"].execute(state, tool_name, tool_args, confidence=1.0)  # type: ignore[attr-defined]
+        route_stats.record("fast_path", tool_name, mode=mode)
+        saved = FAST_PATH_LLM_CALLS_SAVED[mode]
+        return {"route": "fast_path", "mode": mode, "tool": tool_name, "args": tool_args, "llm_calls_saved": saved}, result
+
+    def _embed_question(self, state: Dict[str, Any]) -> Optional[List[float]]:
+        try:
+            return self.embedder.embeddings(state["input"], user_id=state["user_id"], deadline=state.get("deadline"))
+        except Exception:  # noqa: BLE001
+            return None  # no embedding, no cache: answer normally
+
+    async def _aembed_question(self, state: Dict[str, Any]) -> Optional[List[float]]:
+        try:
+            return await self.embedder.aembeddings(state["input"], user_id=state["user_id"], deadline=state.get("deadline"))
+        except Exception:  # noqa: BLE001
+            return None
+
+    @staticmethod
+    def _check_answer_cache(state: Dict[str, Any], embedding: Optional[List[float]], version: int) -> Union[AgentResult, Dict[str, Any]]:
+        """
+        Semantic answer cache in front of the LLM agents. Returns the "cache" step to log:
+        an AgentResult standing in for every LLM hop on a hit, a plain miss record otherwise.
+        `version` is the store's corpus version for the user (shared by every worker on MongoStore).
+        """
+        if embedding is None:
+            return {"hit": False, "error": "embedding_failed"}
+        state["question_embedding"] = embedding
+        state["corpus_version"] = version
+        hit = answer_cache.lookup(state["user_id"], embedding, version)
+        if hit is None:
+            return {"hit": False, "corpus_version": version}
+
+        state["route"] = "cache"
+        state["draft_reply"] = hit["reply"]
+        state["confidence"] = hit["confidence"]
+        data = {"hit": True, "similarity": hit["similarity"], "corpus_version": version, "cached_run_id": hit["run_id"]}
+        return AgentResult(agent="cache", status="ok", data=data, confidence=hit["confidence"], next=[])
+
+    @staticmethod
+    def _remember_answer(state: Dict[str, Any], out: Dict[str, Any]) -> None:
+        """Cache LLM-built replies; tool results (e.g. the time) and degraded runs are not reusable."""
+        embedding = state.get("question_embedding")
+        if embedding is None or out["route"] != "llm" or out["degraded"] or "tool" in out["agent_path"] or not out["reply"]:
+            return
+        answer_cache.store(
+            state["user_id"],
+            embedding,
+            state["corpus_version"],
+            {"reply": out["reply"], "confidence": out["confidence"], "run_id": out["run_id"], "question": state["input"]},
+        )
+
+    @staticmethod
+    def _agent_event(current: str, result: AgentResult, nxt: List[str]) -> Event:
+        return {
+            "event": "agent",
+            "data": {
+                "agent": current,
+                "status": result.get("status"),
+                "confidence": result.get("confidence"),
+                "next": nxt,
+            },
+        }
+
+    def _route(self, state: Dict[str, Any], queue: List[str], current: str, result: AgentResult) -> List[str]:
+        """Record `current` in agent_path and queue its next agents; returns them (minus "stop")."""
+        # Track agent path
+        state["agent_path"].append(current)
+        state["llm_calls"] += int(result.get("llm_calls", 0) or 0)
+
+        # Next-step routing
+        nxt = result.get("next") or []
+        nxt = [n for n in nxt if n != "stop"]
+
+        # Extend queue (avoid duplicates); safety always ends
+        if current != "safety":
+            for n in nxt:
+                if n in self.agents and n not in queue:
+                    queue.append(n)
+        return nxt
+
+    def _output(self, state: Dict[str, Any], run_id: str) -> Dict[str, Any]:
+        # Output contract
+        confidence = float(state.get("confidence", 0.6))
+        return {
+            "reply": state.get("draft_reply") or "",
+            "agent_path": state.get("agent_path", []),
+            "confidence": max(0.0, min(1.0, confidence)),
+            "run_id": run_id,
+            "route": state.get("route", "llm"),
+            "mode": state.get("mode", "classic"),
+            "llm_calls": state.get("llm_calls", 0),
+            "degraded": state.get("degraded", []),
+        }
+
+    @staticmethod
+    def _budget_step(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Run-log record of the budget, only for runs that had to degrade."""
+        if not state.get("degraded"):
+            return None
+        return {
+            "budget_sec": state.get("budget_sec"),
+            "elapsed_ms": round((time.monotonic() - state["started"]) * 1000.0, 1),
+            "degraded": state["degraded"],
         }
 
-        queue: List[str] = ["intent"]
+    # -------------------- shared by _execute and arun --------------------
+    # Routing and what gets logged are decided here; the two paths only differ in how they call
+    # the agents and the store (sync vs awaited).
+
+    def _shortcut(self, state: Dict[str, Any], queue: List[str], name: str, result: AgentResult) -> List[str]:
+        """Route a step that answers without the agent graph (fast-path tool, cache hit): nothing else runs."""
+        queue.clear()
+        return self._route(state, queue, name, result)
+
+    def _take_wave(
+        self,
+        state: Dict[str, Any],
+        queue: List[str],
+        wave: List[str],
+        outcomes: List[Union[AgentResult, BaseException]],
+    ) -> Tuple[List[Tuple[str, AgentResult, List[str]]], bool, Optional[BaseException]]:
+        """
+        Route a finished wave in queue order. Returns the (agent, result, next agents) steps to log,
+        whether SafetyAgent ended the run, and the first agent error, to raise once the steps before it are logged.
+        """
+        steps: List[Tuple[str, AgentResult, List[str]]] = []
+        for current, result in zip(wave, outcomes):
+            if isinstance(result, BaseException):
+                return steps, False, result
+            steps.append((current, result, self._route(state, queue, current, result)))
+            if current == "safety":
+                return steps, True, None
+        return steps, False, None
+
+    def _complete(self, state: Dict[str, Any], run_id: str, spec: Optional[_Speculation]) -> Tuple[Dict[str, Any], List[Tuple[str, Any]]]:
+        """The /ask payload of a finished run, plus the closing steps to log (speculation outcome, budget)."""
+        steps: List[Tuple[str, Any]] = []
+        if spec is not None:
+            steps.append(("speculation", spec.settle()))
+        budget = self._budget_step(state)
+        if budget is not None:
+            steps.append(("budget", budget))
+        out = self._output(state, run_id)
+        route_stats.record_run(out["mode"], out["llm_calls"])
+        self._remember_answer(state, out)
+        return out, steps
+
+    @staticmethod
+    def _final_fields(out: Dict[str, Any]) -> Dict[str, Any]:
+        return {"final_reply": out["reply"], "agent_path": out["agent_path"], "confidence": out["confidence"]}
+
+    @staticmethod
+    def _aborted(state: Dict[str, Any], spec: Optional[_Speculation]) -> Dict[str, Any]:
+        """Stop the speculative search of a failed or cancelled run; returns its finalize_run fields."""
+        if spec is not None:
+            spec.cancel()
+        return {"final_reply": "", "agent_path": state.get("agent_path", []), "confidence": 0.0}
+
+    @staticmethod
+    def _close(store: Any, run_id: str, steps: List[Tuple[str, Any]], final: Dict[str, Any]) -> None:
+        for agent, output in steps:
+            store.append_run_step(run_id, agent, output)
+        store.finalize_run(run_id=run_id, **final)
+
+    @staticmethod
+    async def _aclose(store: Any, run_id: str, steps: List[Tuple[str, Any]], final: Dict[str, Any]) -> None:
+        for agent, output in steps:
+            await store.aappend_run_step(run_id, agent, output)
+        await store.afinalize_run(run_id=run_id, **final)
+
+    def _abort(self, store: Any, run_id: str, state: Dict[str, Any], spec: Optional[_Speculation], step: str, data: Dict[str, Any]) -> None:
+        # best effort: the error (or cancellation) being handled is what the caller sees
+        try:
+            self._close(store, run_id, [(step, data)], self._aborted(state, spec))
+        except Exception:  # noqa: BLE001
+            pass
+
+    async def _aabort(self, store: Any, run_id: str, state: Dict[str, Any], spec: Optional[_Speculation], step: str, data: Dict[str, Any]) -> None:
+        try:
+            await self._aclose(store, run_id, [(step, data)], self._aborted(state, spec))
+        except Exception:  # noqa: BLE001
+            pass
+
+    def _execute(self, user_message: str, user_id: str, stream: bool, run_id: Optional[str] = None) -> Iterator[Event]:
+        store = get_store()
+
+        # Create workflow run (n8n-style execution record), unless the caller already did
+        if run_id is None:
+            run_id = store.create_run(user_id=user_id, input_text=user_message)
+
+        state = self._initial_state(user_message, user_id, run_id)
+        queue: List[str] = [state["entry"]]
         hops = 0
+        spec: Optional[_Speculation] = None
+        finished = False
 
         try:
-            while queue and hops < self.max_hops:
-                current = queue.pop(0)
-                if current not in self.agents:
+            yield {"event": "run", "data": {"run_id": run_id}}
+
+            # Deterministic fast path first; the route taken is logged as a "router" step either way
+            route, fast = self._pre_route(state)
+            store.append_run_step(run_id, "router", route)
+            if fast is not None:
+                store.append_run_step(run_id, "tool", fast)
+                nxt = self._shortcut(state, queue, "tool", fast)
+                hops += 1
+                if stream:
+                    yield self._agent_event("tool", fast, nxt)
+            elif settings.answer_cache_enabled:
+                # only questions the fast path left to the LLM are embedded and looked up
+                cached = self._check_answer_cache(state, self._embed_question(state), store.corpus_version(user_id))
+                store.append_run_step(run_id, "cache", cached)
+                if state["route"] == "cache":
+                    nxt = self._shortcut(state, queue, "cache", cached)  # type: ignore[arg-type]
+                    if stream:
+                        yield self._agent_event("cache", cached, nxt)  # type: ignore[arg-type]
+
+            # Optionally search while the entry agent is still classifying
+            spec = self._speculate(state, queue)
+            if spec is not None:
+                spec.start()
+
+            done = False
+            while queue and hops < self.max_hops and not done:
+                if queue[0] not in self.agents:
                     break
 
-                # Run agent
-                result = self.agents[current].run(state)
+                # Run the next wave; steps are logged in queue order once all of it has finished
+                wave = self._next_wave(queue, self.max_hops - hops)
+                if stream and wave == ["final"]:
+                    try:
+                        outcomes: List[Union[AgentResult, BaseException]] = [(yield from self._stream_final(state))]
+                    except DeadlineExceeded:
+                        outcomes = [self._degraded("final", state, "deadline_exceeded")]
+                else:
+                    outcomes = self._run_wave(wave, state, spec)
 
-                # Log step output
-                store.append_run_step(run_id, current, result)
+                steps, done, error = self._take_wave(state, queue, wave, outcomes)
+                for current, result, nxt in steps:
+                    store.append_run_step(run_id, current, result)
+                    hops += 1
+                    if stream:
+                        yield self._agent_event(current, result, nxt)
+                if error is not None:
+                    raise error
 
-                # Track agent path
-                state["agent_path"].append(current)
+            out, closing = self._complete(state, run_id, spec)
+            spec = None
+            self._close(store, run_id, closing, self._final_fields(out))
+            finished = True
 
-                # Next-step routing
-                nxt = result.get("next") or []
-                nxt = [n for n in nxt if n != "stop"]
+            yield {"event": "done", "data": out}
 
-                # Safety always ends
-                if current == "safety":
-                    break
+        except Exception as e:
+            finished = True
+            # the run stays readable: an "error" step, then finalized with an empty reply
+            self._abort(store, run_id, state, spec, "error", {"error": str(e)})
+            raise
 
-                # Extend queue (avoid duplicates)
-                for n in nxt:
-                    if n in self.agents and n not in queue:
-                        queue.append(n)
+        finally:
+            if not finished:
+                # the consumer stopped iterating (stream client disconnected): close the run as cancelled
+                self._abort(store, run_id, state, spec, "cancelled", {"reason": "stream closed", "agent_path": state.get("agent_path", [])})
 
+    async def arun(self, user_message: str, user_id: str = "default", run_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async version of run(): agents are awaited (arun) and a wave is gathered on the
+        event loop, so a request holds no thread while it waits on Ollama or the store.
+        """
+        store = get_store()
+        if run_id is None:
+            run_id = await store.acreate_run(user_id=user_id, input_text=user_message)
+
+        state = self._initial_state(user_message, user_id, run_id)
+        queue: List[str] = [state["entry"]]
+        hops = 0
+        spec: Optional[_Speculation] = None
+
+        try:
+            route, fast = self._pre_route(state)
+            await store.aappend_run_step(run_id, "router", route)
+            if fast is not None:
+                await store.aappend_run_step(run_id, "tool", fast)
+                self._shortcut(state, queue, "tool", fast)
                 hops += 1
+            elif settings.answer_cache_enabled:
+                cached = self._check_answer_cache(state, await self._aembed_question(state), await store.acorpus_version(user_id))
+                await store.aappend_run_step(run_id, "cache", cached)
+                if state["route"] == "cache":
+                    self._shortcut(state, queue, "cache", cached)  # type: ignore[arg-type]
 
-            # Output contract
-            reply = state.get("draft_reply") or ""
-            confidence = float(state.get("confidence", 0.6))
-            confidence = max(0.0, min(1.0, confidence))
-            agent_path = state.get("agent_path", [])
+            spec = self._speculate(state, queue)
+            if spec is not None:
+                spec.astart()
 
-            # Finalize run
-            store.finalize_run(
-                run_id=run_id,
-                final_reply=reply,
-                agent_path=agent_path,
-                confidence=confidence,
-            )
+            done = False
+            while queue and hops < self.max_hops and not done:
+                if queue[0] not in self.agents:
+                    break
 
-            return {
-                "reply": reply,
-                "agent_path": agent_path,
-                "confidence": confidence,
-                "run_id": run_id,
-            }
+                wave = self._next_wave(queue, self.max_hops - hops)
+                outcomes = await asyncio.gather(*(self._arun_agent(n, state, spec) for n in wave), return_exceptions=True)
+
+                steps, done, error = self._take_wave(state, queue, wave, outcomes)
+                for current, result, _ in steps:
+                    await store.aappend_run_step(run_id, current, result)
+                    hops += 1
+                if error is not None:
+                    raise error
+
+            out, closing = self._complete(state, run_id, spec)
+            spec = None
+            await self._aclose(store, run_id, closing, self._final_fields(out))
+            return out
+
+        except asyncio.CancelledError:
+            # the request was cancelled (client gone, shutdown): close the run as cancelled, like a closed stream
+            await self._aabort(store, run_id, state, spec, "cancelled", {"reason": "request cancelled", "agent_path": state.get("agent_path", [])})
+            raise
 
         except Exception as e:
-            # Mark run failed (if you don't have fail_run, we store a "failed" step + finalize as failed-ish)
-            try:
-                store.append_run_step(run_id, "error", {"error": str(e)})
-                # If you later add store.fail_run(), use it here.
-                store.finalize_run(
-                    run_id=run_id,
-                    final_reply="",
-                    agent_path=state.get("agent_path", []),
-                    confidence=0.0,
-                )
-            except Exception:
-                pass
+            await self._aabort(store, run_id, state, spec, "error", {"error": str(e)})
             raise
@@ -1,7 +1,267 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
 from app.core.db import get_store
+from app.core.llm_cache import InMemoryLRUCache
+from app.repositories.ann_index import AnnIndex, Pair
+
+Hit = Dict[str, Any]
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_ann: Optional[AnnIndex] = None
+
+
+def _search_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.orchestrator_max_workers, thread_name_prefix="search")
+        return _pool
+
+
+def search(user_id: str, query: str, top_k: int = 5, query_embedding: Optional[List[float]] = None):
+    store = get_store()
+    return store.search(user_id=user_id, query=query, top_k=top_k, query_embedding=query_embedding)
+
+async def asearch(user_id: str, query: str, top_k: int = 5, query_embedding: Optional[List[float]] = None):
+    store = get_store()
+    return await store.asearch(user_id=user_id, query=query, top_k=top_k, query_embedding=query_embedding)
+
+
+# -------------------- vector search --------------------
+
+def ann_index() -> AnnIndex:
+    global _ann
+    with _pool_lock:
+        if _ann is None:
+            _ann = AnnIndex(os.path.join(settings.storage_dir, "ann"), min_train=settings.ann_min_train, nprobe=settings.ann_nprobe)
+        return _ann
+
+
+def ann_stats() -> Dict[str, Any]:
+    return _ann.stats() if _ann is not None else {}
+
+
+def _ensure_ann(user_id: str) -> AnnIndex:
+    index = ann_index()
+    # first use for this user: build from the chunks already stored
+    index.ensure(user_id, lambda: get_store().iter_embeddings(user_id))
+    return index
+
+
+def index_chunks(user_id: str, pairs: List[Pair]) -> None:
+    """Ingestion hook: append newly stored (embedding, chunk) pairs to the user's ANN index."""
+    if not settings.ann_index_enabled:
+        return
+    index = ann_index()
+    if index.exists(user_id):
+        index.add(user_id, pairs)
+    else:
+        _ensure_ann(user_id)  # the backfill already includes the new chunks
+
+
+def vector_search(user_id: str, query_embedding: List[float], top_k: int = 5) -> List[Hit]:
+    """The store's vector search, or the on-disk ANN index when ANN_INDEX_ENABLED=true."""
+    if not settings.ann_index_enabled:
+        return get_store().vector_search(user_id, query_embedding, top_k)
+    return [{**meta, "score": score} for score, meta in _ensure_ann(user_id).search(user_id, query_embedding, top_k)]
+
+
+async def avector_search(user_id: str, query_embedding: List[float], top_k: int = 5) -> List[Hit]:
+    if not settings.ann_index_enabled:
+        return await get_store().avector_search(user_id, query_embedding, top_k)
+    return await asyncio.to_thread(vector_search, user_id, query_embedding, top_k)
+
+
+# -------------------- retrieval cache --------------------
+
+class RetrievalCache:
+    """
+    The file-chunk rankings behind retrieve(), keyed by (user_id, normalized query, top_k, mode,
+    corpus version). The version is the store's own (Store.corpus_version: bumped by file and
+    chunk writes once they are applied, and shared by every worker on MongoStore), so a stale
+    ranking is never served; old entries age out of the LRU / TTL. Chat history changes on
+    every turn, so it is not cached: chat hits are searched again on each call.
+    Entries are kept as JSON, so every hit hands out its own copy.
+    """
+
+    def __init__(self, max_entries: int, ttl_sec: float):
+        self.lru = InMemoryLRUCache(max_entries=max_entries, ttl_sec=ttl_sec)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(user_id: str, query: str, top_k: int, mode: str, version: int) -> str:
+        normalized = " ".join((query or "").lower().split())
+        return json.dumps([user_id, normalized, int(top_k), mode, int(version)], ensure_ascii=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self.lru.get(key)
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(raw)
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        self.lru.set(key, json.dumps(result, ensure_ascii=False, default=str))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": settings.retrieval_cache_enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                **self.lru.stats(),
+            }
+
 
-def search(user_id: str, query: str, top_k: int = 5):
+retrieval_cache = RetrievalCache(settings.retrieval_cache_max_entries, settings.retrieval_cache_ttl_sec)
+
+
+def _mode(query_embedding: Optional[List[float]]) -> str:
+    return "hybrid" if query_embedding and settings.hybrid_search_enabled else "lexical"
+
+
+def _cache_mode(query_embedding: Optional[List[float]]) -> str:
+    # lexical mode hands the embedding to the store, whose ranking may then differ from a text-only search
+    mode = _mode(query_embedding)
+    return f"{mode}+embedding" if mode == "lexical" and query_embedding else mode
+
+
+def _cached(key: str) -> Optional[Dict[str, Any]]:
+    return retrieval_cache.get(key) if settings.retrieval_cache_enabled else None
+
+
+def _remember(key: str, lexical: List[Hit], vector: Optional[List[Hit]]) -> None:
+    if settings.retrieval_cache_enabled:
+        files = [h for h in lexical if h.get("source_type") == "file"]
+        retrieval_cache.put(key, {"files": files, "vector": vector})
+
+
+def _from_cache(found: Dict[str, Any], chats: Tuple[List[Hit], float], top_k: int, t0: float) -> Dict[str, Any]:
+    # stores list chat hits after the file chunks, so this rebuilds the lexical ranking exactly
+    lexical = (found["files"] + chats[0], chats[1])
+    result = _result(lexical, None if found["vector"] is None else (found["vector"], 0.0), top_k, t0)
+    result["cached"] = True
+    result["timings"] = {"chat_ms": round(chats[1], 3), "total_ms": result["timings"]["total_ms"]}
+    return result
+
+
+# -------------------- hybrid retrieval --------------------
+
+def _hit_key(hit: Hit) -> Tuple[Any, ...]:
+    if hit.get("source_type") == "file":
+        return ("file", hit.get("file_id"), hit.get("chunk_index"))
+    return ("chat", hit.get("created_at"), hit.get("snippet"))
+
+
+def fuse(lexical: List[Hit], vector: List[Hit], top_k: int) -> List[Hit]:
+    """
+    Weighted reciprocal rank fusion: score = sum(weight / (RRF_K + rank)) over the rankings a hit
+    appears in. Hits keep their shape; `score` becomes the fused score and the per-ranking
+    positions are kept as lexical_rank / vector_rank.
+    """
+    k = settings.hybrid_rrf_k
+    fused: Dict[Tuple[Any, ...], Hit] = {}
+    for name, hits, weight in (("lexical", lexical, settings.hybrid_lexical_weight), ("vector", vector, settings.hybrid_vector_weight)):
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.setdefault(_hit_key(hit), {**hit, "score": 0.0})
+            entry["score"] += weight / (k + rank)
+            entry[f"{name}_rank"] = rank
+    ranked = sorted(fused.values(), key=lambda h: h["score"], reverse=True)[:top_k]
+    for hit in ranked:
+        hit["score"] = round(hit["score"], 6)
+    return ranked
+
+
+def _timed(fn, *args) -> Tuple[List[Hit], float]:
+    t0 = time.perf_counter()
+    hits = fn(*args)
+    return hits, (time.perf_counter() - t0) * 1000.0
+
+
+def _result(lexical: Tuple[List[Hit], float], vector: Optional[Tuple[List[Hit], float]], top_k: int, t0: float) -> Dict[str, Any]:
+    if vector is None:
+        hits, timings = lexical[0][:top_k], {"lexical_ms": round(lexical[1], 3)}
+    else:
+        f0 = time.perf_counter()
+        hits = fuse(lexical[0], vector[0], top_k)
+        timings = {
+            "lexical_ms": round(lexical[1], 3),
+            "vector_ms": round(vector[1], 3),
+            "fusion_ms": round((time.perf_counter() - f0) * 1000.0, 3),
+        }
+    timings["total_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    return {"hits": hits, "mode": "lexical" if vector is None else "hybrid", "timings": timings}
+
+
+def _candidates(top_k: int) -> int:
+    return max(int(top_k), settings.hybrid_candidates)
+
+
+def retrieve(user_id: str, query: str, top_k: int = 5, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    Hybrid retrieval: lexical and vector search run concurrently and are fused by RRF.
+    Returns {"hits", "mode": "hybrid"|"lexical", "timings": {per-stage ms}}; without a query
+    embedding (or with HYBRID_SEARCH_ENABLED=false) it is the store's own search ranking alone,
+    which still gets the embedding (MongoStore uses it for its vector-first search).
+    File rankings are cached until the user's files change (RETRIEVAL_CACHE_ENABLED); a cached
+    result carries "cached": true, with chat history searched fresh (timings: chat_ms, total_ms).
+    """
+    t0 = time.perf_counter()
+    store = get_store()
+    n = _candidates(top_k)
+    key = retrieval_cache.key(user_id, query, top_k, _cache_mode(query_embedding), store.corpus_version(user_id))
+    found = _cached(key)
+    if found is not None:
+        return _from_cache(found, _timed(store.search_chats, user_id, query, n - len(found["files"])), top_k, t0)
+
+    if _mode(query_embedding) == "lexical":
+        lexical = _timed(store.search, user_id, query, n, query_embedding)
+        _remember(key, lexical[0], None)
+        return _result(lexical, None, top_k, t0)
+
+    pending = _search_pool().submit(_timed, vector_search, user_id, query_embedding, n)
+    lexical = _timed(store.search, user_id, query, n)
+    vector = pending.result()
+    _remember(key, lexical[0], vector[0])
+    return _result(lexical, vector, top_k, t0)
+
+
+async def aretrieve(user_id: str, query: str, top_k: int = 5, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+    t0 = time.perf_counter()
     store = get_store()
-    return store.search(user_id=user_id, query=query, top_k=top_k)
+    n = _candidates(top_k)
+
+    async def timed(coro) -> Tuple[List[Hit], float]:
+        s = time.perf_counter()
+        hits = await coro
+        return hits, (time.perf_counter() - s) * 1000.0
+
+    key = retrieval_cache.key(user_id, query, top_k, _cache_mode(query_embedding), await store.acorpus_version(user_id))
+    found = _cached(key)
+    if found is not None:
+        return _from_cache(found, await timed(store.asearch_chats(user_id, query, n - len(found["files"]))), top_k, t0)
+
+    if _mode(query_embedding) == "lexical":
+        lexical = await timed(store.asearch(user_id, query, n, query_embedding))
+        _remember(key, lexical[0], None)
+        return _result(lexical, None, top_k, t0)
+
+    lexical, vector = await asyncio.gather(timed(store.asearch(user_id, query, n)), timed(avector_search(user_id, query_embedding, n)))
+    _remember(key, lexical[0], vector[0])
+    return _result(lexical, vector, top_k, t0)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.ollama_client import OllamaClient
+
+
+def _canonical(name: str) -> str:
+    # /api/ps reports "nomic-embed-text:latest" for a model configured as "nomic-embed-text"
+    return name if ":" in name else f"{name}:latest"
+
+
+class ModelWarmer:
+    """
+    Preloads the chat and embedding models on every Ollama host and re-pins them
+    periodically (keep_alive), so model loads happen here instead of inside a user request.
+    status() is served from the last cycle, which keeps /health cheap.
+    """
+
+    def __init__(self, interval_sec: float, keep_alive: str):
+        self.interval_sec = float(interval_sec)
+        self.keep_alive = keep_alive
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._status: Dict[str, Any] = {"last_warm_at": None, "models": {}}
+
+    def _models(self) -> List[Tuple[str, bool]]:
+        models = [(settings.ollama_model, False)]
+        if settings.enable_embeddings:
+            models.append((settings.embed_model, True))
+        return models
+
+    def warm_once(self) -> Dict[str, Any]:
+        warmed: List[Tuple[str, Dict[str, Optional[str]]]] = []
+        client: Optional[OllamaClient] = None
+        for model, embed in self._models():
+            client = OllamaClient(
+                settings.ollama_base_urls,
+                model,
+                timeout=settings.ollama_timeout_sec,
+                priority="background",
+            )
+            warmed.append((model, client.warm(keep_alive=self.keep_alive, embed=embed)))
+
+        # one /api/ps round after every model had its chance to load
+        resident_by_host: Dict[str, Optional[List[str]]] = client.loaded_models() if client is not None else {}
+
+        models: Dict[str, Any] = {}
+        for model, errors in warmed:
+            hosts = {}
+            for url, err in errors.items():
+                loaded = resident_by_host.get(url)
+                hosts[url] = {
+                    "resident": loaded is not None and _canonical(model) in {_canonical(m) for m in loaded},
+                    "error": err,
+                }
+            models[model] = {"resident": all(h["resident"] for h in hosts.values()), "hosts": hosts}
+
+        status = {"last_warm_at": datetime.utcnow().isoformat() + "Z", "models": models}
+        with self._lock:
+            self._status = status
+        return status
+
+    def start(self) -> None:
+        if self.interval_sec <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+
+        def loop() -> None:
+            while not self._stop.wait(self.interval_sec):
+                try:
+                    self.warm_once()
+                except Exception:  # noqa: BLE001
+                    pass
+
+        self._thread = threading.Thread(target=loop, name="ollama-keep-warm", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._status)
+
+
+warmer = ModelWarmer(interval_sec=settings.ollama_keep_warm_interval_sec, keep_alive=settings.ollama_keep_alive)
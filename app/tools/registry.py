@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import re
 from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+_POWER = re.compile(r"\*\s*\*")
 
 
 def tool_now(_: Dict[str, Any]) -> Dict[str, Any]:
@@ -16,6 +20,8 @@ def tool_calculator(args: Dict[str, Any]) -> Dict[str, Any]:
     import re
     if not re.fullmatch(r"[0-9\s\+\-\*\/\(\)\.]+", expr):
         return {"ok": False, "error": "Expression contains invalid characters"}
+    if _POWER.search(expr):  # 9**9**9**9 would pin the worker
+        return {"ok": False, "error": "Exponentiation is not supported"}
     try:
         value = eval(expr, {"__builtins__": {}}, {})  # noqa: S307
     except Exception as e:  # noqa: BLE001
@@ -26,3 +32,51 @@ TOOLS = {
     "now": tool_now,
     "calculator": tool_calculator,
 }
+
+
+# ---- deterministic fast path ----
+# A matcher returns tool args only when the WHOLE message unambiguously asks for its tool;
+# anything it is unsure about returns None and goes through IntentAgent/ToolAgent as usual.
+
+_CALC_PREFIX = re.compile(r"^(?:what\s+is|what'?s|calculate|calc|compute|evaluate)\s+", re.IGNORECASE)
+_ARITHMETIC = re.compile(r"[0-9\s\+\-\*\/\(\)\.]+")
+_HAS_OPERATOR = re.compile(r"[\d\)]\s*[\+\-\*\/]+\s*[\d\(\-\.]")
+_LEADING_ZERO = re.compile(r"(?<![\d\.])0\d")  # dates/phone numbers like 2024-01-05
+
+_NOW_PHRASES = re.compile(
+    r"^(?:what\s+time\s+is\s+it(?:\s+now)?"
+    r"|what(?:'?s|\s+is)\s+the\s+(?:current\s+)?(?:time|date)(?:\s+(?:now|today|right\s+now))?"
+    r"|what(?:'?s|\s+is)\s+today'?s\s+date"
+    r"|what\s+day\s+is\s+(?:it|today)"
+    r"|(?:current|the)\s+(?:time|date)"
+    r"|time\s+now)$",
+    re.IGNORECASE,
+)
+
+
+def match_calculator(text: str) -> Optional[Dict[str, Any]]:
+    expr = _CALC_PREFIX.sub("", text.strip()).rstrip("?=! ").strip()
+    if not expr or not _ARITHMETIC.fullmatch(expr) or not _HAS_OPERATOR.search(expr) or _LEADING_ZERO.search(expr) or _POWER.search(expr):
+        return None
+    return {"expression": expr}
+
+
+def match_now(text: str) -> Optional[Dict[str, Any]]:
+    phrase = " ".join(text.strip().rstrip("?.! ").split())
+    return {} if _NOW_PHRASES.fullmatch(phrase) else None
+
+
+MATCHERS: Dict[str, Callable[[str], Optional[Dict[str, Any]]]] = {
+    "now": match_now,
+    "calculator": match_calculator,
+}
+
+
+def fast_path(text: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """(tool_name, tool_args) when exactly one matcher claims the message, else None."""
+    matches = []
+    for name, matcher in MATCHERS.items():
+        args = matcher(text or "")
+        if args is not None and name in TOOLS:
+            matches.append((name, args))
+    return matches[0] if len(matches) == 1 else None
@@ -1,8 +1,158 @@
+import json
 import os
 import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
+import pytest
+
 # Ensure project root is on sys.path so `import app...` works
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+from app.repositories.base import Store  # noqa: E402
+
+
+class OllamaStub:
+    """Tiny keep-alive HTTP server; `routes` maps path -> fn(payload) -> (status, body)."""
+
+    def __init__(self):
+        self.routes = {}
+        self.calls = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                # str bodies are sent verbatim (e.g. NDJSON streams)
+                raw = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/x-ndjson" if isinstance(body, str) else "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _handle(self, payload):
+                stub.calls.append((self.path, payload))
+                fn = stub.routes.get(self.path)
+                if fn is None:
+                    return self._reply(404, {"error": "not found"})
+                status, body = fn(payload)
+                self._reply(status, body)
+
+            def do_GET(self):
+                self._handle(None)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                self._handle(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def ollama_stub():
+    stub = OllamaStub()
+    yield stub
+    stub.close()
+
+
+class MemoryStore(Store):
+    """In-memory stand-in for MongoStore used by orchestrator/service tests."""
+
+    def __init__(self):
+        self.chats = []
+        self.files = []
+        self.chunks = []
+        self.runs = {}
+        self.versions = {}
+
+    def append_chat(self, user_id, role, text, meta=None):
+        doc = {"user_id": user_id, "role": role, "text": text, "meta": meta or {}}
+        self.chats.append(doc)
+        return doc
+
+    def get_recent_chats(self, user_id, limit=20):
+        return [c for c in reversed(self.chats) if c["user_id"] == user_id][:limit]
+
+    def create_file(self, user_id, filename, content_type):
+        file_id = f"file-{len(self.files) + 1}"
+        self._bump(user_id)
+        self.files.append({"user_id": user_id, "file_id": file_id, "filename": filename})
+        return file_id
+
+    def _bump(self, user_id):
+        self.versions[user_id] = self.versions.get(user_id, 0) + 1
+
+    def corpus_version(self, user_id):
+        return self.versions.get(user_id, 0)
+
+    def add_chunk(self, user_id, file_id, filename, chunk_index, content, embedding=None):
+        self._bump(user_id)
+        self.chunks.append(
+            {
+                "user_id": user_id,
+                "file_id": file_id,
+                "filename": filename,
+                "chunk_index": chunk_index,
+                "content": content,
+                "embedding": embedding,
+            }
+        )
+
+    def search(self, user_id, query, top_k=5, query_embedding=None):
+        return []
+
+    def search_chats(self, user_id, query, top_k=5):
+        words = set(query.lower().split())
+        hits = [c for c in self.chats if c["user_id"] == user_id and words & set(c["text"].lower().split())]
+        return [{"source_type": "chat", "source": "chat_history", "score": 1.0, "snippet": c["text"]} for c in hits][: max(0, top_k)]
+
+    def create_run(self, user_id, input_text, run_id=None):
+        run_id = run_id or f"run-{len(self.runs) + 1}"
+        self.runs[run_id] = {"run_id": run_id, "user_id": user_id, "input": input_text, "steps": [], "status": "running"}
+        return run_id
+
+    def append_run_step(self, run_id, agent, output):
+        self.runs[run_id]["steps"].append({"agent": agent, "output": output})
+
+    def finalize_run(self, run_id, final_reply, agent_path, confidence):
+        self.runs[run_id].update(
+            {"final_reply": final_reply, "agent_path": agent_path, "confidence": confidence, "status": "completed"}
+        )
+
+    def set_run_status(self, run_id, status, error=None):
+        self.runs[run_id].update({"status": status, **({"error": error} if error else {})})
+
+    def get_run(self, run_id):
+        return self.runs.get(run_id)
+
+    def list_runs(self, user_id, limit=20):
+        return [r for r in self.runs.values() if r["user_id"] == user_id][:limit]
+
+
+@pytest.fixture
+def memory_store(monkeypatch):
+    from app.core import db
+    from app.services import search_service
+
+    store = MemoryStore()
+    monkeypatch.setattr(db, "_store", store)
+    # a new store is a new corpus: results cached against the previous one must not leak in
+    monkeypatch.setattr(search_service, "retrieval_cache", search_service.RetrievalCache(64, 60))
+    return store
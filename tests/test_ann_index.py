@@ -0,0 +1,66 @@
+import json
+import os
+
+import numpy as np
+
+from app.core.config import settings
+from app.repositories.ann_bench import clustered, run
+from app.repositories.ann_index import AnnIndex
+from app.services import search_service
+
+
+def _pairs(vecs, start=0):
+    return [(v.tolist(), {"file_id": "f", "filename": "a.pdf", "chunk_index": start + i, "content": f"chunk {start + i}"}) for i, v in enumerate(vecs)]
+
+
+def test_exact_until_trained_and_shared_through_disk(tmp_path):
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(50, 8))
+    index = AnnIndex(str(tmp_path), min_train=100)
+    assert index.add("u1", _pairs(vecs)) == 50
+
+    hits = index.search("u1", vecs[7].tolist(), top_k=3)
+    assert hits[0][1] == {"source_type": "file", "source": "a.pdf", "file_id": "f", "chunk_index": 7, "snippet": "chunk 7"}
+    assert 0.99 < hits[0][0] <= 1.0
+    assert index.search("u2", vecs[7].tolist(), top_k=3) == []
+
+    # another worker maps the same files and sees later appends once the manifest changes
+    other = AnnIndex(str(tmp_path), min_train=100)
+    assert other.search("u1", vecs[7].tolist(), top_k=1)[0][1]["chunk_index"] == 7
+    index.add("u1", _pairs([vecs[7] * 2], start=50))
+    assert {m["chunk_index"] for _, m in other.search("u1", vecs[7].tolist(), top_k=2)} == {7, 50}
+
+
+def test_ivf_recall_and_retraining(tmp_path):
+    report = run(vectors=3000, dim=32, queries=20, top_k=5, topics=30, nprobes=(1, 16))
+    by_nprobe = {r["nprobe"]: r for r in report["results"]}
+    assert by_nprobe[16]["recall"] >= 0.9
+    assert by_nprobe[16]["recall"] >= by_nprobe[1]["recall"]
+
+    rng = np.random.default_rng(1)
+    index = AnnIndex(str(tmp_path), min_train=200, nprobe=4)
+    index.add("u1", _pairs(clustered(200, 16, 10, 0.3, rng)))
+    path = index._dir("u1")
+    assert json.load(open(os.path.join(path, "manifest.json")))["train"] == 1
+
+    index.add("u1", _pairs(clustered(199, 16, 10, 0.3, rng), start=200))
+    assert json.load(open(os.path.join(path, "manifest.json")))["train"] == 1  # new rows joined existing lists
+    index.add("u1", _pairs(clustered(1, 16, 10, 0.3, rng), start=399))
+    manifest = json.load(open(os.path.join(path, "manifest.json")))
+    assert (manifest["train"], manifest["trained_count"], manifest["count"]) == (2, 400, 400)
+    assert not os.path.exists(os.path.join(path, "assign-1.i32"))
+    assert len(index.search("u1", [1.0] * 16, top_k=5)) == 5
+    assert index.stats()["trained_users"] == 1
+
+
+def test_search_service_backfills_and_indexes_new_chunks(monkeypatch, tmp_path, memory_store):
+    monkeypatch.setattr(settings, "ann_index_enabled", True)
+    monkeypatch.setattr(settings, "storage_dir", str(tmp_path))
+    monkeypatch.setattr(search_service, "_ann", None)
+    memory_store.iter_embeddings = lambda user_id: iter([([1.0, 0.0], {"file_id": "f1", "filename": "old.pdf", "chunk_index": 0, "content": "old"})])
+
+    hits = search_service.vector_search("u1", [1.0, 0.1], top_k=5)
+    assert [h["source"] for h in hits] == ["old.pdf"]
+
+    search_service.index_chunks("u1", [([0.0, 1.0], {"file_id": "f2", "filename": "new.pdf", "chunk_index": 0, "content": "new"})])
+    assert search_service.vector_search("u1", [0.0, 1.0], top_k=1)[0]["source"] == "new.pdf"
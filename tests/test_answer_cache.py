@@ -0,0 +1,94 @@
+import pytest
+
+from app.core import answer_cache as answer_cache_mod
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.config import settings
+from app.core.ollama_client import OllamaClient
+from app.services import ingestion_service
+from app.services.orchestrator_service import OrchestratorService
+
+VECTORS = {
+    "what is the notice period in my contract?": [1.0, 0.0, 0.0],
+    "What's the notice period in my contract": [0.99, 0.1, 0.0],
+    "how many vacation days do I get?": [0.0, 1.0, 0.0],
+}
+
+
+def test_lookup_respects_threshold_version_and_user():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store("u1", [1.0, 0.0], 3, {"reply": "30 days", "confidence": 0.9, "run_id": "r1"})
+
+    assert cache.lookup("u1", [2.0, 0.1], 3)["reply"] == "30 days"  # cosine ~0.999, scale does not matter
+    assert cache.lookup("u1", [1.0, 1.0], 3) is None  # cosine ~0.71
+    assert cache.lookup("u2", [1.0, 0.0], 3) is None
+    assert cache.lookup("u1", [1.0, 0.0], 4) is None  # documents changed since
+    assert cache.stats()["invalidated"] == 1
+    assert cache.lookup("u1", [1.0, 0.0], 3) is None
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    calls = []
+
+    def fake_chat(self, messages, **kwargs):
+        calls.append(messages[0]["content"][:30])
+        if messages[0]["content"].startswith("You are an Intent"):
+            return '{"intent": "question", "needs_retrieval": false, "needs_tools": false, "confidence": 0.9}'
+        return '{"reply": "30 days", "confidence": 0.8}'
+
+    monkeypatch.setattr(OllamaClient, "chat", fake_chat)
+    monkeypatch.setattr(OllamaClient, "embeddings", lambda self, text, **kw: VECTORS[text])
+    monkeypatch.setattr(settings, "answer_cache_enabled", True)
+    monkeypatch.setattr(answer_cache_mod, "answer_cache", SemanticAnswerCache(threshold=0.95))
+    from app.services import orchestrator_service
+
+    monkeypatch.setattr(orchestrator_service, "answer_cache", answer_cache_mod.answer_cache)
+    monkeypatch.setattr(ingestion_service, "answer_cache", answer_cache_mod.answer_cache)
+    return calls
+
+
+def test_near_duplicate_question_is_served_from_cache(llm, memory_store):
+    orch = OrchestratorService(max_hops=6)
+    first = orch.run("what is the notice period in my contract?", user_id="u1")
+    llm.clear()
+
+    second = orch.run("What's the notice period in my contract", user_id="u1")
+
+    assert llm == []
+    assert second["reply"] == first["reply"] == "30 days"
+    assert second["agent_path"] == ["cache"]
+    assert second["route"] == "cache"
+    step = memory_store.runs[second["run_id"]]["steps"][1]
+    assert step["agent"] == "cache"
+    assert step["output"]["data"]["cached_run_id"] == first["run_id"]
+
+    assert orch.run("how many vacation days do I get?", user_id="u1")["agent_path"] == ["intent", "final", "safety"]
+    assert orch.run("What's the notice period in my contract", user_id="u2")["route"] == "llm"
+    assert answer_cache_mod.answer_cache.stats()["hits"] == 1
+
+
+def test_ingestion_invalidates_cached_answers(monkeypatch, llm, memory_store):
+    orch = OrchestratorService(max_hops=6)
+    orch.run("what is the notice period in my contract?", user_id="u1")
+
+    monkeypatch.setattr(ingestion_service, "extract_pdf_text", lambda path, max_pages=None: "x")
+    monkeypatch.setattr(ingestion_service, "chunk_text", lambda text, **kwargs: ["notice period is 60 days"])
+    ingestion_service.ingest_pdf(
+        user_id="u1", file_path="f.pdf", filename="f.pdf", content_type="application/pdf", compute_embeddings=False
+    )
+
+    assert orch.run("What's the notice period in my contract", user_id="u1")["route"] == "llm"
+
+
+def test_ingestion_by_another_worker_invalidates_cached_answers(llm, memory_store):
+    orch = OrchestratorService(max_hops=6)
+    orch.run("what is the notice period in my contract?", user_id="u1")
+    assert orch.run("What's the notice period in my contract", user_id="u1")["route"] == "cache"
+
+    memory_store.add_chunk("u1", "f1", "f.pdf", 0, "notice period is 60 days")  # no local invalidate()
+    assert orch.run("What's the notice period in my contract", user_id="u1")["route"] == "llm"
+
+
+def test_fast_path_questions_are_not_embedded(monkeypatch, llm, memory_store):
+    monkeypatch.setattr(OllamaClient, "embeddings", lambda self, text, **kw: pytest.fail("embedded a fast-path question"))
+    assert OrchestratorService(max_hops=6).run("2 + 2", user_id="u1")["route"] == "fast_path"
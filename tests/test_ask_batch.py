@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.ollama_client import OllamaClient
+from app.core.ollama_scheduler import effective_priority
+
+
+def test_batch_streams_ndjson_with_bounded_concurrency_and_shared_intent(monkeypatch, memory_store):
+    calls = {"intent": 0, "final": 0}
+    in_flight = {"now": 0, "max": 0}
+    priorities = set()
+
+    async def fake_post_chat(self, payload, max_retries, user_id, hedge=False, deadline=None):
+        priorities.add(effective_priority(self.priority))
+        if payload["messages"][0]["content"].startswith("You are an Intent Classification Agent"):
+            calls["intent"] += 1
+            await asyncio.sleep(0.05)
+            return '{"intent": "question", "needs_retrieval": false, "needs_tools": false, "confidence": 0.9}'
+        calls["final"] += 1
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.05)
+        in_flight["now"] -= 1
+        return '{"reply": "ok", "confidence": 0.8}'
+
+    monkeypatch.setattr(OllamaClient, "_apost_chat", fake_post_chat)
+    monkeypatch.setattr(settings, "ask_batch_concurrency", 2)
+    from app.main import app
+
+    items = [{"message": "summarize the quarterly batch roadmap", "user_id": f"u{i % 3}"} for i in range(6)]
+    r = TestClient(app).post("/ask/batch", json={"items": items})
+
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    results, summary = lines[:-1], lines[-1]
+
+    assert sorted(line["index"] for line in results) == list(range(6))
+    assert all(line["ok"] and line["reply"] == "ok" for line in results)
+    assert {line["user_id"] for line in results} == {"u0", "u1", "u2"}
+    assert in_flight["max"] <= 2
+    assert priorities == {"background"}  # batch items yield to interactive /ask traffic
+    # one intent classification shared by every item (singleflight, then the response cache)
+    assert calls["intent"] == 1
+    assert summary["done"] is True
+    assert (summary["total"], summary["failed"]) == (6, 0)
+    assert summary["shared"]["llm_cache_hits"] + summary["shared"]["coalesced_llm_calls"] >= 5
+    assert memory_store.chats == []  # record_chats defaults to off
+
+
+def test_batch_size_is_capped(monkeypatch):
+    monkeypatch.setattr(settings, "ask_batch_max_items", 2)
+    from app.main import app
+
+    r = TestClient(app).post("/ask/batch", json={"items": [{"message": "q"}] * 3})
+    assert r.status_code == 413
+
+
+def test_items_in_flight_are_capped_across_batches(monkeypatch, memory_store):
+    in_flight = {"now": 0, "max": 0}
+
+    async def fake_post_chat(self, payload, max_retries, user_id, hedge=False, deadline=None):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.02)
+        in_flight["now"] -= 1
+        return '{"intent": "question", "needs_retrieval": false, "needs_tools": false, "confidence": 0.9, "reply": "ok"}'
+
+    monkeypatch.setattr(OllamaClient, "_apost_chat", fake_post_chat)
+    monkeypatch.setattr(settings, "ask_batch_max_in_flight", 1)
+    from app.services import batch_service
+    from app.services.orchestrator_service import OrchestratorService
+
+    async def two_batches():
+        async def drain(prefix):
+            items = [{"message": f"{prefix} question {i}", "user_id": "u1"} for i in range(3)]
+            return [line async for line in batch_service.run_batch(OrchestratorService(), items, concurrency=3)]
+
+        return await asyncio.gather(drain("first"), drain("second"))
+
+    for lines in asyncio.run(two_batches()):
+        assert all(line["ok"] for line in lines[:-1])
+        assert lines[-1]["shared"] == {"llm_cache_hits": 0, "coalesced_llm_calls": 0, "coalesced_embeddings": 0}
+    assert in_flight["max"] == 1
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app.agents import final_builder as final_mod
+from app.agents import intent as intent_mod
+from app.agents import safety as safety_mod
+from app.services.job_service import JobPool
+
+
+def _wait_for(fn, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = fn()
+        if value:
+            return value
+        time.sleep(0.01)
+    raise AssertionError("condition not met in time")
+
+
+def _use_pool(monkeypatch, pool):
+    from app import main
+    from app.api import routes_ask
+
+    for mod in (main, routes_ask):
+        monkeypatch.setattr(mod, "ask_jobs", pool)
+
+
+def test_async_ask_returns_run_id_and_reports_progress(monkeypatch, memory_store):
+    release = threading.Event()
+
+    def intent_run(self, state):
+        return {"agent": "intent", "status": "ok", "data": {}, "confidence": 0.9, "next": ["final"]}
+
+    def final_run(self, state):
+        release.wait(3)
+        state["draft_reply"] = "done"
+        return {"agent": "final", "status": "ok", "data": {}, "confidence": 0.9, "next": ["safety"]}
+
+    monkeypatch.setattr(intent_mod.IntentAgent, "run", intent_run)
+    monkeypatch.setattr(final_mod.FinalBuilderAgent, "run", final_run)
+    monkeypatch.setattr(safety_mod.SafetyAgent, "run", lambda self, s: {"agent": "safety", "status": "ok", "next": ["stop"]})
+    pool = JobPool(workers=1, max_queue=1)
+    _use_pool(monkeypatch, pool)
+    from app.main import app
+
+    client = TestClient(app)
+    r = client.post("/ask?mode=async", json={"message": "summarize my notes", "user_id": "u1"})
+    assert r.status_code == 202
+    run_id = r.json()["run_id"]
+
+    # the worker is blocked in FinalBuilder: running, with the steps logged so far
+    run = _wait_for(lambda: (lambda j: j if j["status"] == "running" and j["steps"] else None)(client.get(f"/runs/{run_id}").json()))
+    assert [s["agent"] for s in run["steps"]] == ["router", "intent"]
+    assert client.get("/metrics").json()["ask_jobs"]["busy"] == 1
+
+    # one queued job fills the queue; the next is turned away
+    queued = client.post("/ask?mode=async", json={"message": "and again", "user_id": "u1"}).json()["run_id"]
+    pending = client.get(f"/runs/{queued}").json()
+    assert (pending["status"], pending["steps"]) == ("queued", [])
+    assert memory_store.runs[queued]["status"] == "queued"  # in the store, so every worker process sees it
+    assert client.post("/ask?mode=async", json={"message": "too many", "user_id": "u1"}).status_code == 503
+
+    release.set()
+    run = _wait_for(lambda: (lambda j: j if j["status"] == "completed" else None)(client.get(f"/runs/{run_id}").json()))
+    assert run["final_reply"] == "done"
+    _wait_for(lambda: pool.stats()["completed"] == 2)
+    assert pool.stats()["rejected"] == 1
+    assert [c["text"] for c in memory_store.chats if c["role"] == "assistant"] == ["done", "done"]
+    pool.close()
+
+
+def test_failed_job_is_reported(monkeypatch, memory_store):
+    def boom(self, state):
+        raise RuntimeError("ollama down")
+
+    monkeypatch.setattr(intent_mod.IntentAgent, "run", boom)
+    pool = JobPool(workers=1, max_queue=4)
+    _use_pool(monkeypatch, pool)
+    from app.main import app
+
+    client = TestClient(app)
+    run_id = client.post("/ask?mode=async", json={"message": "hello", "user_id": "u1"}).json()["run_id"]
+
+    run = _wait_for(lambda: (lambda j: j if j["status"] == "failed" else None)(client.get(f"/runs/{run_id}").json()))
+    assert run["error"] == "ollama down"
+    assert run["steps"][-1]["agent"] == "error"
+    pool.close()
@@ -0,0 +1,173 @@
+import asyncio
+import time
+import weakref
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.ollama_client import OllamaClient
+from app.core.ollama_scheduler import OllamaBusyError, OllamaScheduler
+from app.core.ollama_transport import AsyncOllamaTransport, OllamaTransport
+from app.services.orchestrator_service import OrchestratorService
+
+
+def _client(url, scheduler=None):
+    return OllamaClient(
+        url,
+        "m",
+        transport=OllamaTransport(pool_timeout=1),
+        async_transport=AsyncOllamaTransport(max_connections_per_host=64, pool_timeout=1),
+        scheduler=scheduler or OllamaScheduler(max_concurrency=64, max_queue_wait=5),
+        coalesce=False,
+    )
+
+
+def test_achat_holds_many_calls_in_flight_on_one_loop(ollama_stub):
+    def slow(payload):
+        time.sleep(0.3)
+        return 200, {"message": {"content": payload["messages"][0]["content"]}}
+
+    ollama_stub.routes["/api/chat"] = slow
+    client = _client(ollama_stub.url)
+
+    async def main():
+        return await asyncio.gather(*(client.achat([{"role": "user", "content": str(i)}]) for i in range(20)))
+
+    t0 = time.monotonic()
+    out = asyncio.run(main())
+
+    assert out == [str(i) for i in range(20)]
+    assert time.monotonic() - t0 < 2.0  # sequentially this would take 6s
+
+
+def test_async_scheduler_admits_in_priority_order_and_times_out():
+    sched = OllamaScheduler(max_concurrency=1, max_queue_wait=0.2)
+
+    async def main():
+        order = []
+        await sched.acquire_async("interactive", "holder")
+
+        async def worker(priority, user):
+            async with sched.aslot(priority, user):
+                order.append(priority)
+
+        tasks = [asyncio.ensure_future(worker("background", "a")), asyncio.ensure_future(worker("interactive", "b"))]
+        await asyncio.sleep(0.01)
+        sched.release()
+        await asyncio.gather(*tasks)
+
+        await sched.acquire_async("interactive", "holder")
+        with pytest.raises(OllamaBusyError):
+            await sched.acquire_async("interactive", "late")
+        sched.release()
+        return order
+
+    assert asyncio.run(main()) == ["interactive", "background"]
+    assert sched.stats()["in_flight"] == 0
+    assert sched.stats()["classes"]["interactive"]["rejected"] == 1
+
+
+def test_async_singleflight_and_embed_fallback(ollama_stub):
+    ollama_stub.routes["/api/embeddings"] = lambda p: (200, {"embedding": [float(len(p["prompt"]))]})
+    client = _client(ollama_stub.url)
+    client.coalesce = True
+
+    async def main():
+        same = await asyncio.gather(*(client.aembeddings("abc") for _ in range(5)))
+        batch = await client.aembed_batch(["a", "bb"], concurrency=2)
+        return same, batch
+
+    same, batch = asyncio.run(main())
+    assert same == [[3.0]] * 5
+    assert batch == [[1.0], [2.0]]
+    assert [p for p, _ in ollama_stub.calls].count("/api/embeddings") == 3
+
+
+def _patch_async_agents(monkeypatch):
+    from app.agents import final_builder as final_mod
+    from app.agents import intent as intent_mod
+    from app.agents import retrieval as retrieval_mod
+    from app.agents import tool as tool_mod
+
+    async def intent_arun(self, state):
+        return {"agent": "intent", "status": "ok", "data": {}, "confidence": 0.9, "next": ["tool", "retrieval"]}
+
+    async def tool_arun(self, state):
+        await asyncio.sleep(0.2)
+        state["tool_result"] = {"tool": "calculator", "result": {"result": 4.0}}
+        return {"agent": "tool", "status": "ok", "data": {}, "confidence": 0.9, "next": ["final"]}
+
+    async def retrieval_arun(self, state):
+        await asyncio.sleep(0.2)
+        state["retrieval_hits"] = []
+        return {"agent": "retrieval", "status": "ok", "data": {}, "confidence": 0.5, "next": ["final"]}
+
+    async def final_arun(self, state):
+        state["draft_reply"] = "4"
+        state["confidence"] = 0.9
+        return {"agent": "final", "status": "ok", "data": {}, "confidence": 0.9, "next": ["safety"]}
+
+    monkeypatch.setattr(intent_mod.IntentAgent, "arun", intent_arun)
+    monkeypatch.setattr(tool_mod.ToolAgent, "arun", tool_arun)
+    monkeypatch.setattr(retrieval_mod.RetrievalAgent, "arun", retrieval_arun)
+    monkeypatch.setattr(final_mod.FinalBuilderAgent, "arun", final_arun)
+
+
+def test_orchestrator_arun_gathers_waves(monkeypatch, memory_store):
+    _patch_async_agents(monkeypatch)
+
+    t0 = time.monotonic()
+    out = asyncio.run(OrchestratorService(max_hops=6).arun("add this to my notes", user_id="u1"))
+
+    assert time.monotonic() - t0 < 0.35
+    assert out["reply"] == "4"
+    assert out["agent_path"] == ["intent", "tool", "retrieval", "final", "safety"]
+    run = memory_store.runs[out["run_id"]]
+    assert [s["agent"] for s in run["steps"]] == ["router"] + out["agent_path"]
+    assert run["status"] == "completed"
+
+
+def test_cancelled_arun_finalizes_the_run(monkeypatch, memory_store):
+    _patch_async_agents(monkeypatch)
+    run_id = memory_store.create_run("u1", "add this to my notes", run_id="given")
+
+    async def main():
+        task = asyncio.ensure_future(OrchestratorService(max_hops=6).arun("add this to my notes", user_id="u1", run_id=run_id))
+        await asyncio.sleep(0.1)  # tool + retrieval wave in flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+    run = memory_store.runs[run_id]
+    assert list(memory_store.runs) == [run_id]  # the caller's run record, not a new one
+    assert [s["agent"] for s in run["steps"]] == ["router", "intent", "cancelled"]
+    assert run["status"] == "completed" and run["final_reply"] == ""
+
+
+def test_ask_route_is_async(monkeypatch, memory_store):
+    _patch_async_agents(monkeypatch)
+    from app.main import app
+
+    r = TestClient(app).post("/ask", json={"message": "add this to my notes", "user_id": "u1"})
+
+    assert r.status_code == 200
+    assert r.json()["reply"] == "4"
+    assert [c["role"] for c in memory_store.chats] == ["user", "assistant"]
+    assert memory_store.chats[1]["meta"]["run_id"] == r.json()["run_id"]
+
+
+def test_mongo_async_client_is_closed_on_shutdown():
+    from app.repositories.mongo_store import MongoStore
+
+    store = MongoStore.__new__(MongoStore)
+    store._async_clients = weakref.WeakKeyDictionary()
+    store._mongo_uri, store._db_name = "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=10", "test"
+
+    async def main():
+        assert store._adb() is not None and len(store._async_clients) == 1  # connects lazily: no server needed
+        await store.aclose()
+        assert len(store._async_clients) == 0
+
+    asyncio.run(main())
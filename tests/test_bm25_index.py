@@ -0,0 +1,53 @@
+import os
+
+from app.repositories.bm25_index import BM25Index
+from app.repositories.local_json_store import LocalJsonStore
+
+
+def test_bm25_prefers_rare_terms_and_short_documents(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.jsonl"))
+    index.add("u1", 0, "the contract notice period is thirty days", {"chunk_index": 0})
+    index.add("u1", 1, "the the the the contract", {"chunk_index": 1})
+    index.add("u1", 2, "holiday schedule for the office", {"chunk_index": 2})
+    index.add("u2", 3, "notice period notice period", {"chunk_index": 3})
+
+    hits = index.search("u1", "Notice period of the contract?", top_k=5)
+    assert [m["chunk_index"] for _, m in hits] == [0, 1, 2]
+    assert hits[0][0] > hits[1][0] > hits[2][0] > 0
+    assert index.search("u1", "nothing matches", top_k=5) == []
+    assert index.search("u3", "notice", top_k=5) == []
+
+
+def test_store_persists_postings_and_loads_them_once(tmp_path, monkeypatch):
+    store = LocalJsonStore(storage_dir=str(tmp_path))
+    store.add_chunk("u1", "f1", "a.pdf", 0, "quarterly revenue grew", embedding=None)
+    store.add_chunk("u1", "f1", "a.pdf", 1, "headcount stayed flat", embedding=None)
+    assert os.path.exists(tmp_path / "bm25_postings.jsonl")
+
+    rebuilt = []
+    monkeypatch.setattr(BM25Index, "rebuild", lambda self, docs: rebuilt.append(len(docs)))
+    reopened = LocalJsonStore(storage_dir=str(tmp_path))
+    hits = reopened.search("u1", "revenue", top_k=1)
+    assert [(h["source"], h["chunk_index"]) for h in hits] == [("a.pdf", 0)]
+    assert rebuilt == []  # replayed from the log, not re-tokenized from the chunks
+    monkeypatch.undo()
+
+    # chunks stored before the postings log existed are indexed on first use
+    os.remove(tmp_path / "bm25_postings.jsonl")
+    upgraded = LocalJsonStore(storage_dir=str(tmp_path))
+    assert upgraded.search("u1", "headcount", top_k=1)[0]["chunk_index"] == 1
+    upgraded.add_chunk("u1", "f2", "b.pdf", 0, "revenue forecast", embedding=None)
+    assert [h["source"] for h in LocalJsonStore(storage_dir=str(tmp_path)).search("u1", "forecast", top_k=3)] == ["b.pdf"]
+
+
+def test_a_file_is_indexed_with_one_write_and_synced_by_policy(tmp_path):
+    store = LocalJsonStore(storage_dir=str(tmp_path), fsync="always")
+    store.add_chunks("u1", "f1", "a.pdf", [("alpha notes", None), ("beta notes", None), ("gamma notes", None)])
+    bm25 = store._bm25_index()
+    assert bm25.syncs == 1 and store.stats()["chunks"]["appends"] == 1
+    assert store.corpus_version("u1") == 1
+    store.close()
+
+    reopened = LocalJsonStore(storage_dir=str(tmp_path))
+    assert [h["chunk_index"] for h in reopened.search("u1", "beta", top_k=3)] == [1]
+    assert reopened._bm25_index().docs == 3
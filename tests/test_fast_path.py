@@ -0,0 +1,66 @@
+import pytest
+
+from app.core import ollama_client
+from app.services.orchestrator_service import OrchestratorService, route_stats
+from app.tools.registry import fast_path, tool_calculator
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("25500 + 47500", ("calculator", {"expression": "25500 + 47500"})),
+        ("what is 3*(4+5)?", ("calculator", {"expression": "3*(4+5)"})),
+        ("What time is it?", ("now", {})),
+        ("what's the current date", ("now", {})),
+        ("2024-01-05", None),
+        ("what time is it in Tokyo", None),
+        ("explain why 2+2 is 4", None),
+        ("9**9**9**9", None),
+        ("what is 2 * * 3", None),
+    ],
+)
+def test_matchers_only_claim_unambiguous_requests(text, expected):
+    assert fast_path(text) == expected
+
+
+def test_calculator_refuses_exponentiation():
+    assert tool_calculator({"expression": "9**9**9**9"}) == {"ok": False, "error": "Exponentiation is not supported"}
+    assert tool_calculator({"expression": "2*3"}) == {"ok": True, "result": 6.0}
+
+
+def test_fast_path_skips_intent_and_tool_llm_calls(monkeypatch, memory_store):
+    calls = []
+
+    def fake_chat(self, messages, **kwargs):
+        calls.append(messages[0]["content"][:30])
+        return '{"reply": "73000", "confidence": 0.9}'
+
+    monkeypatch.setattr(ollama_client.OllamaClient, "chat", fake_chat)
+    saved_before = route_stats.stats()["llm_calls_saved"]
+
+    out = OrchestratorService(max_hops=6).run("25500 + 47500", user_id="u1")
+
+    assert out["route"] == "fast_path"
+    assert out["agent_path"] == ["tool", "final", "safety"]
+    assert len(calls) == 1  # FinalBuilder only
+    steps = memory_store.runs[out["run_id"]]["steps"]
+    assert steps[0] == {
+        "agent": "router",
+        "output": {"route": "fast_path", "mode": "classic", "tool": "calculator", "args": {"expression": "25500 + 47500"}, "llm_calls_saved": 2},
+    }
+    assert steps[1]["output"]["data"]["result"] == {"ok": True, "result": 73000.0}
+    assert route_stats.stats()["llm_calls_saved"] == saved_before + 2
+
+
+def test_unsure_requests_fall_back_to_llm(monkeypatch, memory_store):
+    monkeypatch.setattr(
+        ollama_client.OllamaClient,
+        "chat",
+        lambda self, messages, **kw: '{"needs_tools": false, "needs_retrieval": false, "reply": "hi"}',
+    )
+
+    out = OrchestratorService(max_hops=6).run("tell me about 2+2 in history", user_id="u1")
+
+    assert out["route"] == "llm"
+    assert out["agent_path"][0] == "intent"
+    assert memory_store.runs[out["run_id"]]["steps"][0]["output"] == {"route": "llm", "mode": "classic"}
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services import search_service
+from app.services.search_service import fuse
+
+
+def _file(chunk, score=1.0):
+    return {"source_type": "file", "source": "a.pdf", "file_id": "f1", "chunk_index": chunk, "score": score, "snippet": f"c{chunk}"}
+
+
+def test_rrf_rewards_agreement_and_honours_weights(monkeypatch):
+    lexical = [_file(1), _file(2), _file(3)]
+    vector = [_file(3), _file(4), _file(1)]
+
+    hits = fuse(lexical, vector, top_k=3)
+    assert [h["chunk_index"] for h in hits] == [1, 3, 2]  # in both rankings beats a single first place
+    assert (hits[0]["lexical_rank"], hits[0]["vector_rank"]) == (1, 3)
+    assert set(hits[0]) >= {"source_type", "source", "file_id", "chunk_index", "score", "snippet"}
+
+    monkeypatch.setattr(settings, "hybrid_lexical_weight", 0.0)
+    assert [h["chunk_index"] for h in fuse(lexical, vector, top_k=2)] == [3, 4]
+
+
+def test_stages_run_concurrently_with_timings(monkeypatch, memory_store):
+    def lexical(user_id, query, top_k=5, query_embedding=None):
+        time.sleep(0.2)
+        return [_file(1), _file(2)]
+
+    def vector(user_id, query_embedding, top_k=5):
+        time.sleep(0.2)
+        return [_file(2), _file(5)]
+
+    monkeypatch.setattr(memory_store, "search", lexical)
+    monkeypatch.setattr(memory_store, "vector_search", vector)
+
+    t0 = time.monotonic()
+    out = search_service.retrieve("u1", "q", top_k=2, query_embedding=[1.0])
+    assert time.monotonic() - t0 < 0.35
+    assert out["mode"] == "hybrid"
+    assert out["hits"][0]["chunk_index"] == 2
+    assert set(out["timings"]) == {"lexical_ms", "vector_ms", "fusion_ms", "total_ms"}
+    assert out["timings"]["vector_ms"] >= 200
+
+    aout = asyncio.run(search_service.aretrieve("u1", "q", top_k=2, query_embedding=[1.0]))
+    assert [h["chunk_index"] for h in aout["hits"]] == [h["chunk_index"] for h in out["hits"]]
+
+    lexical_only = search_service.retrieve("u1", "q", top_k=1)
+    assert (lexical_only["mode"], len(lexical_only["hits"]), set(lexical_only["timings"])) == ("lexical", 1, {"lexical_ms", "total_ms"})
+
+
+def test_lexical_mode_passes_the_embedding_to_the_store(monkeypatch, memory_store):
+    seen = []
+
+    def search(user_id, query, top_k=5, query_embedding=None):
+        seen.append(query_embedding)
+        return [_file(1)]
+
+    monkeypatch.setattr(memory_store, "search", search)
+    monkeypatch.setattr(settings, "hybrid_search_enabled", False)
+    monkeypatch.setattr(settings, "retrieval_cache_enabled", False)
+
+    assert search_service.retrieve("u1", "q", query_embedding=[1.0])["mode"] == "lexical"
+    assert asyncio.run(search_service.aretrieve("u1", "q", query_embedding=[1.0]))["mode"] == "lexical"
+    assert seen == [[1.0], [1.0]]  # computed for the store's own vector-first search, not dropped
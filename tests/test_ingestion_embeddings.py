@@ -0,0 +1,64 @@
+import pytest
+
+from app.core.config import settings
+from app.core.ollama_client import OllamaClient, OllamaError
+from app.core.ollama_transport import OllamaTransport
+from app.services import ingestion_service
+
+
+def _client(url):
+    return OllamaClient(url, "embed", transport=OllamaTransport(max_connections_per_host=4, pool_timeout=1))
+
+
+def test_embed_batch_uses_multi_input_endpoint(ollama_stub):
+    ollama_stub.routes["/api/embed"] = lambda p: (200, {"embeddings": [[float(len(t))] for t in p["input"]]})
+
+    assert _client(ollama_stub.url).embed_batch(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+    assert [path for path, _ in ollama_stub.calls] == ["/api/embed"]
+
+
+def test_embed_batch_falls_back_to_single_calls(ollama_stub):
+    ollama_stub.routes["/api/embeddings"] = lambda p: (200, {"embedding": [float(len(p["prompt"]))]})
+    client = _client(ollama_stub.url)
+
+    assert client.embed_batch(["a", "bb", "ccc"], concurrency=2) == [[1.0], [2.0], [3.0]]
+    assert client.embed_batch(["dddd"]) == [[4.0]]
+    # /api/embed is probed once, then skipped
+    assert [path for path, _ in ollama_stub.calls].count("/api/embed") == 1
+
+
+def test_embed_batch_raises_for_a_missing_model(ollama_stub):
+    ollama_stub.routes["/api/embed"] = lambda p: (404, {"error": f'model "{p["model"]}" not found, try pulling it first'})
+    client = _client(ollama_stub.url)
+
+    with pytest.raises(OllamaError, match="not found"):
+        client.embed_batch(["a", "bb"])
+    assert client._batch_embed_supported  # the route exists; only the model is missing
+    assert [path for path, _ in ollama_stub.calls] == ["/api/embed"]
+
+
+def test_ingest_reports_failed_batches_and_keeps_file(monkeypatch, ollama_stub, memory_store):
+    def embed(payload):
+        if any(t.startswith("bad") for t in payload["input"]):
+            return 500, {"error": "boom"}
+        return 200, {"embeddings": [[1.0, 0.0] for _ in payload["input"]]}
+
+    ollama_stub.routes["/api/embed"] = embed
+    monkeypatch.setattr(settings, "ollama_base_urls", [ollama_stub.url])
+    monkeypatch.setattr(settings, "embed_batch_size", 2)
+    monkeypatch.setattr(ingestion_service, "extract_pdf_text", lambda path, max_pages=None: "x")
+    monkeypatch.setattr(
+        ingestion_service,
+        "chunk_text",
+        lambda text, **kwargs: ["ok 1", "ok 2", "bad 3", "ok 4", "ok 5"],
+    )
+
+    out = ingestion_service.ingest_pdf(
+        user_id="u1", file_path="f.pdf", filename="f.pdf", content_type="application/pdf", compute_embeddings=True
+    )
+
+    assert out["chunks"] == 5
+    assert out["embedded"] == 3
+    assert [(e["start"], e["end"]) for e in out["embedding_errors"]] == [(2, 4)]
+    assert len([p for p, _ in ollama_stub.calls if p == "/api/embed"]) == 3
+    assert [c["embedding"] is not None for c in memory_store.chunks] == [True, True, False, False, True]
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+from app.core import ollama_client
+from app.core.budget import DeadlineExceeded, deadline_in
+from app.core.config import settings
+from app.core.ollama_client import OllamaClient, OllamaError
+from app.core.ollama_scheduler import OllamaScheduler
+from app.core.ollama_transport import OllamaTransport
+from app.services.orchestrator_service import BUDGET_FALLBACK_REPLY, OrchestratorService
+
+
+def _client(url):
+    return OllamaClient(url, "m", timeout=60, transport=OllamaTransport(pool_timeout=1), coalesce=False)
+
+
+def test_remaining_budget_caps_timeout_and_skips_retries(monkeypatch, ollama_stub):
+    def slow(payload):
+        time.sleep(0.5)
+        return 200, {"message": {"content": "late"}}
+
+    ollama_stub.routes["/api/chat"] = slow
+    monkeypatch.setattr(settings, "budget_min_retry_sec", 5)
+
+    t0 = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        _client(ollama_stub.url).chat([{"role": "user", "content": "hi"}], max_retries=2, deadline=deadline_in(0.2))
+    assert time.monotonic() - t0 < 0.45
+    assert len(ollama_stub.calls) == 1
+
+    ollama_stub.calls.clear()
+    ollama_stub.routes["/api/chat"] = lambda p: (500, {"error": "boom"})
+    with pytest.raises(OllamaError):
+        _client(ollama_stub.url).chat([{"role": "user", "content": "hi"}], max_retries=2, deadline=deadline_in(3))
+    assert len(ollama_stub.calls) == 1  # less than BUDGET_MIN_RETRY_SEC left: no retry
+
+
+def test_exhausted_budget_sends_nothing(ollama_stub):
+    with pytest.raises(DeadlineExceeded):
+        _client(ollama_stub.url).chat([{"role": "user", "content": "hi"}], deadline=time.monotonic() - 1)
+    assert ollama_stub.calls == []
+
+
+def test_follower_with_more_budget_reissues_after_leader_deadline(ollama_stub):
+    def slow(payload):
+        time.sleep(0.3)
+        return 200, {"message": {"content": "ok"}}
+
+    ollama_stub.routes["/api/chat"] = slow
+    client = OllamaClient(ollama_stub.url, "m", transport=OllamaTransport(pool_timeout=1), coalesce=True)
+    messages = [{"role": "user", "content": "same question"}]
+    outcome = {}
+
+    def leader():
+        try:
+            client.chat(messages, max_retries=0, deadline=deadline_in(0.1))
+        except DeadlineExceeded as e:
+            outcome["leader"] = e
+
+    t = threading.Thread(target=leader)
+    t.start()
+    time.sleep(0.03)  # join the leader's in-flight call
+    assert client.chat(messages, max_retries=0, deadline=deadline_in(3)) == "ok"
+    t.join()
+    assert isinstance(outcome["leader"], DeadlineExceeded)
+    assert len(ollama_stub.calls) == 2  # the follower's own call, under its own deadline
+
+
+def test_slot_wait_is_capped_at_the_remaining_budget():
+    sched = OllamaScheduler(max_concurrency=1, max_queue_wait=5)
+    sched.acquire("interactive", "a")
+
+    t0 = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        sched.acquire("interactive", "b", deadline=deadline_in(0.1))
+    assert time.monotonic() - t0 < 1
+    assert sched.stats()["queued"] == 0
+    sched.release()
+
+
+def _fake_llm(deadline_hit_for=()):
+    def fake_chat(self, messages, **kwargs):
+        system = messages[0]["content"]
+        if any(system.startswith(p) for p in deadline_hit_for):
+            raise DeadlineExceeded("request latency budget exhausted")
+        if system.startswith("You are an Intent Classification Agent"):
+            return '{"intent": "question", "needs_retrieval": true, "needs_tools": true, "confidence": 0.9}'
+        return '{"reply": "done", "confidence": 0.8}'
+
+    return fake_chat
+
+
+def test_low_budget_skips_tool_and_retrieval(monkeypatch, memory_store):
+    monkeypatch.setattr(ollama_client.OllamaClient, "chat", _fake_llm())
+    monkeypatch.setattr(settings, "fast_path_enabled", False)
+    monkeypatch.setattr(settings, "request_budget_sec", 10)
+    monkeypatch.setattr(settings, "budget_final_reserve_sec", 15)
+
+    out = OrchestratorService(max_hops=6).run("what is in my notes and what is 2+2", user_id="u1")
+
+    assert out["reply"] == "done"
+    assert out["agent_path"] == ["intent", "tool", "retrieval", "final", "safety"]
+    assert [d["agent"] for d in out["degraded"]] == ["tool", "retrieval"]
+    steps = {s["agent"]: s["output"] for s in memory_store.runs[out["run_id"]]["steps"]}
+    assert steps["tool"]["status"] == "degraded"
+    assert steps["tool"]["data"]["reason"] == "skipped_low_budget"
+    assert steps["budget"]["budget_sec"] == 10
+    assert steps["budget"]["degraded"] == out["degraded"]
+
+
+def test_final_deadline_falls_back_to_canned_reply(monkeypatch, memory_store):
+    monkeypatch.setattr(ollama_client.OllamaClient, "chat", _fake_llm(deadline_hit_for=("You are",)))
+    monkeypatch.setattr(settings, "fast_path_enabled", False)
+
+    out = OrchestratorService(max_hops=6).run("tell me something", user_id="u1")
+
+    assert out["agent_path"] == ["intent", "final", "safety"]
+    assert out["reply"] == BUDGET_FALLBACK_REPLY
+    assert out["confidence"] == 0.0
+    assert [d["reason"] for d in out["degraded"]] == ["deadline_exceeded", "deadline_exceeded"]
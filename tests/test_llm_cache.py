@@ -0,0 +1,67 @@
+from app.core.config import settings
+from app.core import llm_cache
+from app.core.llm_cache import InMemoryLRUCache, ResponseCache, llm_cache_for, response_cache_stats
+from app.core.ollama_client import OllamaClient
+from app.core.ollama_transport import OllamaTransport
+
+
+def test_lru_eviction_and_ttl():
+    now = [0.0]
+    cache = InMemoryLRUCache(max_entries=2, ttl_sec=10, clock=lambda: now[0])
+
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "b" is now least recently used
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+    now[0] = 11.0
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["expired"] == 1
+
+
+def test_cache_hit_skips_ollama(ollama_stub):
+    ollama_stub.routes["/api/chat"] = lambda p: (200, {"message": {"content": '{"intent":"chat"}'}})
+    cache = ResponseCache(InMemoryLRUCache())
+    client = OllamaClient(ollama_stub.url, "m", transport=OllamaTransport(pool_timeout=1), cache=cache)
+    msgs = [{"role": "system", "content": "s"}, {"role": "user", "content": "hello"}]
+
+    assert client.chat(msgs) == client.chat(msgs) == '{"intent":"chat"}'
+    client.chat(msgs, temperature=0.9)  # different key
+
+    assert len(ollama_stub.calls) == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_per_agent_opt_in(monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_agents", ["intent"])
+    from app.agents.intent import IntentAgent
+    from app.agents.tool import ToolAgent
+
+    assert IntentAgent().client.cache is not None
+    assert ToolAgent().client.cache is None
+    assert llm_cache_for("final") is None
+
+
+def test_misconfigured_mongo_cache_reports_disabled(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setattr(settings, "llm_cache_backend", "mongo")
+    monkeypatch.setattr(settings, "mongo_uri", "")
+
+    stats = response_cache_stats()
+    assert stats["enabled"] is False and "MONGO_URI" in stats["error"]
+    assert stats["hits"] == 0
+
+
+def test_misconfigured_mongo_cache_does_not_break_agents(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setattr(settings, "llm_cache_backend", "mongo")
+    monkeypatch.setattr(settings, "mongo_uri", "")
+    monkeypatch.setattr(settings, "llm_cache_agents", ["intent"])
+    from app.agents.intent import IntentAgent
+
+    assert llm_cache_for("intent") is None
+    assert IntentAgent().client.cache is None  # runs uncached instead of failing at import
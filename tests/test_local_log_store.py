@@ -0,0 +1,118 @@
+import json
+import os
+import time
+
+import pytest
+
+from app.repositories.local_json_store import LocalJsonStore
+from app.repositories.record_log import RecordLog
+
+
+def _segments(path):
+    return sorted(os.listdir(path))
+
+
+def test_state_survives_restart_and_writes_only_append(tmp_path):
+    store = LocalJsonStore(str(tmp_path))
+    file_id = store.create_file("u1", "a.pdf", "application/pdf")
+    for i in range(20):
+        store.add_chunk("u1", file_id, "a.pdf", i, f"chunk number {i}", embedding=[1.0, float(i)])
+    store.append_chat("u1", "user", "hello there")
+    store.append_chat("u2", "user", "other user")
+    run_id = store.create_run("u1", "hello there")
+    store.append_run_step(run_id, "intent", {"intent": "chat"})
+    store.finalize_run(run_id, "hi!", ["intent", "final"], 0.9)
+
+    chunks_log = tmp_path / "log" / "chunks" / "000001.jsonl"
+    lines = chunks_log.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 20 and json.loads(lines[3])["chunk_index"] == 3
+    assert not (tmp_path / "index.json").exists()
+    store.close()
+
+    reopened = LocalJsonStore(str(tmp_path))
+    assert [c["text"] for c in reopened.get_recent_chats("u1")] == ["hello there"]
+    run = reopened.get_run(run_id)
+    assert (run["status"], run["final_reply"], [s["agent"] for s in run["steps"]]) == ("completed", "hi!", ["intent"])
+    assert [m["chunk_index"] for _, m in reopened.iter_embeddings("u1")] == list(range(20))
+    assert reopened.search("u1", "number", top_k=1)[0]["source"] == "a.pdf"
+
+
+def test_torn_tail_is_dropped_on_load(tmp_path):
+    store = LocalJsonStore(str(tmp_path))
+    store.append_chat("u1", "user", "first")
+    store.close()
+    segment = tmp_path / "log" / "chats" / "000001.jsonl"
+    with open(segment, "ab") as f:
+        f.write(b'{"user_id": "u1", "role": "user", "te')  # crash mid-write
+
+    reopened = LocalJsonStore(str(tmp_path))
+    assert [c["text"] for c in reopened.get_recent_chats("u1")] == ["first"]
+    assert reopened.stats()["chats"]["truncated_bytes"] > 0
+    reopened.append_chat("u1", "user", "second")
+    assert [c["text"] for c in LocalJsonStore(str(tmp_path)).get_recent_chats("u1")] == ["second", "first"]
+
+
+def test_runs_log_is_compacted_into_a_snapshot(tmp_path):
+    store = LocalJsonStore(str(tmp_path), compact_min_records=10)
+    run_ids = []
+    for i in range(4):
+        run_id = store.create_run("u1", f"question {i}")
+        for agent in ("intent", "retrieval", "final"):
+            store.append_run_step(run_id, agent, {"i": i})
+        store.finalize_run(run_id, f"answer {i}", ["intent", "final"], 0.8)
+        run_ids.append(run_id)
+
+    stats = store.stats()["runs"]
+    assert stats["compactions"] >= 1
+    assert stats["records"] < 4 * 5
+    files = _segments(tmp_path / "log" / "runs")
+    assert sum(name.startswith("snapshot-") for name in files) == 1
+
+    reopened = LocalJsonStore(str(tmp_path), compact_min_records=10)
+    assert [r["final_reply"] for r in reversed(reopened.list_runs("u1"))] == [f"answer {i}" for i in range(4)]
+    assert all(len(reopened.get_run(r)["steps"]) == 3 for r in run_ids)
+
+
+def test_legacy_json_files_are_imported_once(tmp_path):
+    (tmp_path / "index.json").write_text(
+        json.dumps({"files": [{"user_id": "u1", "file_id": "f1", "filename": "old.pdf"}], "chunks": [{"user_id": "u1", "file_id": "f1", "filename": "old.pdf", "chunk_index": 0, "content": "legacy notes"}]})
+    )
+    (tmp_path / "chats.json").write_text(json.dumps([{"user_id": "u1", "role": "user", "text": "old chat"}]))
+    (tmp_path / "runs.json").write_text(json.dumps({"r1": {"run_id": "r1", "user_id": "u1", "steps": [], "status": "completed"}}))
+
+    store = LocalJsonStore(str(tmp_path))
+    assert store.search("u1", "legacy", top_k=1)[0]["source"] == "old.pdf"
+    assert store.get_run("r1")["status"] == "completed"
+    store.close()
+    assert [c["text"] for c in LocalJsonStore(str(tmp_path)).get_recent_chats("u1")] == ["old chat"]
+
+
+def test_fsync_policies(tmp_path):
+    now = [0.0]
+    log = RecordLog(str(tmp_path / "interval"), fsync="interval", fsync_interval_sec=1.0, clock=lambda: now[0])
+    log.append([{"n": 1}])
+    log.append([{"n": 2}])
+    assert log.syncs == 0
+    now[0] = 1.5
+    log.append([{"n": 3}])
+    assert log.syncs == 1
+
+    always = RecordLog(str(tmp_path / "always"), fsync="always", segment_bytes=10)
+    always.append([{"n": 1}, {"n": 2}])
+    always.append([{"n": 3}])
+    assert always.syncs == 2
+    assert _segments(tmp_path / "always") == ["000001.jsonl", "000002.jsonl"]  # rotated past segment_bytes
+    assert RecordLog(str(tmp_path / "always")).load() == [{"n": 1}, {"n": 2}, {"n": 3}]
+
+    with pytest.raises(ValueError):
+        RecordLog(str(tmp_path / "bad"), fsync="sometimes")
+
+
+def test_idle_store_is_synced_by_the_background_thread(tmp_path):
+    store = LocalJsonStore(str(tmp_path), fsync="interval", fsync_interval_sec=0.05)
+    store.append_chat("u1", "user", "hello")
+    time.sleep(0.3)  # no further writes
+    assert store.stats()["chats"]["syncs"] == 1
+    assert store.stats()["runs"]["syncs"] == 0  # nothing to sync
+    store.close()
+    assert not store._syncer.is_alive()
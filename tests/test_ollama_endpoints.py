@@ -0,0 +1,85 @@
+import time
+
+from app.core.config import settings
+from app.core.ollama_client import OllamaClient
+from app.core.ollama_endpoints import EndpointPool
+from app.core.ollama_transport import OllamaTransport
+from conftest import OllamaStub
+
+
+def _ok(content):
+    return lambda payload: (200, {"message": {"content": content}})
+
+
+def test_least_outstanding_pick_and_ejection():
+    now = [0.0]
+    pool = EndpointPool(["http://a", "http://b"], eject_after_failures=2, eject_sec=10, clock=lambda: now[0])
+    a, b = pool.endpoints
+
+    a.outstanding = 3
+    assert pool.pick() is b
+    a.outstanding = 0
+
+    for _ in range(2):
+        try:
+            with pool.track(a):
+                raise RuntimeError("down")
+        except RuntimeError:
+            pass
+    assert pool.stats()["endpoints"]["http://a"]["healthy"] is False
+    b.outstanding = 5
+    assert pool.pick() is b  # ejected endpoints are skipped even when busier ones remain
+
+    now[0] = 11.0
+    assert pool.pick() is a
+
+
+def test_retry_fails_over_to_healthy_backend(ollama_stub):
+    good = OllamaStub()
+    try:
+        ollama_stub.routes["/api/chat"] = lambda p: (500, {"error": "gpu on fire"})
+        good.routes["/api/chat"] = _ok("from-good")
+        client = OllamaClient([ollama_stub.url, good.url], "m", transport=OllamaTransport(pool_timeout=1), coalesce=False)
+
+        assert client.chat([{"role": "user", "content": "hi"}], max_retries=1) == "from-good"
+        stats = client.endpoints.stats()["endpoints"]
+        assert stats[ollama_stub.url]["failures"] == 1
+        assert stats[good.url]["requests"] == 1
+    finally:
+        good.close()
+
+
+def test_hedged_request_races_second_backend(monkeypatch, ollama_stub):
+    fast = OllamaStub()
+    try:
+        def slow(payload):
+            time.sleep(0.5)
+            return 200, {"message": {"content": "from-slow"}}
+
+        ollama_stub.routes["/api/chat"] = slow
+        fast.routes["/api/chat"] = _ok("from-fast")
+        monkeypatch.setattr(settings, "ollama_hedge_after_sec", 0.05)
+        client = OllamaClient([ollama_stub.url, fast.url], "m", transport=OllamaTransport(pool_timeout=1), coalesce=False)
+
+        t0 = time.monotonic()
+        assert client.chat([{"role": "user", "content": "hi"}], hedge=True) == "from-fast"
+        assert time.monotonic() - t0 < 0.4
+        assert client.endpoints.stats()["hedge_wins"] == 1
+    finally:
+        fast.close()
+
+
+def test_health_check_ejects_and_readmits(ollama_stub):
+    pool = EndpointPool([ollama_stub.url], eject_sec=300)
+    transport = OllamaTransport(pool_timeout=1)
+
+    pool.check_health(transport)  # no /api/tags route -> 404, still reachable
+    assert pool.stats()["endpoints"][ollama_stub.url]["healthy"] is True
+
+    ollama_stub.routes["/api/tags"] = lambda p: (503, {"error": "loading"})
+    pool.check_health(transport)
+    assert pool.stats()["endpoints"][ollama_stub.url]["healthy"] is False
+
+    ollama_stub.routes["/api/tags"] = lambda p: (200, {"models": []})
+    pool.check_health(transport)
+    assert pool.stats()["endpoints"][ollama_stub.url]["healthy"] is True
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from app.core.ollama_scheduler import OllamaBusyError, OllamaScheduler
+
+
+def _wait_until(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_priority_then_round_robin_across_users():
+    sched = OllamaScheduler(max_concurrency=1, max_queue_wait=5)
+    sched.acquire("interactive", "holder")
+
+    order = []
+    threads = []
+    for priority, user in [
+        ("ingestion", "bulk"),
+        ("interactive", "alice"),
+        ("interactive", "alice"),
+        ("interactive", "bob"),
+        ("background", "cron"),
+    ]:
+        def worker(p=priority, u=user):
+            with sched.slot(p, u):
+                order.append(f"{p}:{u}")
+
+        queued = sched.stats()["queued"]
+        t = threading.Thread(target=worker)
+        t.start()
+        threads.append(t)
+        _wait_until(lambda: sched.stats()["queued"] == queued + 1)
+
+    sched.release()
+    for t in threads:
+        t.join(2)
+
+    assert order == [
+        "interactive:alice",
+        "interactive:bob",
+        "interactive:alice",
+        "ingestion:bulk",
+        "background:cron",
+    ]
+    stats = sched.stats()
+    assert stats["in_flight"] == 0
+    assert stats["classes"]["interactive"]["admitted"] == 4
+    assert stats["classes"]["background"]["max_queue_ms"] > 0
+
+
+def test_fails_fast_when_queue_wait_exceeded():
+    sched = OllamaScheduler(max_concurrency=1, max_queue_wait=0.05)
+    sched.acquire("interactive", "a")
+
+    with pytest.raises(OllamaBusyError):
+        sched.acquire("ingestion", "b")
+
+    stats = sched.stats()
+    assert stats["classes"]["ingestion"]["rejected"] == 1
+    assert stats["queued"] == 0
+    sched.release()
+    assert sched.stats()["in_flight"] == 0
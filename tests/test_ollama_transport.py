@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from app.core.ollama_client import OllamaClient
+from app.core.ollama_transport import OllamaTransport, PoolTimeoutError, get_transport
+
+
+def test_agents_share_one_transport():
+    from app.agents.final_builder import FinalBuilderAgent
+    from app.agents.intent import IntentAgent
+    from app.agents.tool import ToolAgent
+
+    shared = get_transport()
+    assert IntentAgent().client.transport is shared
+    assert ToolAgent().client.transport is shared
+    assert FinalBuilderAgent().client.transport is shared
+
+
+def test_connections_are_reused(ollama_stub):
+    ollama_stub.routes["/api/chat"] = lambda p: (200, {"message": {"content": '{"ok": true}'}})
+    transport = OllamaTransport(max_connections_per_host=4, pool_timeout=1)
+    client = OllamaClient(ollama_stub.url, "m", transport=transport)
+
+    for _ in range(3):
+        assert client.chat([{"role": "user", "content": "hi"}]) == '{"ok": true}'
+
+    host = transport.stats()["hosts"][ollama_stub.url]
+    assert host["requests"] == 3
+    assert host["connections_opened"] == 1
+    assert host["in_use"] == 0
+
+
+def test_pool_timeout_when_saturated():
+    transport = OllamaTransport(max_connections_per_host=1, pool_timeout=0.05)
+    url = "http://127.0.0.1:1/api/chat"
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with transport.connection(url):
+            held.set()
+            release.wait(2)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    held.wait(2)
+    try:
+        with pytest.raises(PoolTimeoutError):
+            with transport.connection(url):
+                pass
+    finally:
+        release.set()
+        t.join()
+
+    host = transport.stats()["hosts"]["http://127.0.0.1:1"]
+    assert host["pool_timeouts"] == 1
+    assert host["peak_in_use"] == 1
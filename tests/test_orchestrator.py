@@ -1,6 +1,6 @@
 from app.services.orchestrator_service import OrchestratorService
 
-def test_orchestrator_basic_flow(monkeypatch):
+def test_orchestrator_basic_flow(monkeypatch, memory_store):
     # Patch all agents to avoid calling Ollama
     from app.agents import intent as intent_mod
     from app.agents import tool as tool_mod
@@ -27,6 +27,9 @@ def test_orchestrator_basic_flow(monkeypatch):
     monkeypatch.setattr(tool_mod.ToolAgent, "run", tool_run)
     monkeypatch.setattr(final_mod.FinalBuilderAgent, "run", final_run)
     monkeypatch.setattr(safety_mod.SafetyAgent, "run", safety_run)
+    # exercise the LLM agent flow; "2+2" would otherwise take the deterministic fast path
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "fast_path_enabled", False)
 
     orch = OrchestratorService(max_hops=6)
     out = orch.run("2+2", user_id="u1")
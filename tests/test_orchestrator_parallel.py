@@ -0,0 +1,73 @@
+import time
+
+from app.core.config import settings
+from app.services.orchestrator_service import OrchestratorService
+
+
+def _patch_agents(monkeypatch, delay=0.3, tool_error=None):
+    from app.agents import final_builder as final_mod
+    from app.agents import intent as intent_mod
+    from app.agents import retrieval as retrieval_mod
+    from app.agents import tool as tool_mod
+
+    def intent_run(self, state):
+        return {"agent": "intent", "status": "ok", "data": {}, "confidence": 0.9, "next": ["tool", "retrieval"]}
+
+    def tool_run(self, state):
+        time.sleep(delay)
+        if tool_error:
+            raise tool_error
+        state["tool_result"] = {"tool": "calculator", "result": {"ok": True, "result": 4.0}}
+        return {"agent": "tool", "status": "ok", "data": state["tool_result"], "confidence": 0.9, "next": ["final"]}
+
+    def retrieval_run(self, state):
+        time.sleep(delay)
+        state["retrieval_hits"] = [{"text": "doc"}]
+        return {"agent": "retrieval", "status": "ok", "data": {}, "confidence": 0.8, "next": ["final"]}
+
+    def final_run(self, state):
+        state["draft_reply"] = f"{state['tool_result']['result']['result']} / {len(state['retrieval_hits'])}"
+        return {"agent": "final", "status": "ok", "data": {}, "confidence": 0.9, "next": ["safety"]}
+
+    monkeypatch.setattr(intent_mod.IntentAgent, "run", intent_run)
+    monkeypatch.setattr(tool_mod.ToolAgent, "run", tool_run)
+    monkeypatch.setattr(retrieval_mod.RetrievalAgent, "run", retrieval_run)
+    monkeypatch.setattr(final_mod.FinalBuilderAgent, "run", final_run)
+
+
+def test_independent_agents_run_concurrently_and_join_before_final(monkeypatch, memory_store):
+    _patch_agents(monkeypatch)
+
+    t0 = time.monotonic()
+    out = OrchestratorService(max_hops=6).run("2+2 and my notes", user_id="u1")
+
+    assert time.monotonic() - t0 < 0.55
+    assert out["reply"] == "4.0 / 1"
+    assert out["agent_path"] == ["intent", "tool", "retrieval", "final", "safety"]
+    steps = memory_store.runs[out["run_id"]]["steps"]
+    assert [s["agent"] for s in steps] == ["router"] + out["agent_path"]
+
+
+def test_sequential_mode_and_hop_limit(monkeypatch, memory_store):
+    _patch_agents(monkeypatch, delay=0)
+    monkeypatch.setattr(settings, "orchestrator_parallel", False)
+    assert OrchestratorService(max_hops=6).run("x")["agent_path"] == ["intent", "tool", "retrieval", "final", "safety"]
+
+    monkeypatch.setattr(settings, "orchestrator_parallel", True)
+    # the wave is cut at the hop budget, exactly as the sequential loop would stop
+    assert OrchestratorService(max_hops=2).run("x")["agent_path"] == ["intent", "tool"]
+
+
+def test_failed_agent_in_wave_fails_run_after_logging_earlier_steps(monkeypatch, memory_store):
+    _patch_agents(monkeypatch, delay=0, tool_error=RuntimeError("tool down"))
+
+    try:
+        OrchestratorService(max_hops=6).run("x", user_id="u1")
+    except RuntimeError as e:
+        assert str(e) == "tool down"
+    else:
+        raise AssertionError("expected the agent error to propagate")
+
+    run = next(iter(memory_store.runs.values()))
+    assert [s["agent"] for s in run["steps"]] == ["router", "intent", "error"]
+    assert run["agent_path"] == ["intent"]
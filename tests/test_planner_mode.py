@@ -0,0 +1,50 @@
+import pytest
+
+from app.core import ollama_client
+from app.core.config import settings
+from app.services.orchestrator_service import OrchestratorService, route_stats
+
+
+def _fake_llm(calls):
+    def fake_chat(self, messages, **kwargs):
+        system = messages[0]["content"]
+        calls.append(system.split(".")[0])
+        if system.startswith("You are a Planning Agent"):
+            return '{"intent": "action", "needs_retrieval": false, "tool_name": "calculator", "tool_args": {"expression": "6*7"}, "confidence": 0.9}'
+        if system.startswith("You are an Intent Classification Agent"):
+            return '{"intent": "action", "needs_retrieval": false, "needs_tools": true, "confidence": 0.9}'
+        if system.startswith("You are a Tool Selection Agent"):
+            return '{"tool_name": "calculator", "tool_args": {"expression": "6*7"}, "confidence": 0.9}'
+        return '{"reply": "42", "confidence": 0.9}'
+
+    return fake_chat
+
+
+@pytest.mark.parametrize("mode,entry,llm_calls", [("classic", "intent", 3), ("planner", "planner", 2)])
+def test_tool_question_llm_calls_per_mode(monkeypatch, memory_store, mode, entry, llm_calls):
+    calls = []
+    monkeypatch.setattr(ollama_client.OllamaClient, "chat", _fake_llm(calls))
+    monkeypatch.setattr(settings, "fast_path_enabled", False)
+    monkeypatch.setattr(settings, "orchestrator_mode", mode)
+    before = route_stats.stats()["by_mode"].get(mode, {"runs": 0, "llm_calls": 0})
+
+    out = OrchestratorService(max_hops=6).run("multiply six by seven for me", user_id="u1")
+
+    assert out["agent_path"] == [entry, "tool", "final", "safety"]
+    assert out["mode"] == mode
+    assert out["llm_calls"] == llm_calls == len(calls)
+    steps = memory_store.runs[out["run_id"]]["steps"]
+    assert steps[0]["output"] == {"route": "llm", "mode": mode}
+    assert steps[2]["output"]["data"]["result"] == {"ok": True, "result": 42.0}
+    after = route_stats.stats()["by_mode"][mode]
+    assert (after["runs"] - before["runs"], after["llm_calls"] - before["llm_calls"]) == (1, llm_calls)
+
+
+def test_planner_parse_failure_goes_straight_to_final(monkeypatch, memory_store):
+    monkeypatch.setattr(ollama_client.OllamaClient, "chat", lambda self, messages, **kw: "not json")
+    monkeypatch.setattr(settings, "fast_path_enabled", False)
+    monkeypatch.setattr(settings, "orchestrator_mode", "planner")
+
+    out = OrchestratorService(max_hops=6).run("hello there", user_id="u1")
+
+    assert out["agent_path"] == ["planner", "final", "safety"]
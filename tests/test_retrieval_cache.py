@@ -0,0 +1,61 @@
+import asyncio
+
+from app.core.config import settings
+from app.services import search_service
+from app.services.chat_service import append_message
+
+
+def _counting_search(memory_store, monkeypatch):
+    calls = []
+
+    def search(user_id, query, top_k=5, query_embedding=None):
+        calls.append(query)
+        return [{"source_type": "file", "file_id": "f1", "chunk_index": len(calls), "snippet": query}]
+
+    monkeypatch.setattr(memory_store, "search", search)
+    return calls
+
+
+def test_repeat_query_is_served_until_the_user_adds_files(monkeypatch, memory_store):
+    calls = _counting_search(memory_store, monkeypatch)
+
+    first = search_service.retrieve("u1", "What is  the refund policy?", top_k=3)
+    again = search_service.retrieve("u1", "  what is the REFUND policy? ", top_k=3)
+    assert calls == ["What is  the refund policy?"]
+    assert again["cached"] is True and "cached" not in first
+    assert again["hits"] == first["hits"]
+    again["hits"].clear()  # callers get their own copy
+    assert search_service.retrieve("u1", "what is the refund policy?", top_k=3)["hits"] == first["hits"]
+
+    search_service.retrieve("u1", "what is the refund policy?", top_k=5)  # other top_k
+    search_service.retrieve("u2", "what is the refund policy?", top_k=3)  # other user
+    assert len(calls) == 3
+
+    # a new chat turn does not invalidate the file ranking, but is searched fresh
+    append_message("u1", "user", "refund please")
+    found = search_service.retrieve("u1", "what is the refund policy?", top_k=3)
+    assert found["cached"] is True and len(calls) == 3
+    assert found["hits"] == first["hits"] + [{"source_type": "chat", "source": "chat_history", "score": 1.0, "snippet": "refund please"}]
+
+    memory_store.add_chunk("u1", "f2", "b.pdf", 0, "refunds")  # corpus version moves with the store
+    assert "cached" not in search_service.retrieve("u1", "what is the refund policy?", top_k=3)
+    assert len(calls) == 4
+
+    stats = search_service.retrieval_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (3, 4)
+
+
+def test_async_path_and_lru_bound(monkeypatch, memory_store):
+    calls = _counting_search(memory_store, monkeypatch)
+    monkeypatch.setattr(search_service, "retrieval_cache", search_service.RetrievalCache(max_entries=1, ttl_sec=60))
+
+    asyncio.run(search_service.aretrieve("u1", "alpha"))
+    assert asyncio.run(search_service.aretrieve("u1", "alpha"))["cached"] is True
+    asyncio.run(search_service.aretrieve("u1", "beta"))
+    asyncio.run(search_service.aretrieve("u1", "alpha"))  # evicted by beta
+    assert calls == ["alpha", "beta", "alpha"]
+    assert search_service.retrieval_cache.stats()["evictions"] == 2
+
+    monkeypatch.setattr(settings, "retrieval_cache_enabled", False)
+    asyncio.run(search_service.aretrieve("u1", "alpha"))
+    assert len(calls) == 4
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from app.core.ollama_client import OllamaClient
+from app.core.ollama_transport import OllamaTransport
+from app.core.singleflight import SingleFlight, get_singleflight
+
+
+def _run_concurrently(n, fn):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(fn())
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_concurrent_identical_chats_share_one_upstream_call(ollama_stub):
+    def chat(payload):
+        time.sleep(0.2)
+        return 200, {"message": {"content": "shared"}}
+
+    ollama_stub.routes["/api/chat"] = chat
+    client = OllamaClient(ollama_stub.url, "m", transport=OllamaTransport(pool_timeout=2), coalesce=True)
+    before = get_singleflight("chat").stats()["coalesced"]
+
+    results, errors = _run_concurrently(5, lambda: client.chat([{"role": "user", "content": "same"}]))
+
+    assert not errors
+    assert results == ["shared"] * 5
+    assert len(ollama_stub.calls) == 1
+    assert get_singleflight("chat").stats()["coalesced"] - before == 4
+
+
+def test_followers_receive_leader_error_and_key_is_released():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def boom():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+
+    leader = threading.Thread(target=lambda: pytest.raises(RuntimeError, flight.do, "k", boom))
+    leader.start()
+    started.wait(1)
+    with pytest.raises(RuntimeError, match="upstream down"):
+        flight.do("k", lambda: "never runs")
+    leader.join()
+
+    assert flight.do("k", lambda: "fresh") == "fresh"
+    assert flight.stats() == {"executed": 2, "coalesced": 1, "in_flight": 0, "coalesced_ratio": 0.3333}
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.orchestrator_service import OrchestratorService, speculation_stats
+
+
+@pytest.fixture
+def speculative(monkeypatch, memory_store):
+    from app.agents import final_builder as final_mod
+    from app.agents import intent as intent_mod
+
+    monkeypatch.setattr(settings, "speculative_retrieval", True)
+    searches = []
+
+    def slow_search(user_id, query, top_k=5, query_embedding=None):
+        time.sleep(0.2)
+        searches.append(query)
+        return [{"source_type": "file", "source": "notes.pdf", "snippet": "the answer"}]
+
+    monkeypatch.setattr(memory_store, "search", slow_search)
+
+    route = {"next": ["retrieval"]}
+
+    def intent_result():
+        return {"agent": "intent", "status": "ok", "data": {}, "confidence": 0.9, "next": route["next"]}
+
+    def intent_run(self, state):
+        time.sleep(0.2)
+        return intent_result()
+
+    async def intent_arun(self, state):
+        await asyncio.sleep(0.2)
+        return intent_result()
+
+    def final_run(self, state):
+        state["draft_reply"] = f"{len(state['retrieval_hits'])} hits"
+        return {"agent": "final", "status": "ok", "data": {}, "confidence": 0.9, "next": ["safety"]}
+
+    async def final_arun(self, state):
+        return final_run(self, state)
+
+    monkeypatch.setattr(intent_mod.IntentAgent, "run", intent_run)
+    monkeypatch.setattr(intent_mod.IntentAgent, "arun", intent_arun)
+    monkeypatch.setattr(final_mod.FinalBuilderAgent, "run", final_run)
+    monkeypatch.setattr(final_mod.FinalBuilderAgent, "arun", final_arun)
+    return route, searches, memory_store
+
+
+def test_speculative_search_is_adopted_when_intent_asks_for_retrieval(speculative):
+    route, searches, store = speculative
+    before = speculation_stats.stats()
+
+    t0 = time.monotonic()
+    out = OrchestratorService(max_hops=6).run("what do my notes say", user_id="u1")
+
+    assert time.monotonic() - t0 < 0.35  # search overlapped the intent call
+    assert out["reply"] == "1 hits"
+    assert out["agent_path"] == ["intent", "retrieval", "final", "safety"]
+    assert searches == ["what do my notes say"]
+    steps = {s["agent"]: s["output"] for s in store.runs[out["run_id"]]["steps"]}
+    assert steps["retrieval"]["data"]["speculative"] is True
+    assert steps["speculation"]["used"] is True
+    assert speculation_stats.stats()["hits"] == before["hits"] + 1
+
+
+def test_speculative_search_is_discarded_when_not_needed(speculative):
+    route, searches, store = speculative
+    route["next"] = ["final"]
+    before = speculation_stats.stats()
+
+    out = OrchestratorService(max_hops=6).run("hello there", user_id="u1")
+
+    assert out["reply"] == "0 hits"
+    assert "retrieval" not in out["agent_path"]
+    steps = {s["agent"]: s["output"] for s in store.runs[out["run_id"]]["steps"]}
+    assert steps["speculation"]["used"] is False
+    deadline = time.monotonic() + 2
+    while speculation_stats.stats()["wasted"] == before["wasted"] and time.monotonic() < deadline:
+        time.sleep(0.01)  # the discarded search is recorded when it finishes
+    after = speculation_stats.stats()
+    assert after["wasted"] == before["wasted"] + 1
+    assert after["wasted_search_ms"] > before["wasted_search_ms"]
+
+
+def test_async_path_adopts_speculation(speculative):
+    route, searches, store = speculative
+
+    t0 = time.monotonic()
+    out = asyncio.run(OrchestratorService(max_hops=6).arun("what do my notes say", user_id="u1"))
+
+    assert time.monotonic() - t0 < 0.35
+    assert out["reply"] == "1 hits"
+    assert searches == ["what do my notes say"]
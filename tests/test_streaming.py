@@ -0,0 +1,100 @@
+import json
+
+from app.agents.final_builder import _ReplyStream
+from app.core import ollama_client
+from app.core.ollama_client import OllamaClient
+from app.core.ollama_transport import OllamaTransport
+from app.services.orchestrator_service import OrchestratorService
+
+
+def _route_to_final(monkeypatch):
+    from app.agents import intent as intent_mod
+
+    def intent_run(self, state):
+        state["intent"] = {"needs_tools": False, "needs_retrieval": False}
+        return {"agent": "intent", "status": "ok", "data": state["intent"], "confidence": 0.9, "next": ["final"]}
+
+    monkeypatch.setattr(intent_mod.IntentAgent, "run", intent_run)
+
+
+def _fake_stream(pieces):
+    def chat_stream(self, messages, **kwargs):
+        yield from pieces
+
+    return chat_stream
+
+
+def test_reply_stream_decodes_split_escapes():
+    stream = _ReplyStream()
+    pieces = ['{"re', 'ply": "He', 'llo \\', '"w\\u00', 'e9\\"', '", "confidence": 0.8}']
+    out = "".join(stream.feed(p) for p in pieces)
+    assert out == 'Hello "wé"'
+    assert json.loads(stream.raw)["reply"] == out
+
+
+def test_run_stream_emits_tokens_and_persists(monkeypatch, memory_store):
+    _route_to_final(monkeypatch)
+    monkeypatch.setattr(
+        ollama_client.OllamaClient,
+        "chat_stream",
+        _fake_stream(['{"reply": "', "Four", " apples", '", "confidence": 0.8}']),
+    )
+
+    events = list(OrchestratorService(max_hops=6).run_stream("how many?", user_id="u1"))
+    kinds = [e["event"] for e in events]
+
+    assert kinds[0] == "run"
+    assert kinds[-1] == "done"
+    assert "".join(e["data"]["text"] for e in events if e["event"] == "token") == "Four apples"
+    assert kinds.index("token") < kinds.index("done")
+
+    done = events[-1]["data"]
+    assert done["reply"] == "Four apples"
+    assert done["agent_path"] == ["intent", "final", "safety"]
+    run = memory_store.runs[done["run_id"]]
+    assert run["status"] == "completed"
+    assert run["final_reply"] == "Four apples"
+
+
+def test_run_stream_stops_on_unsafe_partial_reply(monkeypatch, memory_store):
+    _route_to_final(monkeypatch)
+    monkeypatch.setattr(
+        ollama_client.OllamaClient,
+        "chat_stream",
+        _fake_stream(['{"reply": "Here is ', "how to make a bomb", " step by step", '"}']),
+    )
+
+    events = list(OrchestratorService(max_hops=6).run_stream("x", user_id="u1"))
+    tokens = "".join(e["data"]["text"] for e in events if e["event"] == "token")
+
+    assert "bomb" not in tokens
+    assert any(e["event"] == "blocked" for e in events)
+    assert events[-1]["data"]["reply"].startswith("I can’t help")
+
+
+def test_client_chat_stream_yields_deltas(ollama_stub):
+    lines = [
+        {"message": {"content": "Hel"}, "done": False},
+        {"message": {"content": "lo"}, "done": False},
+        {"message": {"content": ""}, "done": True},
+    ]
+    ollama_stub.routes["/api/chat"] = lambda p: (200, "\n".join(json.dumps(x) for x in lines) + "\n")
+    client = OllamaClient(ollama_stub.url, "m", transport=OllamaTransport(max_connections_per_host=1, pool_timeout=1))
+
+    assert list(client.chat_stream([{"role": "user", "content": "hi"}])) == ["Hel", "lo"]
+    assert ollama_stub.calls[0][1]["stream"] is True
+
+
+def test_closed_stream_finalizes_the_run(monkeypatch, memory_store):
+    _route_to_final(monkeypatch)
+    monkeypatch.setattr(ollama_client.OllamaClient, "chat_stream", _fake_stream(['{"reply": "', "Four", " apples", '"}']))
+
+    stream = OrchestratorService(max_hops=6).run_stream("how many?", user_id="u1")
+    run_id = next(stream)["data"]["run_id"]
+    while next(stream)["event"] != "token":
+        pass
+    stream.close()  # what StreamingResponse does when the client goes away
+
+    run = memory_store.runs[run_id]
+    assert run["status"] == "completed" and run["final_reply"] == ""
+    assert [s["agent"] for s in run["steps"]][-1] == "cancelled"
@@ -0,0 +1,144 @@
+import numpy as np
+
+from app.agents.retrieval import RetrievalAgent
+from app.core.config import settings
+from app.core.ollama_client import OllamaClient
+from app.repositories.local_json_store import LocalJsonStore
+from app.repositories.mongo_store import MongoStore
+from app.repositories.vector_index import UserMatrixCache, VectorIndex
+
+
+def test_top_k_matches_brute_force_across_growth():
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(300, 16))
+    index = VectorIndex()
+    for i, v in enumerate(vecs):
+        index.add("u1", v.tolist(), {"chunk_index": i})
+
+    q = rng.normal(size=16)
+    hits = index.search("u1", q.tolist(), top_k=5)
+
+    unit = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    expected = np.argsort(-(unit @ (q / np.linalg.norm(q))))[:5]
+    assert [c["chunk_index"] for _, c in hits] == expected.tolist()
+    assert [s for s, _ in hits] == sorted((s for s, _ in hits), reverse=True)
+    assert index.search("u2", q.tolist(), top_k=5) == []
+    assert index.add("u1", [1.0, 0.0], {"chunk_index": -1}) is False  # other dimension
+
+
+def test_local_store_semantic_search_is_incremental(tmp_path):
+    store = LocalJsonStore(storage_dir=str(tmp_path))
+    store.add_chunk("u1", "f1", "a.pdf", 0, "cats and dogs", embedding=[1.0, 0.0, 0.0])
+    store.add_chunk("u1", "f1", "a.pdf", 1, "tax returns", embedding=[0.0, 1.0, 0.0])
+    store.add_chunk("u2", "f2", "b.pdf", 0, "other user", embedding=[0.0, 0.0, 1.0])
+
+    hits = store.search("u1", "pets", top_k=1, query_embedding=[0.9, 0.1, 0.0])
+    assert [(h["chunk_index"], h["source"]) for h in hits] == [(0, "a.pdf")]
+    assert 0.99 < hits[0]["score"] <= 1.0
+
+    # added after the index was built: visible without a reload
+    store.add_chunk("u1", "f3", "c.pdf", 0, "kittens", embedding=[1.0, 0.05, 0.0])
+    assert [h["source"] for h in store.search("u1", "pets", top_k=2, query_embedding=[1.0, 0.04, 0.0])] == ["c.pdf", "a.pdf"]
+
+    # a fresh store rebuilds the index from the replayed chunks; no embedding -> term-frequency search
+    reopened = LocalJsonStore(storage_dir=str(tmp_path))
+    assert reopened.search("u1", "x", top_k=1, query_embedding=[0.0, 1.0, 0.0])[0]["snippet"] == "tax returns"
+    assert reopened.search("u1", "tax", top_k=1)[0]["snippet"] == "tax returns"
+
+
+def test_retrieval_agent_embeds_the_query(monkeypatch, memory_store):
+    seen = {}
+
+    def vector_search(user_id, query_embedding, top_k=5):
+        seen["embedding"] = query_embedding
+        return []
+
+    monkeypatch.setattr(memory_store, "vector_search", vector_search)
+    monkeypatch.setattr(OllamaClient, "embeddings", lambda self, text, **kw: [0.5, 0.5])
+    monkeypatch.setattr(settings, "enable_embeddings", True)
+
+    out = RetrievalAgent().run({"user_id": "u1", "input": "what did I upload?"})
+    assert seen.pop("embedding") == [0.5, 0.5]
+    assert out["data"]["mode"] == "hybrid"
+
+    monkeypatch.setattr(settings, "enable_embeddings", False)
+    out = RetrievalAgent().run({"user_id": "u1", "input": "what did I upload?"})
+    assert "embedding" not in seen
+    assert out["data"]["mode"] == "lexical"
+
+
+def test_matrix_cache_reloads_on_version_bump_and_evicts_cold_users():
+    corpus = {"u1": [([1.0, 0.0], {"id": "a"})], "u2": [([0.0, 1.0], {"id": "b"})]}
+    loads = []
+
+    def loader(user_id):
+        loads.append(user_id)
+        return list(corpus[user_id])
+
+    cache = UserMatrixCache(loader, max_bytes=8)  # room for one 1x2 float32 matrix
+    assert [c["id"] for _, c in cache.search("u1", 0, [1.0, 0.1], 5)] == ["a"]
+    cache.search("u1", 0, [1.0, 0.1], 5)
+    assert loads == ["u1"]
+
+    corpus["u1"].append(([0.7, 0.7], {"id": "c"}))
+    assert [c["id"] for _, c in cache.search("u1", 1, [0.0, 1.0], 1)] == ["c"]
+    assert loads == ["u1", "u1"]
+
+    cache.search("u2", 0, [0.0, 1.0], 1)  # u1 is now the coldest and over the cap
+    stats = cache.stats()
+    assert (stats["users"], stats["evictions"], stats["hits"]) == (1, 1, 1)
+
+
+def test_mongo_vector_search_follows_add_chunk():
+    class FakeChunks:
+        def __init__(self):
+            self.docs = []
+
+        def insert_one(self, doc):
+            self.docs.append(dict(doc))
+
+        def insert_many(self, docs, ordered=True):
+            self.docs.extend(dict(d) for d in docs)
+
+        def find(self, query, projection):
+            return [
+                {k: d[k] for k in projection if k in d}
+                for d in self.docs
+                if d["user_id"] == query["user_id"] and d.get("embedding") is not None
+            ]
+
+    class FakeVersions:
+        # one collection shared by every "worker"
+        def __init__(self):
+            self.docs = {}
+            self.bumps = 0
+
+        def update_one(self, query, update, upsert=False):
+            self.bumps += 1
+            self.docs[query["_id"]] = self.docs.get(query["_id"], 0) + update["$inc"]["version"]
+
+        def find_one(self, query, projection):
+            return {"version": self.docs[query["_id"]]} if query["_id"] in self.docs else None
+
+    def worker(chunks, versions):
+        store = MongoStore.__new__(MongoStore)
+        store.chunks, store.versions = chunks, versions
+        store._matrices = UserMatrixCache(store.iter_embeddings, max_bytes=1 << 20)
+        return store
+
+    chunks, versions = FakeChunks(), FakeVersions()
+    store, other = worker(chunks, versions), worker(chunks, versions)
+
+    store.add_chunk("u1", "f1", "a.pdf", 0, "cats", embedding=[1.0, 0.0])
+    store.add_chunk("u1", "f1", "a.pdf", 1, "no vector")
+    hits = store.vector_search("u1", [1.0, 0.0], top_k=5)
+    assert [(h["source"], h["chunk_index"]) for h in hits] == [("a.pdf", 0)]
+    assert 0.99 < hits[0]["score"] <= 1.0
+    assert other.vector_search("u1", [0.1, 1.0], top_k=1)[0]["source"] == "a.pdf"
+
+    # ingested by one worker, one version bump for the whole file, visible to the other worker
+    bumps = versions.bumps
+    store.add_chunks("u1", "f2", "b.pdf", [("taxes", [0.0, 1.0]), ("more taxes", [0.1, 1.0])])
+    assert versions.bumps == bumps + 1
+    assert other.vector_search("u1", [0.1, 1.0], top_k=1)[0]["source"] == "b.pdf"
+    assert other.vector_cache_stats()["loads"] == 2
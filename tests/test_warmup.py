@@ -0,0 +1,40 @@
+from app.core.config import settings
+from app.services.warmup_service import ModelWarmer
+
+
+def test_warm_once_loads_models_and_reports_residency(monkeypatch, ollama_stub):
+    resident = []
+
+    def load(payload):
+        resident.append(payload["model"])
+        return 200, {"done": True}
+
+    ollama_stub.routes["/api/generate"] = load
+    ollama_stub.routes["/api/embed"] = lambda p: (load(p)[0], {"embeddings": [[0.0]]})
+    ollama_stub.routes["/api/ps"] = lambda p: (200, {"models": [{"name": m if ":" in m else f"{m}:latest"} for m in resident]})
+
+    monkeypatch.setattr(settings, "ollama_base_urls", [ollama_stub.url])
+    monkeypatch.setattr(settings, "ollama_model", "chat-m:7b")
+    monkeypatch.setattr(settings, "embed_model", "embed-m")
+    monkeypatch.setattr(settings, "enable_embeddings", True)
+
+    warmer = ModelWarmer(interval_sec=0, keep_alive="45m")
+    status = warmer.warm_once()
+
+    assert resident == ["chat-m:7b", "embed-m"]
+    assert [path for path, _ in ollama_stub.calls].count("/api/ps") == 1
+    assert all(p["keep_alive"] == "45m" for path, p in ollama_stub.calls if path != "/api/ps")
+    assert status["models"]["chat-m:7b"]["resident"] is True
+    assert status["models"]["embed-m"]["resident"] is True
+    assert warmer.status() == status
+
+
+def test_unreachable_host_is_reported_not_raised(monkeypatch):
+    monkeypatch.setattr(settings, "ollama_base_urls", ["http://127.0.0.1:1"])
+    monkeypatch.setattr(settings, "enable_embeddings", False)
+
+    status = ModelWarmer(interval_sec=0, keep_alive="5m").warm_once()
+    host = status["models"][settings.ollama_model]["hosts"]["http://127.0.0.1:1"]
+
+    assert status["models"][settings.ollama_model]["resident"] is False
+    assert host["error"]
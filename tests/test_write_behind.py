@@ -0,0 +1,217 @@
+import json
+import time
+
+import pytest
+from pymongo import UpdateOne
+
+from app.repositories.local_json_store import LocalJsonStore
+from app.repositories.mongo_store import MongoStore
+from app.repositories.write_behind import WriteBehindStore
+
+
+class CountingStore(LocalJsonStore):
+    def __init__(self, storage_dir, fail_times=0, delay=0.0, reject=None):
+        super().__init__(storage_dir)
+        self.batches = []
+        self.fail_times = fail_times
+        self.delay = delay
+        self.reject = reject  # ops the store refuses every time
+
+    def apply_writes(self, ops):
+        time.sleep(self.delay)
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError("db down")
+        if self.reject and any(self.reject(op) for op in ops):
+            raise ValueError("document rejected")
+        self.batches.append([op["op"] for op in ops])
+        super().apply_writes(ops)
+
+
+def _request(store, user_id="u1"):
+    """The writes one /ask makes."""
+    store.append_chat(user_id, "user", "hi")
+    run_id = store.create_run(user_id, "hi")
+    for agent in ("intent", "final", "safety"):
+        store.append_run_step(run_id, agent, {"agent": agent})
+    store.finalize_run(run_id, "hello", ["intent", "final", "safety"], 0.9)
+    store.append_chat(user_id, "assistant", "hello", meta={"run_id": run_id})
+    return run_id
+
+
+def test_request_writes_are_buffered_and_flushed_as_one_batch(tmp_path):
+    inner = CountingStore(str(tmp_path))
+    store = WriteBehindStore(inner, flush_interval=60)
+    try:
+        run_id = _request(store)
+        assert inner.batches == []  # nothing touched the store on the request path
+
+        run = store.get_run(run_id)  # reads flush first
+        assert len(inner.batches) == 1
+        assert [s["agent"] for s in run["steps"]] == ["intent", "final", "safety"]
+        assert run["status"] == "completed" and run["final_reply"] == "hello"
+        assert [c["role"] for c in reversed(store.get_recent_chats("u1"))] == ["user", "assistant"]
+    finally:
+        store.close()
+
+
+def test_full_queue_writes_through_in_order(tmp_path):
+    inner = CountingStore(str(tmp_path), delay=0.05)  # writer busy while the queue is full
+    store = WriteBehindStore(inner, max_queue=2, flush_interval=60, put_timeout=0.001)
+    try:
+        run_id = _request(store)
+        assert store.stats()["sync_flushes"] >= 1
+        store.flush()
+        assert [s["agent"] for s in inner.get_run(run_id)["steps"]] == ["intent", "final", "safety"]
+    finally:
+        store.close()
+
+
+def test_failed_flush_keeps_writes_and_close_persists_them(tmp_path):
+    inner = CountingStore(str(tmp_path), fail_times=2)
+    store = WriteBehindStore(inner, flush_interval=60)
+    run_id = _request(store)
+
+    with pytest.raises(ConnectionError):
+        store.flush()
+    assert store.stats()["pending_retry"] == 7
+    assert store.get_run(run_id) is None  # reads don't fail while the store is down
+    assert [c["role"] for c in store.get_recent_chats("u1")] == ["assistant", "user"]
+
+    store.close()
+    assert store.stats()["pending_retry"] == 0
+    assert LocalJsonStore(str(tmp_path)).get_run(run_id)["status"] == "completed"
+
+
+def test_failing_store_backs_off_and_bounds_the_backlog(tmp_path):
+    inner = CountingStore(str(tmp_path), fail_times=10**6)
+    store = WriteBehindStore(inner, max_queue=3, flush_interval=0.01, put_timeout=0.001, max_backoff=0.2)
+    store.append_chat("u1", "user", "hi")
+    time.sleep(0.6)
+    assert 2 <= store.stats()["errors"] <= 10  # ~60 attempts without backoff
+
+    failures = 0
+    for i in range(20):
+        try:
+            store.append_chat("u1", "user", f"message {i}")
+        except (RuntimeError, ConnectionError):  # backlog full, or a write-through hit the outage
+            failures += 1
+    assert store.search("u1", "message")  # served from the buffer
+    stats = store.stats()
+    assert failures > 0
+    assert stats["pending_retry"] + stats["queue_depth"] <= 3 * 3  # retry backlog < 2 * max_queue, plus the queue
+    inner.fail_times = 0
+    store.close()
+
+
+def test_search_sees_buffered_chats(tmp_path):
+    store = WriteBehindStore(CountingStore(str(tmp_path)), flush_interval=60)
+    try:
+        store.append_chat("u1", "user", "where is my refund")
+        assert [h["snippet"] for h in store.search("u1", "refund")] == ["where is my refund"]
+        store.append_chat("u1", "user", "refund again")
+        assert len(store.search_chats("u1", "refund")) == 2
+    finally:
+        store.close()
+
+
+def test_run_status_updates_fold_in_order(tmp_path):
+    store = WriteBehindStore(CountingStore(str(tmp_path)), flush_interval=60)
+    try:
+        run_id = store.create_run("u1", "hi")
+        store.set_run_status(run_id, "queued")
+        store.set_run_status(run_id, "running")
+        store.finalize_run(run_id, "", [], 0.0)
+        assert store.get_run(run_id)["status"] == "completed"  # finalize supersedes the earlier statuses
+
+        store.set_run_status(run_id, "failed", error="ollama down")
+        store.flush()
+    finally:
+        store.close()
+    run = LocalJsonStore(str(tmp_path)).get_run(run_id)
+    assert (run["status"], run["error"]) == ("failed", "ollama down")
+
+
+def test_rejected_op_is_dead_lettered_and_the_rest_applies(tmp_path):
+    dead_letter = tmp_path / "dead.jsonl"
+    inner = CountingStore(str(tmp_path), reject=lambda op: op["op"] == "append_run_step" and op["agent"] == "final")
+    store = WriteBehindStore(inner, flush_interval=60, max_attempts=2, dead_letter_path=str(dead_letter))
+    try:
+        run_id = _request(store)
+        with pytest.raises(ValueError):
+            store.flush()
+        assert store.search_chats("u1", "hello")  # the buffered reply is still visible
+        store.flush()
+
+        assert store.stats()["dead_lettered"] == 1
+        (entry,) = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+        assert entry["op"]["agent"] == "final" and "document rejected" in entry["error"]
+        run = store.get_run(run_id)
+        assert [s["agent"] for s in run["steps"]] == ["intent", "safety"] and run["status"] == "completed"
+        assert [c["role"] for c in store.get_recent_chats("u1")] == ["assistant", "user"]
+    finally:
+        store.close()
+
+
+class FakeCollection:
+    def __init__(self, fail_times=0):
+        self.calls = []
+        self.fail_times = fail_times
+
+    def bulk_write(self, requests, ordered=True):
+        self.calls.append(requests)
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError("primary stepped down")
+
+
+def _fake_mongo(runs):
+    store = MongoStore.__new__(MongoStore)
+    store.chats = FakeCollection()
+    store.db = {"workflow_runs": runs}
+    return store
+
+
+def _captured_ops():
+    captured = []
+    buffer = WriteBehindStore.__new__(WriteBehindStore)
+    buffer._enqueue = captured.append  # capture ops without a writer thread
+    run_id = _request(buffer)
+    buffer._enqueue(buffer._step_op("older-run", "final", {}))
+    return run_id, captured
+
+
+def test_mongo_folds_a_whole_run_into_one_upsert():
+    runs = FakeCollection()
+    store = _fake_mongo(runs)
+    run_id, ops = _captured_ops()
+
+    store.apply_writes(ops)
+
+    (chats,) = store.chats.calls
+    assert [op._filter["_id"] for op in chats] == [ops[0]["id"], ops[-2]["id"]]
+    assert all(isinstance(op, UpdateOne) and op._upsert for op in chats)
+    (requests,) = runs.calls
+    new, older = requests
+    assert new._filter == {"run_id": run_id} and new._upsert
+    stage = new._doc[0]["$set"]
+    assert stage["status"] == {"$literal": "completed"}
+    steps = stage["steps"]["$concatArrays"][1]["$filter"]["input"]["$literal"]
+    assert [s["agent"] for s in steps] == ["intent", "final", "safety"]
+    assert [s["op_id"] for s in steps] == [op["id"] for op in ops if op["op"] == "append_run_step"][:3]
+    assert older._filter == {"run_id": "older-run"} and not older._upsert  # never create a run from a step alone
+
+
+def test_mongo_retry_of_a_partly_applied_batch_reuses_the_same_ids():
+    runs = FakeCollection(fail_times=1)
+    store = _fake_mongo(runs)
+    _, ops = _captured_ops()
+
+    with pytest.raises(ConnectionError):
+        store.apply_writes(ops)  # chats written, runs not
+    assert store.is_transient_error(ConnectionError())
+    store.apply_writes(ops)
+
+    first, retry = store.chats.calls
+    assert [op._filter for op in first] == [op._filter for op in retry]  # upserts by the same _id: no duplicate chats
+    assert runs.calls[0][0]._doc == runs.calls[1][0]._doc